@@ -0,0 +1,128 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import struct
+
+# Streaming accumulator of the count, mean, sum of squared deviations from
+# the mean, minimum and maximum of values given as arrays of a fixed shape,
+# for example one value per estimator and distinct count for every
+# simulation cycle. The mean and the squared deviations are updated using
+# Welford's algorithm, and two accumulators are merged using the formulas of
+# Chan et al., which allows combining the results of parallel or distributed
+# runs without keeping the values of individual cycles. The state is
+# serialized as short header followed by the raw little-endian arrays.
+
+header_format = "<4sBQ"
+magic = b"MOMA"
+
+
+class MomentAccumulator:
+
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = numpy.zeros(shape)
+        self.m2 = numpy.zeros(shape)
+        self.min = numpy.full(shape, numpy.inf)
+        self.max = numpy.full(shape, -numpy.inf)
+
+    @property
+    def shape(self):
+        return self.mean.shape
+
+    def add(self, values):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+        numpy.minimum(self.min, values, out=self.min)
+        numpy.maximum(self.max, values, out=self.max)
+        return self
+
+    def add_many(self, values):
+        # adds the values along the first axis at once
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if len(values) == 0:
+            return self
+        other = MomentAccumulator(self.shape)
+        other.count = len(values)
+        other.mean = numpy.mean(values, axis=0)
+        other.m2 = numpy.sum(numpy.square(values - other.mean), axis=0)
+        other.min = numpy.min(values, axis=0)
+        other.max = numpy.max(values, axis=0)
+        return self.merge(other)
+
+    def merge(self, other):
+        if other.shape != self.shape:
+            raise ValueError("incompatible shapes")
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * (other.count / count)
+        self.m2 += other.m2 + numpy.square(delta) * (self.count * other.count / count)
+        numpy.minimum(self.min, other.min, out=self.min)
+        numpy.maximum(self.max, other.max, out=self.max)
+        self.count = count
+        return self
+
+    def copy(self):
+        accumulator = MomentAccumulator(self.shape)
+        return accumulator.merge(self)
+
+    def get_variance(self, ddof=0):
+        return self.m2 / (self.count - ddof)
+
+    def get_mean_square(self):
+        # mean of the squared values, e.g. the mean squared error for errors
+        return self.m2 / self.count + numpy.square(self.mean)
+
+    def get_state(self):
+        header = struct.pack(header_format, magic, len(self.shape), self.count)
+        shape = numpy.array(self.shape, dtype="<u8").tobytes()
+        arrays = numpy.stack([self.mean, self.m2, self.min, self.max])
+        return header + shape + arrays.astype("<f8", copy=False).tobytes()
+
+    @classmethod
+    def wrap(cls, state):
+        header_size = struct.calcsize(header_format)
+        tag, ndim, count = struct.unpack_from(header_format, state)
+        if tag != magic:
+            raise ValueError("illegal state")
+        shape = tuple(
+            numpy.frombuffer(state, dtype="<u8", count=ndim, offset=header_size)
+            .astype(numpy.intp)
+            .tolist()
+        )
+        arrays = numpy.frombuffer(state, dtype="<f8", offset=header_size + 8 * ndim)
+        if arrays.size != 4 * numpy.prod(shape, dtype=numpy.int64):
+            raise ValueError("illegal state length " + str(len(state)))
+        arrays = arrays.astype(numpy.float64).reshape((4,) + shape)
+        accumulator = cls.__new__(cls)
+        accumulator.count = count
+        accumulator.mean, accumulator.m2, accumulator.min, accumulator.max = arrays
+        return accumulator
@@ -25,7 +25,9 @@
 # DEALINGS IN THE SOFTWARE.
 #
 import preamble
+import argparse
 import json
+import os
 import matplotlib.pyplot as plt
 from labellines import labelLine
 import mvp
@@ -37,6 +39,11 @@ bbox = None
 
 bits_per_register = {"UltraLogLog": 8, "HyperLogLog": 6}
 
+# The records of performance_benchmark.py have the same schema as those of JMH
+# but a different benchmark name prefix, see the command-line options.
+benchmark_prefix = "com.dynatrace.ullpaper."
+figure_directory = "paper"
+
 
 def plot_estimation_chart(ax, data, sketch, estimator, title):
     outline_width = 4
@@ -45,9 +52,7 @@ def plot_estimation_chart(ax, data, sketch, estimator, title):
     for r in data:
         if (
             r["benchmark"]
-            != "com.dynatrace.ullpaper."
-            + sketch
-            + "PerformanceTest.distinctCountEstimation"
+            != benchmark_prefix + sketch + "PerformanceTest.distinctCountEstimation"
         ):
             continue
         if r["params"]["estimator"] != estimator:
@@ -124,7 +129,7 @@ def plot_estimation(data):
     )
 
     fig.savefig(
-        "paper/estimation_performance.pdf",
+        os.path.join(figure_directory, "estimation_performance.pdf"),
         format="pdf",
         dpi=1200,
         metadata={"CreationDate": None, "ModDate": None},
@@ -139,9 +144,7 @@ def plot_estimation_performance_over_theoretical_estimation_error_line(
     for r in data:
         if (
             r["benchmark"]
-            != "com.dynatrace.ullpaper."
-            + sketch
-            + "PerformanceTest.distinctCountEstimation"
+            != benchmark_prefix + sketch + "PerformanceTest.distinctCountEstimation"
         ):
             continue
         if r["params"]["estimator"] != estimator:
@@ -298,7 +301,7 @@ def plot_estimation_performance_over_theoretical_estimation_error(data):
 
     fig.subplots_adjust(top=0.985, bottom=0.275, left=0.11, right=0.77, wspace=0.04)
     fig.savefig(
-        "paper/estimation_performance_over_error.pdf",
+        os.path.join(figure_directory, "estimation_performance_over_error.pdf"),
         format="pdf",
         dpi=1200,
         metadata={"CreationDate": None, "ModDate": None},
@@ -312,10 +315,7 @@ def plot_add_chart(ax, data, test_name, sketch, title):
 
     allocation_time = {}
     for r in data:
-        if (
-            r["benchmark"]
-            != "com.dynatrace.ullpaper." + sketch + "PerformanceTest." + test_name
-        ):
+        if r["benchmark"] != benchmark_prefix + sketch + "PerformanceTest." + test_name:
             continue
 
         n = int(r["params"]["numElements"])
@@ -325,10 +325,7 @@ def plot_add_chart(ax, data, test_name, sketch, title):
             allocation_time[p] = float(r["primaryMetric"]["score"]) / 1e6
 
     for r in data:
-        if (
-            r["benchmark"]
-            != "com.dynatrace.ullpaper." + sketch + "PerformanceTest." + test_name
-        ):
+        if r["benchmark"] != benchmark_prefix + sketch + "PerformanceTest." + test_name:
             continue
 
         n = int(r["params"]["numElements"])
@@ -411,7 +408,7 @@ def plot_add(data):
     )
 
     fig.savefig(
-        "paper/add_performance.pdf",
+        os.path.join(figure_directory, "add_performance.pdf"),
         format="pdf",
         dpi=1200,
         metadata={"CreationDate": None, "ModDate": None},
@@ -419,7 +416,15 @@ def plot_add(data):
     plt.close(fig)
 
 
-f = open("results/benchmark-results.json")
+parser = argparse.ArgumentParser()
+parser.add_argument("--results", default="results/benchmark-results.json")
+parser.add_argument("--prefix", default=benchmark_prefix)
+parser.add_argument("--figure-directory", default=figure_directory)
+args = parser.parse_args()
+benchmark_prefix = args.prefix
+figure_directory = args.figure_directory
+os.makedirs(figure_directory, exist_ok=True)
+f = open(args.results)
 data = json.load(f)
 plot_estimation_performance_over_theoretical_estimation_error(data)
 plot_estimation(data)
@@ -0,0 +1,57 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+
+# Bit-packing of fixed-size elements into little-endian 64-bit words, as
+# used by PackedVector and PackedMap of the C++ HyperLogLogLog
+# implementation.
+
+word_bits = 64
+
+
+def pack_bits(values, element_size):
+    # little-endian bit stream of element_size-bit elements as 64-bit words
+    values = numpy.asarray(values, dtype="<u8")
+    bits = numpy.unpackbits(
+        values.view(numpy.uint8).reshape(-1, 8), axis=1, bitorder="little"
+    )[:, :element_size].reshape(-1)
+    num_words = -(-len(bits) // word_bits)
+    bits = numpy.concatenate(
+        (bits, numpy.zeros(num_words * word_bits - len(bits), dtype=numpy.uint8))
+    )
+    return numpy.packbits(bits, bitorder="little").view("<u8")
+
+
+def unpack_bits(words, element_size, count):
+    positions = numpy.arange(count, dtype=numpy.uint64) * numpy.uint64(element_size)
+    word_idx = (positions >> numpy.uint64(6)).astype(numpy.intp)
+    offsets = positions & numpy.uint64(63)
+    padded = numpy.concatenate((words, numpy.zeros(1, dtype=numpy.uint64)))
+    low = padded[word_idx] >> offsets
+    # shifting by 64 is undefined, hence split the shift of the next word
+    high = (padded[word_idx + 1] << (numpy.uint64(63) - offsets)) << numpy.uint64(1)
+    return (low | high) & numpy.uint64((1 << element_size) - 1)
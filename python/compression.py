@@ -29,6 +29,7 @@ import csv
 import matplotlib.pyplot as plt
 import mvp
 from functools import partial
+from downsampling import downsample_log_x, max_points_for_figure
 
 
 def read_data(data_file):
@@ -81,6 +82,8 @@ def plot():
         len(pvals), len(inputs), sharex=True, sharey="row"
     )  # "row")
     fig.set_size_inches(5, 5.2)
+    dpi = 1200
+    max_points = max_points_for_figure(fig, dpi)
 
     for p_idx in range(len(pvals)):
         p = pvals[p_idx]
@@ -165,8 +168,7 @@ def plot():
                     for i in range(len(distinct_counts))
                 ]
                 ax.plot(
-                    distinct_counts,
-                    data,
+                    *downsample_log_x(distinct_counts, data, max_points),
                     label=compression_algorithms[compression_algorithm],
                     color=color,
                     linestyle=linestyle,
@@ -221,7 +223,7 @@ def plot():
     fig.savefig(
         "paper/compression.pdf",
         format="pdf",
-        dpi=1200,
+        dpi=dpi,
         metadata={"CreationDate": None, "ModDate": None},
     )
     plt.close(fig)
@@ -0,0 +1,180 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import bz2
+import concurrent.futures
+import lzma
+import numpy
+import os
+import sys
+import time
+import zlib
+import hll
+import transition_simulation
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Python counterpart of the compression study of CompressionSimulation.java
+# using the codecs available in Python. Register snapshots of the sketches
+# are taken from the transition-based simulation. All codecs are called with
+# the defaults of Apache Commons Compress, as used by the Java code. As the
+# codecs release the GIL, the snapshots are compressed concurrently on a
+# thread pool. Encoding and decoding times are measured as CPU time of the
+# calling thread, which is not affected by other threads running at the same
+# time. The results have the schema of results/compression/compressionP.csv
+# extended by the encoding and decoding throughput in bytes of uncompressed
+# state per second.
+
+sample_size = 100
+max_distinct_count = 1e21
+relative_step = 0.05
+seed = 0xD722301E3C920BC8
+
+result_file_format = "results/compression/python-compression{}.csv"
+
+layouts = ["hll6", "hll8", "ull"]
+
+codecs = [
+    ("bzip2", bz2.compress, bz2.decompress),
+    ("lzma", lambda d: lzma.compress(d, format=lzma.FORMAT_ALONE), lzma.decompress),
+    ("deflate", zlib.compress, zlib.decompress),
+]
+# the columns of zstd are always written, they are NaN if zstandard is not
+# installed, so the schema matches that of compressionP.csv
+if zstandard is not None:
+    codecs.append(
+        (
+            "zstd",
+            lambda d: zstandard.ZstdCompressor(level=3).compress(d),
+            lambda d: zstandard.ZstdDecompressor().decompress(d),
+        )
+    )
+else:
+    codecs.append(("zstd", None, None))
+
+
+def get_states(ull_registers, hll_registers):
+    return [
+        hll.pack_state(hll_registers),
+        hll_registers.tobytes(),
+        ull_registers.tobytes(),
+    ]
+
+
+def measure(states):
+    # returns compressed sizes, encoding and decoding times in seconds for all
+    # layouts and codecs
+    sizes = numpy.full((len(layouts), len(codecs)), numpy.nan)
+    encode_times = numpy.full((len(layouts), len(codecs)), numpy.nan)
+    decode_times = numpy.full((len(layouts), len(codecs)), numpy.nan)
+    for i, state in enumerate(states):
+        for j, (_, compress, decompress) in enumerate(codecs):
+            if compress is None:
+                continue
+            t0 = time.thread_time()
+            compressed = compress(state)
+            t1 = time.thread_time()
+            decompressed = decompress(compressed)
+            t2 = time.thread_time()
+            if decompressed != state:
+                raise RuntimeError("codec " + codecs[j][0] + " is not lossless")
+            sizes[i, j] = len(compressed)
+            encode_times[i, j] = t1 - t0
+            decode_times[i, j] = t2 - t1
+    return sizes, encode_times, decode_times
+
+
+def run(p, sample_size=sample_size, num_threads=None):
+    distinct_counts = transition_simulation.get_distinct_count_values(
+        max_distinct_count, relative_step
+    )
+    shape = (len(distinct_counts), len(layouts), len(codecs))
+    sizes = numpy.zeros(shape)
+    encode_times = numpy.zeros(shape)
+    decode_times = numpy.zeros(shape)
+    seed_sequences = numpy.random.SeedSequence(seed).spawn(sample_size)
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+        for seed_sequence in seed_sequences:
+            futures = [
+                executor.submit(measure, get_states(ull_registers, hll_registers))
+                for _, ull_registers, hll_registers in transition_simulation.simulate(
+                    p, distinct_counts, seed_sequence
+                )
+            ]
+            for i, future in enumerate(futures):
+                s, e, d = future.result()
+                sizes[i] += s
+                encode_times[i] += e
+                decode_times[i] += d
+    state_sizes = numpy.array([len(s) for s in get_states(*simulate_empty(p))])
+    state_bytes = sample_size * state_sizes[None, :, None]
+    return (
+        distinct_counts,
+        sizes / sample_size,
+        state_bytes / encode_times,
+        state_bytes / decode_times,
+    )
+
+
+def simulate_empty(p):
+    return numpy.zeros(1 << p, dtype=numpy.uint8), numpy.zeros(
+        1 << p, dtype=numpy.uint8
+    )
+
+
+def write_results(file, p, sample_size, distinct_counts, sizes, encode, decode):
+    names = [(l, c[0]) for l in layouts for c in codecs]
+    with open(file, "w") as f:
+        f.write("p = " + str(p) + "; sample_size = " + str(sample_size) + "\n")
+        f.write(
+            "; ".join(
+                ["true distinct count"]
+                + ["compressed bytes " + l + " " + c for l, c in names]
+                + ["encode throughput " + l + " " + c for l, c in names]
+                + ["decode throughput " + l + " " + c for l, c in names]
+            )
+            + "\n"
+        )
+        for i, n in enumerate(distinct_counts):
+            values = numpy.concatenate(
+                [sizes[i].ravel(), encode[i].ravel(), decode[i].ravel()]
+            )
+            f.write("; ".join(str(v) for v in [float(n)] + values.tolist()) + "\n")
+
+
+if __name__ == "__main__":
+    # pairs of precision and sample size can be passed as arguments
+    args = [int(a) for a in sys.argv[1:]]
+    if len(args) % 2 != 0:
+        sys.exit("usage: compression_benchmark.py [p sample_size]...")
+    samples = list(zip(args[0::2], args[1::2])) or [
+        (p, sample_size) for p in [8, 12, 16]
+    ]
+    for p, size in samples:
+        write_results(result_file_format.format(p), p, size, *run(p, size))
@@ -0,0 +1,67 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+
+# M4 aggregation (first, minimum, maximum and last point per pixel column) keeps
+# the rasterized line identical as long as there are at least as many buckets
+# as pixel columns. The buckets are equally spaced in log(x) to match the
+# logarithmic distinct count axes used by the charts.
+points_per_bucket = 4
+
+
+# the figure width is an upper bound for the width of any of its axes
+def max_points_for_figure(fig, dpi):
+    width_in_pixels = fig.get_figwidth() * dpi
+    return points_per_bucket * int(numpy.ceil(width_in_pixels))
+
+
+def downsample_log_x(x, y, max_points):
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+    assert x.shape == y.shape
+    assert max_points >= points_per_bucket
+
+    if len(x) <= max_points or x[0] >= x[-1]:
+        return x, y
+
+    log_x = numpy.log(x)
+    num_buckets = max_points // points_per_bucket
+    bucket_width = (log_x[-1] - log_x[0]) / num_buckets
+    buckets = numpy.minimum(
+        ((log_x - log_x[0]) / bucket_width).astype(numpy.int64), num_buckets - 1
+    )
+
+    starts = numpy.flatnonzero(numpy.diff(buckets, prepend=-1))
+    ends = numpy.append(starts[1:], len(x)) - 1
+
+    # x is sorted, hence the buckets are already in order and lexsort only sorts
+    # the y values within each bucket
+    order = numpy.lexsort((y, buckets))
+    selected = numpy.unique(
+        numpy.concatenate((starts, ends, order[starts], order[ends]))
+    )
+    return x[selected], y[selected]
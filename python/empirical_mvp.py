@@ -0,0 +1,331 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import argparse
+import json
+import multiprocessing
+import numpy
+import os
+import time
+import accumulators
+import estimation
+import hll
+import transition_simulation
+import ull
+
+# Python counterpart of EmpiricalMVPComputation.java for the Python sketch
+# implementations. The cycles are distributed over a process pool. Every
+# cycle uses its own random generator spawned from a root seed, and the
+# accumulators of fixed-size groups of cycles are merged in cycle order. The
+# results are therefore independent of the number of worker processes. All
+# configurations are fed with the same hashes within a cycle, which are added
+# in batches between consecutive distinct counts. The memory sizes are those
+# reported by in_memory_size_in_bytes, as in memory_profile.py. The CSV files
+# have the same schema as those of the Java code.
+
+p = 12
+num_cycles = 1000
+max_distinct_count = 1000000
+relative_step = 0.05
+seed = 0
+cycles_per_task = 10
+
+result_dir = "results/comparison-empirical-mvp/"
+
+
+class UltraLogLogConfig:
+
+    def __init__(self, label, estimator):
+        self.label = label
+        self.estimator = estimator
+
+    def create(self, p):
+        return ull.UltraLogLog(p, sparse=False)
+
+    def get_serialized_size(self, sketch):
+        return len(sketch.get_state())
+
+    def get_estimate(self, sketch):
+        return sketch.get_distinct_count_estimate(self.estimator)
+
+
+class HyperLogLogConfig(UltraLogLogConfig):
+
+    def create(self, p):
+        return hll.HyperLogLog(p)
+
+
+configs = [
+    UltraLogLogConfig("Python UltraLogLog ML", estimation.ml_estimate_from_histograms),
+    UltraLogLogConfig(
+        "Python UltraLogLog FGRA", estimation.fgra_estimate_from_histograms
+    ),
+    HyperLogLogConfig(
+        "Python HyperLogLog ML", estimation.hll_ml_estimate_from_histograms
+    ),
+    HyperLogLogConfig(
+        "Python HyperLogLog CR", estimation.hll_corrected_raw_estimate_from_histograms
+    ),
+]
+
+
+def get_distinct_counts():
+    return transition_simulation.get_distinct_count_values(
+        max_distinct_count, relative_step
+    ).astype(numpy.int64)
+
+
+def run_cycles(task):
+    # returns the accumulated memory sizes, serialization sizes and
+    # estimation errors of all configurations and distinct counts
+    seed_sequences, distinct_counts, p = task
+    k = len(distinct_counts)
+    accumulator = accumulators.MomentAccumulator((3, len(configs), k))
+    values = numpy.zeros((3, len(configs), k))
+    for seed_sequence in seed_sequences:
+        hashes = numpy.random.default_rng(seed_sequence).integers(
+            0, 1 << 64, distinct_counts[-1], dtype=numpy.uint64, endpoint=False
+        )
+        for c, config in enumerate(configs):
+            sketch = config.create(p)
+            start = 0
+            for i, distinct_count in enumerate(distinct_counts):
+                sketch.add_many(hashes[start:distinct_count])
+                start = distinct_count
+                values[0, c, i] = sketch.in_memory_size_in_bytes()
+                values[1, c, i] = config.get_serialized_size(sketch)
+                values[2, c, i] = config.get_estimate(sketch) - distinct_count
+        accumulator.add(values)
+    return accumulator
+
+
+def get_metadata(p, num_cycles, distinct_counts, seed, first_cycle, last_cycle):
+    return {
+        "p": p,
+        "number of cycles": num_cycles,
+        "distinct counts": [int(n) for n in distinct_counts],
+        "seed": seed,
+        "cycles per task": cycles_per_task,
+        "configs": [config.label for config in configs],
+        "first cycle": first_cycle,
+        "last cycle": last_cycle,
+    }
+
+
+def write_checkpoint(file, metadata, next_cycle, accumulator):
+    # the file is replaced atomically, so it is never left incomplete
+    header = json.dumps(dict(metadata, **{"next cycle": next_cycle}))
+    tmp_file = file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(header.encode() + b"\n" + accumulator.get_state())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, file)
+
+
+def read_checkpoint(file):
+    with open(file, "rb") as f:
+        header, state = f.read().split(b"\n", 1)
+    metadata = json.loads(header)
+    next_cycle = metadata.pop("next cycle")
+    return metadata, next_cycle, accumulators.MomentAccumulator.wrap(state)
+
+
+def compute(
+    p,
+    num_cycles,
+    distinct_counts,
+    seed=seed,
+    num_workers=None,
+    first_cycle=0,
+    last_cycle=None,
+    checkpoint_file=None,
+    checkpoint_interval=60,
+):
+    # Computes the cycles from first_cycle to last_cycle. If a checkpoint
+    # file is given, the state is saved there every checkpoint_interval
+    # seconds and after the last cycle. A computation started again with the
+    # same arguments resumes from the checkpoint and gives bit-identical
+    # results. As the random generator of every cycle is derived from the
+    # seed and the cycle index, the next cycle index is the only random
+    # generator position that needs to be saved.
+    if last_cycle is None:
+        last_cycle = num_cycles
+    if first_cycle % cycles_per_task != 0 or not 0 <= first_cycle <= last_cycle:
+        raise ValueError("illegal first cycle " + str(first_cycle))
+    if last_cycle > num_cycles:
+        raise ValueError("illegal last cycle " + str(last_cycle))
+    metadata = get_metadata(
+        p, num_cycles, distinct_counts, seed, first_cycle, last_cycle
+    )
+    result = accumulators.MomentAccumulator((3, len(configs), len(distinct_counts)))
+    next_cycle = first_cycle
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        checkpoint_metadata, next_cycle, result = read_checkpoint(checkpoint_file)
+        if checkpoint_metadata != metadata:
+            raise ValueError("checkpoint does not match configuration")
+    tasks = [
+        (
+            [
+                numpy.random.SeedSequence(seed, spawn_key=(i,))
+                for i in range(start, min(start + cycles_per_task, last_cycle))
+            ],
+            distinct_counts,
+            p,
+        )
+        for start in range(next_cycle, last_cycle, cycles_per_task)
+    ]
+    checkpoint_time = time.monotonic()
+    with multiprocessing.Pool(num_workers) as pool:
+        for task, accumulator in zip(tasks, pool.imap(run_cycles, tasks)):
+            result.merge(accumulator)
+            next_cycle += len(task[0])
+            if (
+                checkpoint_file is not None
+                and time.monotonic() - checkpoint_time >= checkpoint_interval
+            ):
+                write_checkpoint(checkpoint_file, metadata, next_cycle, result)
+                checkpoint_time = time.monotonic()
+    if checkpoint_file is not None:
+        write_checkpoint(checkpoint_file, metadata, next_cycle, result)
+    return result
+
+
+def merge_checkpoints(files):
+    # merges the results of runs over consecutive ranges of cycles, the
+    # result equals that of a single run up to rounding errors
+    checkpoints = sorted(
+        (read_checkpoint(file) for file in files),
+        key=lambda c: (c[0]["first cycle"], c[0]["last cycle"]),
+    )
+    metadata, _, result = checkpoints[0]
+    expected_cycle = 0
+    for i, (checkpoint_metadata, next_cycle, accumulator) in enumerate(checkpoints):
+        if checkpoint_metadata["first cycle"] != expected_cycle:
+            raise ValueError("missing cycles before " + str(expected_cycle))
+        if next_cycle != checkpoint_metadata["last cycle"]:
+            raise ValueError("incomplete checkpoint")
+        for key in ["p", "number of cycles", "distinct counts", "seed", "configs"]:
+            if checkpoint_metadata[key] != metadata[key]:
+                raise ValueError("checkpoints of different configurations")
+        if i > 0:
+            result.merge(accumulator)
+        expected_cycle = next_cycle
+    if expected_cycle != metadata["number of cycles"]:
+        raise ValueError("missing cycles after " + str(expected_cycle))
+    return metadata, result
+
+
+def get_rows(accumulator, config_index, distinct_counts):
+    n = numpy.asarray(distinct_counts)
+    mean = accumulator.mean[:, config_index]
+    relative_mse = accumulator.get_mean_square()[2, config_index] / numpy.square(n)
+    return zip(
+        n.tolist(),
+        accumulator.min[0, config_index].astype(numpy.int64).tolist(),
+        mean[0].tolist(),
+        accumulator.max[0, config_index].astype(numpy.int64).tolist(),
+        accumulator.min[1, config_index].astype(numpy.int64).tolist(),
+        mean[1].tolist(),
+        accumulator.max[1, config_index].astype(numpy.int64).tolist(),
+        (mean[2] / n).tolist(),
+        numpy.sqrt(relative_mse).tolist(),
+        (mean[0] * 8 * relative_mse).tolist(),
+        (mean[1] * 8 * relative_mse).tolist(),
+    )
+
+
+def write_results(file, p, num_cycles, label, rows):
+    with open(file, "w") as f:
+        f.write(
+            "p = "
+            + str(p)
+            + "; number of cycles = "
+            + str(num_cycles)
+            + "; data structure = "
+            + label
+            + "\n"
+        )
+        f.write(
+            "true distinct count; minimum memory size; average memory size; "
+            "maximum memory size; minimum serialization size; "
+            "average serialization size; maximum serialization size; "
+            "relative distinct count estimation bias; "
+            "relative distinct count estimation rmse; estimated memory MVP; "
+            "estimated serialization MVP\n"
+        )
+        for row in rows:
+            f.write("; ".join(str(v) for v in row) + "\n")
+
+
+def write_all_results(p, num_cycles, distinct_counts, accumulator):
+    for c, config in enumerate(configs):
+        rows = get_rows(accumulator, c, distinct_counts)
+        write_results(
+            result_dir + config.label + ".csv", p, num_cycles, config.label, rows
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=num_cycles)
+    parser.add_argument("--checkpoint", help="file to save and resume from")
+    parser.add_argument(
+        "--range",
+        type=int,
+        nargs=2,
+        metavar=("FIRST", "LAST"),
+        help="only compute the given cycles and save them to the checkpoint",
+    )
+    parser.add_argument(
+        "--merge", nargs="+", metavar="CHECKPOINT", help="merge chunk checkpoints"
+    )
+    args = parser.parse_args()
+    distinct_counts = get_distinct_counts()
+    if args.merge:
+        metadata, accumulator = merge_checkpoints(args.merge)
+        write_all_results(
+            metadata["p"],
+            metadata["number of cycles"],
+            metadata["distinct counts"],
+            accumulator,
+        )
+    elif args.range:
+        if args.checkpoint is None:
+            parser.error("--range requires --checkpoint")
+        compute(
+            p,
+            args.cycles,
+            distinct_counts,
+            first_cycle=args.range[0],
+            last_cycle=args.range[1],
+            checkpoint_file=args.checkpoint,
+        )
+    else:
+        accumulator = compute(
+            p, args.cycles, distinct_counts, checkpoint_file=args.checkpoint
+        )
+        write_all_results(p, args.cycles, distinct_counts, accumulator)
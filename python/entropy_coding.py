@@ -0,0 +1,304 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import functools
+import numpy
+import estimation
+
+# Registers are coded with interleaved rANS using a static model, namely the
+# register value distribution of the Poisson model for the maximum likelihood
+# estimate of n / m, which is the distribution calculate_entropy integrates
+# over. The estimate is quantized to an 11-bit code that is stored with the
+# sketch, from which the decoder recomputes the same model.
+#
+# Layout of a coded sketch (little-endian):
+#   header (2 bytes): p in the upper 5 bits, the quantized estimate in the
+#     lower 11 bits (0 for an empty sketch)
+#   final rANS states (4 bytes per lane, 3 bytes for the first lane if its
+#     state is below 2^24, which makes the total length odd)
+#   16-bit words of the rANS stream
+#
+# Apart from the header, the final state of each lane adds about 2 bytes on
+# top of the entropy, as it starts from the lower state bound. This fixed
+# overhead of about 4 bytes dominates for small sketches. For n >= 10^5, ULL
+# sketches are coded about 55% above the calculate_entropy bound at p = 4,
+# 14% above at p = 6, 3% above at p = 8, 1% above at p = 10 and less than
+# 1% above from p = 12 on. HLL sketches lie about 75%, 20% and 5% above the
+# bound at p = 4, 6 and 8, as their registers carry less information.
+probability_bits = 15
+state_lower_bound = 1 << 16
+header_size = 2
+code_bits = 11
+estimate_code_resolution = 16
+estimate_code_offset = 32 * estimate_code_resolution
+
+# interleaving lanes reduce the number of sequential steps, but each lane
+# costs 4 bytes for its final state
+registers_per_lane = 1 << 11
+
+
+def num_lanes(p):
+    return max(1, (1 << p) // registers_per_lane)
+
+
+def quantize(x):
+    with numpy.errstate(divide="ignore"):
+        code = numpy.round(numpy.log2(x) * estimate_code_resolution)
+    code = numpy.clip(
+        numpy.nan_to_num(code, nan=0.0, posinf=1 << code_bits, neginf=-(1 << code_bits))
+        + estimate_code_offset,
+        1,
+        (1 << code_bits) - 1,
+    )
+    return numpy.where(x > 0, code, 0).astype(numpy.uint16)
+
+
+def dequantize(code):
+    return numpy.power(
+        2.0,
+        (code.astype(numpy.float64) - estimate_code_offset) / estimate_code_resolution,
+    )
+
+
+class Model:
+
+    def __init__(self, num_values, tables, valid, initial_estimate):
+        self.num_values = num_values
+        self.tables = tables
+        self.valid = valid
+        self.initial_estimate = initial_estimate
+
+    def estimate_codes(self, histograms, p):
+        m = 1 << p
+        absent, present = self.tables(p)
+        x = estimation.ml_solve(
+            histograms @ absent,
+            histograms @ present,
+            estimation.ml_rates(p),
+            self.initial_estimate(histograms, p) / m,
+        )
+        return quantize(x)
+
+    @functools.lru_cache(maxsize=None)
+    def frequencies(self, p, code):
+        # quantized probabilities of all register values, valid values get a
+        # frequency of at least 1
+        absent, present = self.tables(p)
+        valid = self.valid(p)
+        x = dequantize(numpy.uint16(code))
+        rates = estimation.ml_rates(p)
+        log_probabilities = -x * absent + present @ numpy.log(-numpy.expm1(-x * rates))
+        log_probabilities = numpy.where(valid, log_probabilities, -numpy.inf)
+        probabilities = numpy.exp(log_probabilities - numpy.max(log_probabilities))
+        probabilities /= numpy.sum(probabilities)
+        total = 1 << probability_bits
+        num_valid = int(numpy.sum(valid))
+        f = numpy.where(
+            valid,
+            numpy.floor(probabilities * (total - num_valid)).astype(numpy.int64) + 1,
+            0,
+        )
+        f[numpy.argmax(f)] += total - numpy.sum(f)
+        return f
+
+
+@functools.lru_cache(maxsize=None)
+def ull_valid(p):
+    r = numpy.arange(256)
+    u = (r >> 2) - p + 2
+    return (
+        (r == 0)
+        | ((u >= 3) & (u <= 65 - p))
+        | ((u == 2) & (r & 1 == 0))
+        | ((u == 1) & (r & 3 == 0))
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def hll_valid(p):
+    return numpy.arange(64) <= 65 - p
+
+
+ull_model = Model(
+    256, estimation.ml_tables, ull_valid, estimation.fgra_estimate_from_histograms
+)
+hll_model = Model(
+    64,
+    estimation.hll_ml_tables,
+    hll_valid,
+    estimation.hll_corrected_raw_estimate_from_histograms,
+)
+
+
+def model_tables(model, p, codes):
+    # frequencies and cumulative frequencies per sketch, indexed by the
+    # position of its code among the unique codes
+    unique_codes, inverse = numpy.unique(codes, return_inverse=True)
+    f = numpy.array([model.frequencies(p, int(c)) for c in unique_codes])
+    f = f.reshape(len(unique_codes), model.num_values)
+    c = numpy.cumsum(f, axis=1) - f
+    return f, c, inverse
+
+
+def encode(registers, model):
+    registers = numpy.asarray(registers, dtype=numpy.uint8)
+    single = registers.ndim == 1
+    registers = numpy.atleast_2d(registers)
+    n, m = registers.shape
+    p = estimation.precision_from_registers(registers)
+    histograms = estimation.register_histograms(registers, model.num_values)
+    if numpy.any(histograms * ~model.valid(p) != 0):
+        raise ValueError("invalid register values")
+    codes = quantize(numpy.zeros(n))
+    nonempty = numpy.flatnonzero(histograms[:, 0] < m)
+    codes[nonempty] = model.estimate_codes(histograms[nonempty], p)
+    f, c, inverse = model_tables(model, p, codes)
+    lanes = num_lanes(p)
+    steps = m // lanes
+    symbols = registers[nonempty].reshape(len(nonempty), steps, lanes)
+    table = inverse[nonempty][:, None]
+
+    states = numpy.full((len(nonempty), lanes), state_lower_bound, dtype=numpy.uint64)
+    emitted_sketches = []
+    emitted_words = []
+    lane_order = numpy.arange(lanes - 1, -1, -1)
+    for t in range(steps - 1, -1, -1):
+        s = symbols[:, t, lane_order]
+        freq = f[table, s].astype(numpy.uint64)
+        cum = c[table, s].astype(numpy.uint64)
+        emit = states[:, lane_order] >= freq << numpy.uint64(32 - probability_bits)
+        sketch_idx, lane_idx = numpy.nonzero(emit)
+        lane_idx = lane_order[lane_idx]
+        emitted_sketches.append(sketch_idx)
+        emitted_words.append(
+            (states[sketch_idx, lane_idx] & numpy.uint64(0xFFFF)).astype(numpy.uint16)
+        )
+        states[sketch_idx, lane_idx] >>= numpy.uint64(16)
+        x = states[:, lane_order]
+        states[:, lane_order] = (
+            ((x // freq) << numpy.uint64(probability_bits)) + x % freq + cum
+        )
+
+    emitted_sketches = numpy.concatenate(emitted_sketches)
+    emitted_words = numpy.concatenate(emitted_words)
+    order = numpy.argsort(emitted_sketches, kind="stable")
+    emitted_words = emitted_words[order]
+    boundaries = numpy.searchsorted(
+        emitted_sketches[order], numpy.arange(len(nonempty) + 1)
+    )
+
+    headers = (numpy.uint16(p) << numpy.uint16(code_bits)) | codes
+    result = [headers[i].astype("<u2").tobytes() for i in range(n)]
+    for j, i in enumerate(nonempty):
+        words = emitted_words[boundaries[j] : boundaries[j + 1]][::-1]
+        state_bytes = states[j].astype("<u4").tobytes()
+        if states[j, 0] < 1 << 24:
+            state_bytes = state_bytes[:3] + state_bytes[4:]
+        result[i] += state_bytes + words.astype("<u2").tobytes()
+    return result[0] if single else result
+
+
+def split_states(d, lanes):
+    # an odd length means the state of the first lane is stored in 3 bytes
+    state_size = 4 * lanes - len(d) % 2
+    state_bytes = bytes(d[header_size : header_size + state_size])
+    if len(d) % 2 == 1:
+        state_bytes = state_bytes[:3] + b"\x00" + state_bytes[3:]
+    return (
+        numpy.frombuffer(state_bytes, dtype="<u4"),
+        numpy.frombuffer(d, dtype="<u2", offset=header_size + state_size),
+    )
+
+
+def decode(data, model):
+    single = isinstance(data, (bytes, bytearray, memoryview))
+    if single:
+        data = [data]
+    if len(data) == 0:
+        return numpy.zeros((0, 0), dtype=numpy.uint8)
+    headers = numpy.array(
+        [numpy.frombuffer(d, dtype="<u2", count=1)[0] for d in data],
+        dtype=numpy.uint16,
+    )
+    p = int(headers[0] >> code_bits)
+    if numpy.any(headers >> code_bits != p):
+        raise ValueError("all sketches must have the same precision")
+    m = 1 << p
+    lanes = num_lanes(p)
+    steps = m // lanes
+    codes = headers & numpy.uint16((1 << code_bits) - 1)
+    registers = numpy.zeros((len(data), m), dtype=numpy.uint8)
+    nonempty = numpy.flatnonzero(codes != 0)
+    if len(nonempty) == 0:
+        return registers[0] if single else registers
+    f, c, inverse = model_tables(model, p, codes[nonempty])
+    slot_to_symbol = numpy.array(
+        [numpy.repeat(numpy.arange(model.num_values), row) for row in f],
+        dtype=numpy.uint8,
+    )
+    table = inverse[:, None]
+
+    states, streams = zip(*(split_states(data[i], lanes) for i in nonempty))
+    states = numpy.array(states, dtype=numpy.uint64).reshape(len(nonempty), lanes)
+    streams = list(streams)
+    offsets = numpy.cumsum([0] + [len(s) for s in streams])[:-1]
+    stream = numpy.concatenate(streams + [numpy.zeros(lanes, dtype=numpy.uint16)])
+    positions = offsets.copy()
+
+    symbols = numpy.empty((len(nonempty), steps, lanes), dtype=numpy.uint8)
+    mask = numpy.uint64((1 << probability_bits) - 1)
+    for t in range(steps):
+        slots = states & mask
+        s = slot_to_symbol[table, slots]
+        symbols[:, t] = s
+        states = f[table, s].astype(numpy.uint64) * (
+            states >> numpy.uint64(probability_bits)
+        ) + (slots - c[table, s].astype(numpy.uint64))
+        read = states < numpy.uint64(state_lower_bound)
+        if numpy.any(read):
+            counts = numpy.cumsum(read, axis=1)
+            word_positions = positions[:, None] + counts - 1
+            words = stream[word_positions[read]].astype(numpy.uint64)
+            states[read] = (states[read] << numpy.uint64(16)) | words
+            positions += counts[:, -1]
+    registers[nonempty] = symbols.reshape(len(nonempty), m)
+    return registers[0] if single else registers
+
+
+def encode_ull(registers):
+    return encode(registers, ull_model)
+
+
+def decode_ull(data):
+    return decode(data, ull_model)
+
+
+def encode_hll(registers):
+    return encode(registers, hll_model)
+
+
+def decode_hll(data):
+    return decode(data, hll_model)
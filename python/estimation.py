@@ -0,0 +1,410 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import functools
+import numpy
+import mvp
+
+
+def register_histograms(registers, num_values=256):
+    registers = numpy.asarray(registers)
+    if registers.ndim == 1:
+        return numpy.bincount(registers, minlength=num_values)
+    histograms = numpy.empty((len(registers), num_values), dtype=numpy.int64)
+    for i, r in enumerate(registers):
+        histograms[i] = numpy.bincount(r, minlength=num_values)
+    return histograms
+
+
+def precision_from_registers(registers):
+    m = numpy.shape(registers)[-1]
+    p = m.bit_length() - 1
+    assert m == 1 << p
+    return p
+
+
+# The FGRA estimator assigns register r the contribution
+# eta[r & 3] * 2^(-tau * (r >> 2)) and estimates the distinct count from the
+# sum of all contributions. Registers with values that cannot have both extra
+# bits (small distinct counts) or whose maximum update value is capped (huge
+# distinct counts) are replaced by their expected contribution given a rough
+# maximum likelihood estimate from the affected register counts.
+fgra_result = mvp.mvp_fgra(q=6, b=2)
+fgra_tau = fgra_result.t
+fgra_eta = numpy.array(
+    mvp.calculate_contribution_coefficients_fgra(fgra_result), dtype=numpy.float64
+)
+fgra_relative_variance = fgra_result.mvp / 8.0
+fgra_register_contributions = fgra_eta[numpy.arange(256) & 3] * numpy.power(
+    2.0, -fgra_tau * (numpy.arange(256) >> 2)
+)
+
+fgra_num_series_terms = 128
+
+
+def fgra_pattern_contribution(absent_probability1, absent_probability2):
+    # expected eta for extra bits that are absent with the given probabilities
+    return (
+        fgra_eta[0] * absent_probability1 * absent_probability2
+        + fgra_eta[1] * absent_probability1 * (1 - absent_probability2)
+        + fgra_eta[2] * (1 - absent_probability1) * absent_probability2
+        + fgra_eta[3] * (1 - absent_probability1) * (1 - absent_probability2)
+    )
+
+
+def fgra_small_range_contributions(c0, c4, c8, c10, m, p):
+    alpha = m + 3 * (c0 + c4 + c8 + c10)
+    beta = m - c0 - c4
+    gamma = 4 * c0 + 2 * c4 + 3 * c8 + c10
+    y = (numpy.sqrt(beta * beta + 4.0 * alpha * gamma) - beta) / (2.0 * alpha)
+    x = -4.0 * numpy.log(y)
+    z = numpy.exp(-x)
+
+    result = (
+        c4 * numpy.power(2.0, -fgra_tau * (p - 1)) * fgra_pattern_contribution(z, z * z)
+    )
+    result += (
+        c8 * numpy.power(2.0, -fgra_tau * p) * (fgra_eta[0] * z + fgra_eta[1] * (1 - z))
+    )
+    result += (
+        c10
+        * numpy.power(2.0, -fgra_tau * p)
+        * (fgra_eta[2] * z + fgra_eta[3] * (1 - z))
+    )
+
+    # terms with x * 2^l > 1024 vanish, skipping them also avoids slow
+    # computations with subnormal numbers
+    num_terms = fgra_num_series_terms
+    x_min = numpy.min(x, initial=numpy.inf)
+    if x_min > 0:
+        num_terms = min(num_terms, max(1, int(numpy.ceil(numpy.log2(1024.0 / x_min)))))
+    l = numpy.arange(num_terms)
+    xl = x[..., None] * numpy.power(2.0, l)
+    probabilities = -numpy.expm1(-xl) * numpy.exp(-(xl - x[..., None]))
+    e0 = numpy.sum(
+        probabilities
+        * numpy.power(2.0, fgra_tau * (l - p + 2))
+        * fgra_pattern_contribution(numpy.exp(-2 * xl), numpy.exp(-4 * xl)),
+        axis=-1,
+    )
+    result += c0 * e0
+    return result
+
+
+def fgra_large_range_contributions(top_histograms, b1, b2, m):
+    a = numpy.sum(top_histograms, axis=-1)
+    ab = a + b1
+    d = 4 * m - ab - 2 * b2
+    v = (numpy.sqrt(ab * ab + 16.0 * m * d) - ab) / (8.0 * m)
+    s = numpy.maximum(-0.5 * numpy.log(v), numpy.finfo(numpy.float64).tiny)
+
+    l = numpy.arange(fgra_num_series_terms)
+    sl = s[..., None] * numpy.power(2.0, -l)
+    probabilities = (
+        -numpy.expm1(-sl) * numpy.exp(-sl) / -numpy.expm1(-2.0 * s[..., None])
+    )
+    weights = probabilities * numpy.power(2.0, -fgra_tau * (63 + l))
+
+    # for l >= 2 both extra bits are beyond the maximum update value
+    e_high = numpy.sum(
+        weights[..., 2:]
+        * fgra_pattern_contribution(
+            numpy.exp(-2 * sl[..., 2:]), numpy.exp(-4 * sl[..., 2:])
+        ),
+        axis=-1,
+    )
+    # for l == 1 the lower extra bit is the observed upper extra bit
+    bit_absent_probability = numpy.exp(-s)
+    e_low = weights[..., 1] * bit_absent_probability
+    e_high_without_bit = weights[..., 1] * (1 - bit_absent_probability)
+
+    result = numpy.zeros(numpy.shape(a))
+    for j in range(4):
+        contribution = weights[..., 0] * fgra_eta[j] + e_high
+        contribution += (
+            fgra_eta[j >> 1] * e_low + fgra_eta[2 + (j >> 1)] * e_high_without_bit
+        )
+        result += top_histograms[..., j] * contribution
+    return result
+
+
+def fgra_estimate_from_histograms(histograms, p):
+    histograms = numpy.asarray(histograms)
+    m = 1 << p
+    h = numpy.atleast_2d(histograms)
+    c0 = h[:, 0]
+    c4 = h[:, 4 * p - 4]
+    c8 = h[:, 4 * p]
+    c10 = h[:, 4 * p + 2]
+    top = h[:, 252:256]
+
+    regular = numpy.ones(256, dtype=bool)
+    regular[[0, 4 * p - 4, 4 * p, 4 * p + 2]] = False
+    regular[252:256] = False
+    s = h @ numpy.where(regular, fgra_register_contributions, 0.0)
+
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        small = numpy.flatnonzero((c0 + c4 + c8 + c10 > 0) & (c0 < m))
+        if len(small) > 0:
+            s[small] += fgra_small_range_contributions(
+                c0[small], c4[small], c8[small], c10[small], numpy.float64(m), p
+            )
+        large = numpy.flatnonzero(numpy.sum(top, axis=-1) > 0)
+        if len(large) > 0:
+            hl = h[large]
+            b1 = numpy.sum(hl[:, 248:252], axis=-1) + hl[:, 254] + hl[:, 255]
+            b2 = (
+                numpy.sum(hl[:, 244:248], axis=-1)
+                + hl[:, 250]
+                + hl[:, 251]
+                + hl[:, 253]
+                + hl[:, 255]
+            )
+            s[large] += fgra_large_range_contributions(
+                hl[:, 252:256], b1, b2, numpy.float64(m)
+            )
+        estimate = (
+            numpy.power(numpy.float64(m), 1.0 + 1.0 / fgra_tau)
+            * numpy.power(2.0, 2 - p)
+            * numpy.power(s, -1.0 / fgra_tau)
+            / (1.0 + (1.0 + fgra_tau) * fgra_relative_variance / (2.0 * m))
+        )
+    estimate[c0 == m] = 0.0
+    return estimate.reshape(histograms.shape[:-1])[()]
+
+
+def fgra_estimate(registers):
+    return fgra_estimate_from_histograms(
+        register_histograms(registers), precision_from_registers(registers)
+    )
+
+
+# The maximum likelihood estimators use the Poisson model, in which the
+# update values u = 1, ..., 65 - p of a register are set independently with
+# probability 1 - exp(-x * rates[u - 1]) where x = n / m. The log-likelihood
+# is -alpha * x + sum_u beta[u - 1] * log(1 - exp(-x * rates[u - 1])) with
+# alpha being the sum of rates of update values known to be absent and
+# beta[u - 1] being the number of registers in which update value u is known
+# to be present. Both are obtained from the register histogram by a matrix
+# product with the tables below.
+ml_relative_tolerance = 1e-12
+ml_max_iterations = 100
+
+
+@functools.lru_cache(maxsize=None)
+def ml_rates(p):
+    rates = numpy.power(2.0, -numpy.arange(1, 66 - p))
+    rates[-1] *= 2.0
+    return rates
+
+
+@functools.lru_cache(maxsize=None)
+def ml_tables(p):
+    num_update_values = 65 - p
+    rates = ml_rates(p)
+    absent = numpy.zeros(256)
+    present = numpy.zeros((256, num_update_values))
+    absent[0] = numpy.sum(rates)
+    for r in range(4 * p - 4, 256):
+        u = (r >> 2) - p + 2
+        absent[r] = numpy.sum(rates[u:])
+        present[r, u - 1] = 1.0
+        for shift, bit in ((1, 2), (2, 1)):
+            if u - shift >= 1:
+                if r & bit:
+                    present[r, u - shift - 1] = 1.0
+                else:
+                    absent[r] += rates[u - shift - 1]
+    return absent, present
+
+
+@functools.lru_cache(maxsize=None)
+def hll_ml_tables(p):
+    num_update_values = 65 - p
+    rates = ml_rates(p)
+    absent = numpy.zeros(64)
+    present = numpy.zeros((64, num_update_values))
+    absent[0] = numpy.sum(rates)
+    for r in range(1, num_update_values + 1):
+        absent[r] = numpy.sum(rates[r:])
+        present[r, r - 1] = 1.0
+    return absent, present
+
+
+def ml_phi(t):
+    # t / expm1(t) and its derivative, for t >= 0
+    small = t < 1e-4
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        q = numpy.exp(-t)
+        s = q / -numpy.expm1(-t)
+        phi = numpy.where(small, 1.0 - t * (0.5 - t / 12.0), t * s)
+        phi_derivative = numpy.where(
+            small, t * (1.0 / 6.0 - t * t / 180.0) - 0.5, s * (1.0 - t * (1.0 + s))
+        )
+    return phi, phi_derivative
+
+
+def ml_solve(alpha, beta, rates, initial_x):
+    # Solves sum_u beta[u - 1] * phi(x * rates[u - 1]) = alpha * x with
+    # phi(t) = t / expm1(t) for x. The left-hand side minus the right-hand
+    # side is convex and decreasing in x. Therefore, Newton iterations never
+    # overshoot the root after the first step. They are safeguarded by the
+    # bracket [sum(beta) / (alpha + sum(beta * rates) / 2), sum(beta) / alpha]
+    # which follows from 1 - t / 2 <= phi(t) <= 1.
+    alpha = numpy.asarray(alpha, dtype=numpy.float64)
+    beta = numpy.asarray(beta, dtype=numpy.float64)
+    beta_sum = numpy.sum(beta, axis=-1)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        lower = beta_sum / (alpha + 0.5 * (beta @ rates))
+        upper = beta_sum / alpha
+    x = numpy.where(beta_sum > 0, numpy.inf, 0.0)
+    active = numpy.flatnonzero((beta_sum > 0) & (alpha > 0))
+    lower = lower[active]
+    upper = upper[active]
+    xa = numpy.clip(numpy.broadcast_to(initial_x, x.shape)[active], lower, upper)
+    xa = numpy.where(numpy.isfinite(xa), xa, lower)
+    for _ in range(ml_max_iterations):
+        if len(active) == 0:
+            break
+        phi, phi_derivative = ml_phi(xa[:, None] * rates)
+        ba = beta[active]
+        g = numpy.sum(ba * phi, axis=-1) - alpha[active] * xa
+        g_derivative = numpy.sum(ba * rates * phi_derivative, axis=-1) - alpha[active]
+        lower = numpy.where(g > 0, xa, lower)
+        upper = numpy.where(g < 0, xa, upper)
+        x_new = numpy.clip(xa - g / g_derivative, lower, upper)
+        converged = (numpy.abs(x_new - xa) <= ml_relative_tolerance * x_new) | (g == 0)
+        x[active[converged]] = x_new[converged]
+        keep = ~converged
+        active = active[keep]
+        xa = x_new[keep]
+        lower = lower[keep]
+        upper = upper[keep]
+    x[active] = xa
+    return x
+
+
+def ml_estimate_from_statistics(alpha, beta, p, initial_estimate, bias_correction):
+    m = 1 << p
+    x = ml_solve(alpha, beta, ml_rates(p), numpy.asarray(initial_estimate) / m)
+    return m * x / (1.0 + bias_correction / m)
+
+
+# The first-order bias of the maximum likelihood estimate is approximately
+# bias_correction / m times the distinct count, see the asymptotic bias
+# formula of Cox and Snell averaged over the periodic dependence on log(n).
+ml_bias_correction = 0.48147376527720065
+
+
+def ml_estimate_from_histograms(histograms, p, initial_estimate=None):
+    histograms = numpy.asarray(histograms)
+    if initial_estimate is None:
+        initial_estimate = fgra_estimate_from_histograms(histograms, p)
+    absent, present = ml_tables(p)
+    h = numpy.atleast_2d(histograms)
+    estimate = ml_estimate_from_statistics(
+        h @ absent,
+        h @ present,
+        p,
+        numpy.reshape(initial_estimate, -1),
+        ml_bias_correction,
+    )
+    return estimate.reshape(histograms.shape[:-1])[()]
+
+
+def ml_estimate(registers):
+    return ml_estimate_from_histograms(
+        register_histograms(registers), precision_from_registers(registers)
+    )
+
+
+# The corrected raw estimator for HyperLogLog registers storing the number of
+# leading zeros plus one, see O. Ertl, "New cardinality estimation algorithms
+# for HyperLogLog sketches", 2017.
+def hll_sigma(x):
+    x = numpy.array(x, dtype=numpy.float64)
+    result = x.copy()
+    y = 1.0
+    for _ in range(64):
+        x = x * x
+        result += x * y
+        y += y
+    return numpy.where(x == 1.0, numpy.inf, result)
+
+
+def hll_tau(x):
+    x = numpy.array(x, dtype=numpy.float64)
+    result = 1.0 - x
+    y = 1.0
+    for _ in range(64):
+        x = numpy.sqrt(x)
+        y *= 0.5
+        result -= numpy.square(1.0 - x) * y
+    return result / 3.0
+
+
+def hll_corrected_raw_estimate_from_histograms(histograms, p):
+    histograms = numpy.asarray(histograms)
+    m = 1 << p
+    q = 64 - p
+    h = numpy.atleast_2d(histograms)
+    s = h[:, 1 : q + 1] @ numpy.power(2.0, -numpy.arange(1, q + 1))
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        s += m * hll_sigma(h[:, 0] / m)
+        s += m * hll_tau(1.0 - h[:, q + 1] / m) * numpy.power(2.0, -q)
+        estimate = m * m / (2.0 * numpy.log(2.0) * s)
+    return estimate.reshape(histograms.shape[:-1])[()]
+
+
+def hll_corrected_raw_estimate(registers):
+    return hll_corrected_raw_estimate_from_histograms(
+        register_histograms(registers, 64), precision_from_registers(registers)
+    )
+
+
+hll_ml_bias_correction = 1.0101590804141418
+
+
+def hll_ml_estimate_from_histograms(histograms, p, initial_estimate=None):
+    histograms = numpy.asarray(histograms)
+    if initial_estimate is None:
+        initial_estimate = hll_corrected_raw_estimate_from_histograms(histograms, p)
+    absent, present = hll_ml_tables(p)
+    h = numpy.atleast_2d(histograms)
+    estimate = ml_estimate_from_statistics(
+        h @ absent,
+        h @ present,
+        p,
+        numpy.reshape(initial_estimate, -1),
+        hll_ml_bias_correction,
+    )
+    return estimate.reshape(histograms.shape[:-1])[()]
+
+
+def hll_ml_estimate(registers):
+    return hll_ml_estimate_from_histograms(
+        register_histograms(registers, 64), precision_from_registers(registers)
+    )
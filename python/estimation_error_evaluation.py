@@ -29,6 +29,7 @@ import csv
 import matplotlib.pyplot as plt
 import mvp
 from math import sqrt
+from downsampling import downsample_log_x, max_points_for_figure
 
 
 def read_data(data_file):
@@ -68,10 +69,16 @@ def to_percent(values):
     return [100.0 * v for v in values]
 
 
+def plot_downsampled(ax, x, y, **kwargs):
+    ax.plot(*downsample_log_x(x, y, max_points), **kwargs)
+
+
 colors = ["C2", "C0", "C1"]
+dpi = 1200
 
 fig, axs = plt.subplots(3, 1, sharex=True)
 fig.set_size_inches(5, 5.2)
+max_points = max_points_for_figure(fig, dpi)
 
 pvals = [8, 12, 16]
 
@@ -119,63 +126,72 @@ for pidx in range(len(pvals)):
     rel_error_ml_theory = sqrt(mvp.mvp_ml(b=2, d=2, q=6).mvp / (8 * pow(2, p)))
     rel_error_fgra_theory = sqrt(mvp.mvp_gra(b=2, d=2, q=6).mvp / (8 * pow(2, p)))
 
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent([rel_error_martingale_theory] * len(values["distinct count"])),
         label="martingale theory",
         color=colors[2],
         linestyle="dotted",
     )
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent([rel_error_ml_theory] * len(values["distinct count"])),
         label="ML theory",
         color=colors[2],
         linestyle="dashed",
     )
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent([rel_error_fgra_theory] * len(values["distinct count"])),
         label="FGRA theory",
         color=colors[2],
     )
 
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent(values["relative rmse martingale"]),
         label="martingale rmse",
         color=colors[1],
         linestyle="dotted",
     )
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent(values["relative rmse maximum likelihood"]),
         label="ML rmse",
         color=colors[1],
         linestyle="dashed",
     )
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent(values["relative rmse default"]),
         label="FGRA rmse",
         color=colors[1],
     )
 
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent(values["relative bias martingale"]),
         label="martingale bias",
         color=colors[0],
         linestyle="dotted",
     )
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent(values["relative bias maximum likelihood"]),
         label="ML bias",
         color=colors[0],
         linestyle="dashed",
     )
-    ax.plot(
+    plot_downsampled(
+        ax,
         values["distinct count"],
         to_percent(values["relative bias default"]),
         label="FGRA bias",
@@ -213,7 +229,7 @@ fig.subplots_adjust(top=0.995, bottom=0.075, left=0.095, right=0.975, hspace=0.0
 fig.savefig(
     "paper/estimation_error.pdf",
     format="pdf",
-    dpi=1200,
+    dpi=dpi,
     metadata={"CreationDate": None, "ModDate": None},
 )
 plt.close(fig)
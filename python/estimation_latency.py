@@ -0,0 +1,82 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import csv
+import numpy
+import os
+import time
+import estimation
+import ull
+
+precisions = range(ull.min_p, 21)
+num_elements = 1000000
+min_duration_in_seconds = 0.2
+
+estimators = {
+    "fgra": estimation.fgra_estimate_from_histograms,
+    "ml": estimation.ml_estimate_from_histograms,
+}
+
+
+def measure(sketch, estimator):
+    # returns the average time of a single estimation in seconds
+    sketch.get_distinct_count_estimate(estimator)
+    num_iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(num_iterations):
+            sketch.get_distinct_count_estimate(estimator)
+        duration = time.perf_counter() - start
+        if duration >= min_duration_in_seconds:
+            return duration / num_iterations
+        num_iterations *= 2
+
+
+def run(output_file):
+    hashes = numpy.random.default_rng(0).integers(
+        0, 1 << 64, num_elements, dtype=numpy.uint64, endpoint=False
+    )
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(
+            ["p", "estimator", "register scan (s)", "tracked histogram (s)"]
+        )
+        for p in precisions:
+            sketch = ull.UltraLogLog(p).add_many(hashes)
+            tracked_sketch = ull.UltraLogLog(p, track_histogram=True).add_many(hashes)
+            for name, estimator in estimators.items():
+                row = [
+                    p,
+                    name,
+                    measure(sketch, estimator),
+                    measure(tracked_sketch, estimator),
+                ]
+                writer.writerow(row)
+                print(*row)
+
+
+run("results/python/estimation-latency.csv")
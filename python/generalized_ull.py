@@ -0,0 +1,403 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import functools
+import numpy
+import os
+import time
+import bit_packing
+import estimation
+import memory
+import mvp
+import ull
+
+# Generalized sketches with parameters (q, d, b) as analyzed in mvp.py. The
+# register with index given by the first p hash bits stores the maximum
+# update value u in q bits and, in d further bits, which of the update values
+# u - 1, ..., u - d have occurred. The register value is (u << d) | bits,
+# where the bit for u - j is at position d - j, hence ULL corresponds to
+# q = 6, d = 2, and b = 2 up to the offset p - 2 of u.
+#
+# Update values k >= 1 have probability (b - 1) * b^(-k). The base is
+# restricted to b = 2^(1/r) for efficient hashing: the remaining hash bits
+# with a sentinel bit at position p - 1 give the number of leading zeros nlz
+# and the fraction f of the bits below the leading one. Then k =
+# ceil(-r * log2((1 + f) / 2^(nlz + 1))) = r * (nlz + 1) - j with j =
+# floor(r * log2(1 + f)), which is determined by comparing f with r - 1
+# fixed-point thresholds. Update values greater than 2^q - 1 are reduced to
+# 2^q - 1.
+
+max_register_bits = 64
+
+# Empirical MVPs of the ML estimator, measured after adding random hashes,
+# with the distinct counts spread over one octave, which is r periods of the
+# periodic dependence on log_b(n). As the theory assumes a Poisson
+# distributed number of elements, the relative variance 1 / n of the latter
+# is added to the squared relative errors of the fixed distinct counts n.
+# (q, d, r)
+experiment_configs = [(6, 0, 1), (6, 2, 1), (7, 8, 2), (8, 16, 4), (8, 20, 4)]
+experiment_p = 10
+experiment_num_sketches = 3000
+experiment_min_distinct_count = 100000
+experiment_num_distinct_counts = 8
+experiment_seed = 0
+result_file = "results/python/generalized-ull.csv"
+
+
+def register_dtype(q, d):
+    for dtype in (numpy.uint8, numpy.uint16, numpy.uint32):
+        if q + d <= 8 * numpy.dtype(dtype).itemsize:
+            return dtype
+    return numpy.uint64
+
+
+@functools.lru_cache(maxsize=None)
+def fraction_thresholds(r):
+    # the fractions f with f * 2^52 >= thresholds[j - 1] have
+    # floor(r * log2(1 + f)) >= j
+    return numpy.array(
+        [round((2.0 ** (j / r) - 1.0) * 2.0**52) for j in range(1, r)],
+        dtype=numpy.uint64,
+    )
+
+
+def max_update_value(p, q, r):
+    return min((1 << q) - 1, r * (65 - p))
+
+
+@functools.lru_cache(maxsize=None)
+def ml_rates(p, q, r):
+    # probabilities of the update values 1, ..., max_update_value, where the
+    # last one absorbs the probabilities of all greater values
+    b = 2.0 ** (1.0 / r)
+    k = numpy.arange(1, max_update_value(p, q, r) + 1)
+    rates = (b - 1.0) * numpy.power(b, -k.astype(float))
+    rates[-1] = numpy.power(b, -(k[-1] - 1.0))
+    return rates
+
+
+def split_hashes(hashes, p, q, r):
+    idx = (hashes >> numpy.uint64(64 - p)).astype(numpy.intp)
+    x = (hashes << numpy.uint64(p)) | numpy.uint64(1 << (p - 1))
+    # after shifting out all but the 53 most significant bits of x, the
+    # conversion to double is exact and its mantissa holds the (up to 52)
+    # fraction bits following the leading one at position e
+    e = ull.highest_bit_positions(x).astype(numpy.int64)
+    shift = numpy.maximum(e - 52, 0).astype(numpy.uint64)
+    v = (x >> shift).astype(numpy.float64).view(numpy.uint64)
+    fraction = v & numpy.uint64((1 << 52) - 1)
+    k = r * (64 - e)
+    for threshold in fraction_thresholds(r):
+        k -= fraction >= threshold
+    return idx, numpy.minimum(k, max_update_value(p, q, r))
+
+
+def shifted_bits(registers, u, d):
+    # the update values known to be present in the registers, relative to the
+    # maximum update values u >= registers >> d, as d bits
+    registers = registers.astype(numpy.uint64)
+    old_u = registers >> numpy.uint64(d)
+    present = (registers & numpy.uint64((1 << d) - 1)) | numpy.where(
+        old_u > 0, numpy.uint64(1 << d), numpy.uint64(0)
+    )
+    shift = numpy.minimum(u.astype(numpy.uint64) - old_u, numpy.uint64(63))
+    return present >> shift
+
+
+def pack_registers(u, bits, d, dtype):
+    u = u.astype(numpy.uint64)
+    bits = bits & numpy.uint64((1 << d) - 1)
+    return ((u << numpy.uint64(d)) | bits).astype(dtype)
+
+
+def update_registers(registers, idx, k, d):
+    if len(idx) == 0:
+        return
+    if 16 * len(idx) < len(registers):
+        touched, positions = numpy.unique(idx, return_inverse=True)
+        old = registers[touched]
+    else:
+        # registers that were not hit keep their values as k >= 1
+        touched, positions = slice(None), idx
+        old = registers
+    max_k = numpy.zeros(len(old), dtype=numpy.int64)
+    numpy.maximum.at(max_k, positions, k)
+    u = numpy.maximum(old.astype(numpy.int64) >> d, max_k)
+    # update values more than d below the maximum do not affect the register
+    distance = u[positions] - k
+    relevant = (distance >= 1) & (distance <= d)
+    bits = numpy.zeros(len(old), dtype=numpy.uint64)
+    numpy.bitwise_or.at(
+        bits,
+        positions[relevant],
+        numpy.left_shift(
+            numpy.uint64(1), (d - distance[relevant]).astype(numpy.uint64)
+        ),
+    )
+    registers[touched] = pack_registers(
+        u, shifted_bits(old, u, d) | bits, d, registers.dtype
+    )
+
+
+def merge_registers(registers1, registers2, d):
+    u = numpy.maximum(registers1 >> d, registers2 >> d)
+    return pack_registers(
+        u,
+        shifted_bits(registers1, u, d) | shifted_bits(registers2, u, d),
+        d,
+        registers1.dtype,
+    )
+
+
+def ml_statistics(registers, p, q, d, r):
+    # alpha is the sum of the probabilities of all update values known to be
+    # absent, beta[k - 1] the number of registers in which update value k is
+    # known to be present
+    rates = ml_rates(p, q, r)
+    tails = numpy.concatenate((numpy.cumsum(rates[::-1])[::-1], [0.0]))
+    u = (registers >> d).astype(numpy.intp)
+    alpha = numpy.sum(tails[u])
+    beta = numpy.bincount(u[u > 0] - 1, minlength=len(rates)).astype(numpy.float64)
+    for j in range(1, d + 1):
+        v = u - j
+        present = ((registers >> (d - j)) & 1).astype(bool)
+        alpha += numpy.sum(rates[v[(v >= 1) & ~present] - 1])
+        beta += numpy.bincount(v[present] - 1, minlength=len(rates))
+    return alpha, beta
+
+
+def present_log_likelihood_derivatives(x, rates):
+    # probabilities 1 - exp(-x * rates) that update values with the given
+    # rates are present and the first three derivatives of their logarithms
+    # with respect to x
+    absent = numpy.exp(-x * rates)
+    present = -numpy.expm1(-x * rates)
+    d1 = rates * absent / present
+    d2 = -rates * d1 / present
+    d3 = -rates * d2 * (1.0 + absent) / present
+    return present, d1, d2, d3
+
+
+@functools.lru_cache(maxsize=None)
+def ml_bias_correction(d, r, num_phases=64):
+    # The first-order bias of the maximum likelihood estimate is approximately
+    # bias_correction / m times the distinct count, see the asymptotic bias
+    # formula of Cox and Snell averaged over the periodic dependence on
+    # log_b(n). Given the maximum update value u, the d indicators are
+    # independent, hence the expectations E[l'^2], E[l' l''], and E[l''']
+    # of the log-likelihood l of a register are sums over u of simple terms.
+    # This reproduces the constants of estimation.py for ULL and HLL.
+    b = 2.0 ** (1.0 / r)
+    x0 = 1e6
+    u = numpy.arange(1, int(numpy.log(x0) / numpy.log(b)) + 64 * r)
+    rates = (b - 1.0) * numpy.power(b, -u.astype(float))
+    tails = numpy.power(b, -u.astype(float))
+    corrections = []
+    for phase in range(num_phases):
+        x = x0 * b ** (phase / num_phases)
+        present, d1, d2, d3 = present_log_likelihood_derivatives(x, rates)
+        # u is present and all greater update values are absent
+        probabilities = numpy.exp(-x * tails) * present
+        l1 = d1 - tails
+        fisher = l1 * l1
+        covariance = l1 * d2
+        third = d3.copy()
+        indicator_fisher = present * d1 * d1 + (1.0 - present) * rates * rates
+        for j in range(1, d + 1):
+            shift = numpy.zeros(j)
+            fisher += numpy.concatenate((shift, indicator_fisher[:-j]))
+            covariance += numpy.concatenate((shift, (present * d1 * d2)[:-j]))
+            covariance += l1 * numpy.concatenate((shift, (present * d2)[:-j]))
+            third += numpy.concatenate((shift, (present * d3)[:-j]))
+        fisher = numpy.sum(probabilities * fisher)
+        covariance = numpy.sum(probabilities * covariance)
+        third = numpy.sum(probabilities * third)
+        corrections.append((covariance + 0.5 * third) / (fisher * fisher * x))
+    return float(numpy.mean(corrections))
+
+
+def ml_estimate(registers, p, q, d, r):
+    m = 1 << p
+    alpha, beta = ml_statistics(registers, p, q, d, r)
+    x = estimation.ml_solve(
+        numpy.array([alpha]), beta[None, :], ml_rates(p, q, r), numpy.zeros(1)
+    )[0]
+    return m * x / (1.0 + ml_bias_correction(d, r) / m)
+
+
+class GeneralizedUltraLogLog:
+
+    def __init__(self, p, q=8, d=20, r=4):
+        if not ull.min_p <= p <= ull.max_p:
+            raise ValueError("illegal precision parameter " + str(p))
+        if q < 1 or d < 0 or q + d > max_register_bits:
+            raise ValueError("illegal register parameters " + str((q, d)))
+        if r < 1:
+            raise ValueError("illegal base parameter " + str(r))
+        self.p = p
+        self.q = q
+        self.d = d
+        self.r = r
+        self.registers = numpy.zeros(1 << p, dtype=register_dtype(q, d))
+
+    @classmethod
+    def wrap(cls, state, p, q=8, d=20, r=4):
+        # the state does not encode the parameters, they must be given
+        sketch = cls(p, q, d, r)
+        words = numpy.frombuffer(state, dtype="<u8")
+        if len(words) != -(-((q + d) << p) // 64):
+            raise ValueError("illegal state length " + str(len(state)))
+        registers = bit_packing.unpack_bits(words, q + d, 1 << p)
+        sketch.registers[:] = registers.astype(sketch.registers.dtype)
+        return sketch
+
+    def get_state(self):
+        # the registers bit-packed into little-endian 64-bit words
+        values = self.registers.astype(numpy.uint64)
+        return bit_packing.pack_bits(values, self.q + self.d).tobytes()
+
+    def serialized_size_in_bytes(self):
+        return 8 * -(-self.bit_size() // 64)
+
+    def in_memory_size_in_bytes(self):
+        return memory.get_in_memory_size(self)
+
+    @property
+    def b(self):
+        return 2.0 ** (1.0 / self.r)
+
+    def copy(self):
+        sketch = GeneralizedUltraLogLog.__new__(GeneralizedUltraLogLog)
+        sketch.p = self.p
+        sketch.q = self.q
+        sketch.d = self.d
+        sketch.r = self.r
+        sketch.registers = self.registers.copy()
+        return sketch
+
+    def reset(self):
+        self.registers[:] = 0
+        return self
+
+    def add(self, hash_value):
+        hash_value = int(hash_value) & 0xFFFFFFFFFFFFFFFF
+        return self.add_hash_array(numpy.array([hash_value], dtype=numpy.uint64))
+
+    def add_many(self, hashes):
+        for chunk in ull.hash_chunks(hashes):
+            self.add_hash_array(chunk)
+        return self
+
+    def add_hash_array(self, hashes):
+        idx, k = split_hashes(hashes, self.p, self.q, self.r)
+        update_registers(self.registers, idx, k, self.d)
+        return self
+
+    def merge(self, other):
+        if (other.p, other.q, other.d, other.r) != (self.p, self.q, self.d, self.r):
+            raise ValueError("parameters do not match")
+        self.registers[:] = merge_registers(self.registers, other.registers, self.d)
+        return self
+
+    def bit_size(self):
+        # the size of the registers if bit-packed
+        return (self.q + self.d) << self.p
+
+    def get_distinct_count_estimate(self):
+        return float(ml_estimate(self.registers, self.p, self.q, self.d, self.r))
+
+
+def measure_mvp(q, d, r, rng):
+    p = experiment_p
+    distinct_counts = numpy.round(
+        experiment_min_distinct_count
+        * numpy.power(
+            2.0,
+            (numpy.arange(experiment_num_distinct_counts) + 0.5)
+            / experiment_num_distinct_counts,
+        )
+    ).astype(int)
+    squared_errors = numpy.zeros((experiment_num_sketches, len(distinct_counts)))
+    sketch = GeneralizedUltraLogLog(p, q, d, r)
+    for i in range(experiment_num_sketches):
+        sketch.reset()
+        n = 0
+        for j, distinct_count in enumerate(distinct_counts):
+            sketch.add_hash_array(
+                rng.integers(0, 1 << 64, distinct_count - n, dtype=numpy.uint64)
+            )
+            n = distinct_count
+            squared_errors[i, j] = (
+                sketch.get_distinct_count_estimate() / n - 1.0
+            ) ** 2 + 1.0 / n
+    # the errors of the same sketch are correlated, hence the standard error
+    # is estimated from their means per sketch
+    per_sketch = squared_errors.mean(axis=1) * sketch.bit_size()
+    return per_sketch.mean(), per_sketch.std(ddof=1) / numpy.sqrt(len(per_sketch))
+
+
+if __name__ == "__main__":
+    rng = numpy.random.default_rng(experiment_seed)
+    os.makedirs(os.path.dirname(result_file), exist_ok=True)
+    with open(result_file, "w") as f:
+        f.write(
+            "p; q; d; b; register bits; theoretical MVP; empirical MVP; "
+            "standard error\n"
+        )
+        for q, d, r in experiment_configs:
+            start = time.perf_counter()
+            b = 2.0 ** (1.0 / r)
+            theory = mvp.mvp_ml_func(q, d, b)
+            empirical, standard_error = measure_mvp(q, d, r, rng)
+            f.write(
+                "; ".join(
+                    str(v)
+                    for v in (
+                        experiment_p,
+                        q,
+                        d,
+                        b,
+                        q + d,
+                        theory,
+                        empirical,
+                        standard_error,
+                    )
+                )
+                + "\n"
+            )
+            print(
+                "q = %d, d = %d, b = %g: theory %.4f, simulation %.4f +- %.4f (%.1fs)"
+                % (
+                    q,
+                    d,
+                    b,
+                    theory,
+                    empirical,
+                    standard_error,
+                    time.perf_counter() - start,
+                ),
+                flush=True,
+            )
@@ -0,0 +1,373 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+
+# Vectorized implementation of the 64-bit variant of XXH3 with seed 0 and the
+# default secret. The hash values are identical to those of hash4j
+# (Hashing.xxh3_64()), hence sketches built from keys hashed in Python can be
+# merged with sketches built in Java from the same keys. The hash of a 64-bit
+# integer equals that of its 8 bytes in little-endian order, which is what
+# hashLongToLong of hash4j computes. Byte strings are given in packed form as
+# a byte buffer and an offset array of size n + 1 like in Apache Arrow.
+
+secret = numpy.frombuffer(
+    bytes.fromhex(
+        "b8fe6c3923a44bbe7c01812cf721ad1cded46de9839097db7240a4a4b7b3671f"
+        "cb79e64eccc0e578825ad07dccff7221b8084674f743248ee03590e6813a264c"
+        "3c2852bb91c300cb88d0658b1b532ea371644897a20df94e3819ef46a9deacd8"
+        "a8fa763fe39c343ff9dcbbc7c70b4f1d8a51e04bcdb45931c89f7ec9d9787364"
+        "eac5ac8334d3ebc3c581a0fffa1363eb170ddd51b7f0da49d316552629d4689e"
+        "2b16be587d47a1fc8ff8b8d17ad031ce45cb3a8f95160428afd7fbcabb4b407e"
+    ),
+    dtype=numpy.uint8,
+)
+
+prime32_1 = numpy.uint64(0x9E3779B1)
+prime32_2 = numpy.uint64(0x85EBCA77)
+prime32_3 = numpy.uint64(0xC2B2AE3D)
+prime64_1 = numpy.uint64(0x9E3779B185EBCA87)
+prime64_2 = numpy.uint64(0xC2B2AE3D27D4EB4F)
+prime64_3 = numpy.uint64(0x165667B19E3779F9)
+prime64_4 = numpy.uint64(0x85EBCA77C2B2AE63)
+prime64_5 = numpy.uint64(0x27D4EB2F165667C5)
+mask32 = numpy.uint64(0xFFFFFFFF)
+
+block_len = 1024
+stripe_len = 64
+stripes_per_block = (len(secret) - stripe_len) // 8
+chunk_size = 1 << 14
+# byte strings need many temporaries, which are kept below the size at which
+# they are allocated by mmap
+bytes_chunk_size = 1 << 13
+long_chunk_size = 1 << 10
+
+
+def u64(x):
+    return numpy.uint64(x)
+
+
+def read(data, pos, dtype, count=1):
+    # count consecutive little-endian values starting at each byte offset in
+    # pos, the bytes at an offset are gathered at once as a single element of
+    # an overlapping view, which is much faster than gathering each value
+    size = numpy.dtype(dtype).itemsize * count
+    windows = numpy.ndarray(
+        (max(len(data) - size + 1, 0),),
+        dtype="V" + str(size),
+        buffer=data,
+        strides=(1,),
+    )
+    return windows[pos].view(dtype).reshape(numpy.shape(pos) + (count,))
+
+
+def read64(data, pos):
+    return read(data, pos, "<u8")[..., 0]
+
+
+def read32(data, pos):
+    return read(data, pos, "<u4")[..., 0].astype(numpy.uint64)
+
+
+def secret64(offset):
+    return secret[offset : offset + 8].view("<u8")[0]
+
+
+def secret32(offset):
+    return numpy.uint64(secret[offset : offset + 4].view("<u4")[0])
+
+
+def rotl(x, r):
+    return (x << u64(r)) | (x >> u64(64 - r))
+
+
+def swap64(x):
+    return x.byteswap()
+
+
+def mul128_fold64(a, b):
+    # the temporaries are reused by in-place operations, which is
+    # considerably faster, the arguments are not modified
+    a_lo = a & mask32
+    a_hi = a >> u64(32)
+    b_lo = b & mask32
+    b_hi = b >> u64(32)
+    lo_lo = a_lo * b_lo
+    hi_lo = numpy.multiply(a_hi, b_lo, out=b_lo)
+    cross = numpy.multiply(a_lo, b_hi, out=a_lo)
+    upper = numpy.multiply(a_hi, b_hi, out=a_hi)
+    t = numpy.right_shift(lo_lo, u64(32), out=b_hi)
+    cross += t
+    numpy.bitwise_and(hi_lo, mask32, out=t)
+    cross += t
+    hi_lo >>= u64(32)
+    upper += hi_lo
+    numpy.right_shift(cross, u64(32), out=t)
+    upper += t
+    lo_lo &= mask32
+    cross <<= u64(32)
+    cross |= lo_lo
+    cross ^= upper
+    return cross
+
+
+def xxh64_avalanche(h):
+    h = h ^ (h >> u64(33))
+    h = h * prime64_2
+    h = h ^ (h >> u64(29))
+    h = h * prime64_3
+    return h ^ (h >> u64(32))
+
+
+def avalanche(h):
+    h = h ^ (h >> u64(37))
+    h = h * u64(0x165667919E3779F9)
+    return h ^ (h >> u64(32))
+
+
+def rrmxmx(h, length):
+    # updates h in place, the in-place operations are considerably faster
+    t = numpy.left_shift(h, u64(49))
+    t2 = numpy.right_shift(h, u64(15))
+    t |= t2
+    numpy.left_shift(h, u64(24), out=t2)
+    t ^= t2
+    numpy.right_shift(h, u64(40), out=t2)
+    t ^= t2
+    h ^= t
+    h *= u64(0x9FB21C651E98DF25)
+    numpy.right_shift(h, u64(35), out=t)
+    t += length
+    h ^= t
+    h *= u64(0x9FB21C651E98DF25)
+    numpy.right_shift(h, u64(28), out=t)
+    h ^= t
+    return h
+
+
+def hash_4to8(input1, input2, length, out=None):
+    h = numpy.left_shift(input1, u64(32), out=out)
+    h += input2
+    h ^= secret64(8) ^ secret64(16)
+    return rrmxmx(h, length)
+
+
+def mix16(data, pos, secret_offset):
+    words = read(data, pos, "<u8", 2)
+    return mul128_fold64(
+        words[:, 0] ^ secret64(secret_offset),
+        words[:, 1] ^ secret64(secret_offset + 8),
+    )
+
+
+def hash_longs(values):
+    # equivalent to hashing the 8 bytes of each value in little-endian order
+    values = numpy.asarray(values)
+    if values.dtype != numpy.uint64:
+        values = values.astype(numpy.int64, copy=False).view(numpy.uint64)
+    result = numpy.empty(values.shape, dtype=numpy.uint64)
+    values = values.reshape(-1)
+    # chunks small enough to keep all temporaries in cache
+    for start in range(0, values.size, chunk_size):
+        v = values[start : start + chunk_size]
+        out = result.reshape(-1)[start : start + chunk_size]
+        hash_4to8(v & mask32, v >> u64(32), u64(8), out)
+    return result
+
+
+def hash_ints(values):
+    # equivalent to hashing the 4 bytes of each value in little-endian order
+    values = numpy.asarray(values)
+    if values.dtype != numpy.uint32:
+        values = values.astype(numpy.int32, copy=False).view(numpy.uint32)
+    result = numpy.empty(values.shape, dtype=numpy.uint64)
+    values = values.reshape(-1)
+    for start in range(0, values.size, chunk_size):
+        v = values[start : start + chunk_size].astype(numpy.uint64)
+        out = result.reshape(-1)[start : start + chunk_size]
+        hash_4to8(v, v, u64(4), out)
+    return result
+
+
+def hash_long_inputs(data, start, length):
+    # inputs longer than 240 bytes, vectorized over the inputs, the stripes
+    # of a block are accumulated at once as the accumulation is commutative
+    acc = numpy.tile(
+        numpy.array(
+            [
+                prime32_3,
+                prime64_1,
+                prime64_2,
+                prime64_3,
+                prime64_4,
+                prime32_2,
+                prime64_5,
+                prime32_1,
+            ],
+            dtype=numpy.uint64,
+        ),
+        (len(start), 1),
+    )
+    keys = secret[: stripes_per_block * 8 + stripe_len - 8].view("<u8")
+    keys = numpy.lib.stride_tricks.sliding_window_view(keys, 8)
+    last_key = secret[len(secret) - stripe_len - 7 : len(secret) - 7].view("<u8")
+    scramble_key = secret[-stripe_len:].view("<u8")
+    merge_key = secret[11 : 11 + stripe_len].view("<u8")
+    swap = numpy.arange(8) ^ 1
+    stripe_offsets = stripe_len * numpy.arange(stripes_per_block)
+
+    def accumulate(j, pos, keys):
+        # accumulates the stripes at the byte offsets pos of shape (k, s)
+        stripes = read(data, pos, "<u8", 8).reshape(pos.shape + (8,))
+        data_key = stripes ^ keys
+        products = (data_key & mask32) * (data_key >> u64(32))
+        products += stripes[:, :, swap]
+        acc[j] += products.sum(axis=1)
+
+    # the full blocks, restricted to the inputs having them
+    num_blocks = (length - 1) // block_len
+    for b in range(int(num_blocks.max())):
+        j = subset(num_blocks > b)
+        accumulate(j, (start[j] + b * block_len)[:, None] + stripe_offsets, keys)
+        a = acc[j]
+        a ^= a >> u64(47)
+        a ^= scramble_key
+        a *= prime32_1
+        acc[j] = a
+
+    # the stripes of the last partial block followed by the last stripe,
+    # which has its own key, grouped by the number of stripes
+    num_stripes = (length - 1 - num_blocks * block_len) // stripe_len
+    offset = start + num_blocks * block_len
+    last = start + length - stripe_len
+    for n in numpy.unique(num_stripes):
+        j = subset(num_stripes == n)
+        pos = numpy.concatenate(
+            (offset[j][:, None] + stripe_offsets[:n], last[j][:, None]), axis=1
+        )
+        accumulate(j, pos, numpy.concatenate((keys[:n], last_key[None])))
+
+    h = mul128_fold64(acc[:, 0::2] ^ merge_key[0::2], acc[:, 1::2] ^ merge_key[1::2])
+    return avalanche(length.astype(numpy.uint64) * prime64_1 + h.sum(axis=1))
+
+
+def hash_bytes(data, offsets):
+    data = numpy.frombuffer(data, dtype=numpy.uint8)
+    offsets = numpy.asarray(offsets, dtype=numpy.int64)
+    result = numpy.empty(len(offsets) - 1, dtype=numpy.uint64)
+    # chunks of strings bound the size of all temporaries
+    for first in range(0, len(result), bytes_chunk_size):
+        chunk_offsets = offsets[first : first + bytes_chunk_size + 1]
+        result[first : first + bytes_chunk_size] = hash_bytes_chunk(
+            data, chunk_offsets[:-1], numpy.diff(chunk_offsets)
+        )
+    return result
+
+
+def subset(condition):
+    # the indices where the condition holds, None if it never holds, and a
+    # slice if it always holds, which avoids the gathers
+    i = numpy.flatnonzero(condition)
+    if len(i) == 0:
+        return None
+    return slice(None) if len(i) == len(condition) else i
+
+
+def hash_bytes_chunk(data, start, length):
+    result = numpy.empty(len(length), dtype=numpy.uint64)
+    # the inputs are grouped by the length ranges of XXH3, only the ranges
+    # present are processed as each costs a fixed overhead
+    ranges = numpy.searchsorted([1, 4, 9, 17, 129, 241], length, side="right")
+    counts = numpy.bincount(ranges, minlength=7)
+    for r in numpy.flatnonzero(counts):
+        i = subset(ranges == r)
+        s = start[i]
+        n = length[i].astype(numpy.uint64)
+        if r == 0:
+            result[i] = xxh64_avalanche(
+                numpy.full(counts[r], secret64(56) ^ secret64(64))
+            )
+        elif r == 1:
+            combined = (
+                (data[s].astype(numpy.uint64) << u64(16))
+                | (data[s + (length[i] >> 1)].astype(numpy.uint64) << u64(24))
+                | data[s + length[i] - 1].astype(numpy.uint64)
+                | (n << u64(8))
+            )
+            result[i] = xxh64_avalanche(combined ^ (secret32(0) ^ secret32(4)))
+        elif r == 2:
+            input1 = read32(data, s)
+            input2 = read32(data, s + length[i] - 4)
+            result[i] = hash_4to8(input1, input2, n)
+        elif r == 3:
+            lo = read64(data, s) ^ (secret64(24) ^ secret64(32))
+            hi = read64(data, s + length[i] - 8) ^ (secret64(40) ^ secret64(48))
+            result[i] = avalanche(n + swap64(lo) + hi + mul128_fold64(lo, hi))
+        elif r == 4:
+            end = s + length[i]
+            acc = n * prime64_1
+            for threshold, k in ((96, 48), (64, 32), (32, 16), (0, 0)):
+                j = subset(n > u64(threshold))
+                if j is not None:
+                    acc[j] += mix16(data, s[j] + k, 2 * k)
+                    acc[j] += mix16(data, end[j] - k - 16, 2 * k + 16)
+            result[i] = avalanche(acc)
+        elif r == 5:
+            acc = n * prime64_1
+            for k in range(8):
+                acc += mix16(data, s + 16 * k, 16 * k)
+            acc = avalanche(acc)
+            for k in range(8, 15):
+                j = subset(n >= u64(16 * (k + 1)))
+                if j is not None:
+                    acc[j] += mix16(data, s[j] + 16 * k, 16 * (k - 8) + 3)
+            acc += mix16(data, s + length[i] - 16, 136 - 17)
+            result[i] = avalanche(acc)
+        else:
+            # a block of the inputs is gathered at once, which limits their
+            # number per call
+            i = numpy.flatnonzero(ranges == r)
+            for first in range(0, len(i), long_chunk_size):
+                j = i[first : first + long_chunk_size]
+                result[j] = hash_long_inputs(data, start[j], length[j])
+    return result
+
+
+def pack_bytes(values):
+    values = [bytes(v) for v in values]
+    offsets = numpy.zeros(len(values) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(v) for v in values], out=offsets[1:])
+    return b"".join(values), offsets
+
+
+def hash_byte_strings(values):
+    return hash_bytes(*pack_bytes(values))
+
+
+def hash_strings(values):
+    # strings are hashed as their UTF-16 code units in little-endian order
+    # consistent with hashCharsToLong of hash4j
+    return hash_byte_strings(v.encode("utf-16-le") for v in values)
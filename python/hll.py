@@ -0,0 +1,172 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import functools
+import numpy
+import estimation
+import martingale
+import memory
+import ull
+
+min_p = 3
+max_p = 26
+
+# A register stores the maximum number of leading zeros (after the p index
+# bits) plus one of all hashes seen so far. The state is given by the 6-bit
+# registers packed in little-endian order as done by the HyperLogLog
+# implementation of hash4j.
+
+
+def split_hashes(hashes, p):
+    idx, k = ull.split_hashes(hashes, p)
+    return idx, k - numpy.uint8(p - 2)
+
+
+def update_registers(registers, idx, values):
+    numpy.maximum.at(registers, idx, values)
+
+
+def update_martingale_estimator(martingale_estimator, p, old, idx, values):
+    # must be called with the register values old = registers[idx] before the
+    # registers are updated
+    candidates = numpy.flatnonzero(values > old)
+    if len(candidates) == 0:
+        return
+    idx = idx[candidates]
+    old = old[candidates]
+    exclusive, inclusive = martingale.sequential_states(
+        idx, values[candidates], numpy.maximum
+    )
+    before = numpy.maximum(old, exclusive)
+    after = numpy.maximum(old, inclusive)
+    changed = before != after
+    probabilities = change_probability_table(p)
+    martingale_estimator.state_changed_many(
+        probabilities[before[changed]] - probabilities[after[changed]]
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def change_probability_table(p):
+    # probability that the next distinct element changes a register with the
+    # given value
+    absent, _ = estimation.hll_ml_tables(p)
+    return absent / (1 << p)
+
+
+def pack_state(registers):
+    r = registers.reshape(-1, 4).astype(numpy.uint32)
+    words = r[:, 0] | (r[:, 1] << 6) | (r[:, 2] << 12) | (r[:, 3] << 18)
+    return words.astype("<u4").view(numpy.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+
+def unpack_state(state):
+    b = numpy.frombuffer(state, dtype=numpy.uint8).reshape(-1, 3).astype(numpy.uint32)
+    words = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+    shifts = numpy.array([0, 6, 12, 18], dtype=numpy.uint32)
+    return ((words[:, None] >> shifts) & 0x3F).astype(numpy.uint8).reshape(-1)
+
+
+class HyperLogLog:
+
+    def __init__(self, p):
+        if not min_p <= p <= max_p:
+            raise ValueError("illegal precision parameter " + str(p))
+        self.p = p
+        self.registers = numpy.zeros(1 << p, dtype=numpy.uint8)
+
+    @classmethod
+    def wrap(cls, state):
+        if len(state) % 3 != 0:
+            raise ValueError("illegal state length " + str(len(state)))
+        registers = unpack_state(state)
+        p = len(registers).bit_length() - 1
+        if len(registers) != 1 << p or not min_p <= p <= max_p:
+            raise ValueError("illegal state length " + str(len(state)))
+        sketch = cls.__new__(cls)
+        sketch.p = p
+        sketch.registers = registers
+        return sketch
+
+    def get_state(self):
+        return pack_state(self.registers)
+
+    def serialized_size_in_bytes(self):
+        return (6 << self.p) // 8
+
+    def in_memory_size_in_bytes(self):
+        return memory.get_in_memory_size(self)
+
+    def copy(self):
+        sketch = HyperLogLog.__new__(HyperLogLog)
+        sketch.p = self.p
+        sketch.registers = self.registers.copy()
+        return sketch
+
+    def reset(self):
+        self.registers[:] = 0
+        return self
+
+    def add(self, hash_value, martingale_estimator=None):
+        hash_value = int(hash_value) & 0xFFFFFFFFFFFFFFFF
+        q = 64 - self.p
+        idx = hash_value >> q
+        value = q + 1 - (hash_value & ((1 << q) - 1)).bit_length()
+        old = self.registers[idx]
+        if value > old:
+            self.registers[idx] = value
+            if martingale_estimator is not None:
+                probabilities = change_probability_table(self.p)
+                martingale_estimator.state_changed(
+                    probabilities[old] - probabilities[value]
+                )
+        return self
+
+    def add_many(self, hashes, martingale_estimator=None):
+        for chunk in ull.hash_chunks(hashes):
+            self.add_hash_array(chunk, martingale_estimator)
+        return self
+
+    def add_hash_array(self, hashes, martingale_estimator=None):
+        idx, values = split_hashes(hashes, self.p)
+        if martingale_estimator is not None:
+            update_martingale_estimator(
+                martingale_estimator, self.p, self.registers[idx], idx, values
+            )
+        update_registers(self.registers, idx, values)
+        return self
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("precision parameters do not match")
+        numpy.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def get_distinct_count_estimate(
+        self, estimator=estimation.hll_ml_estimate_from_histograms
+    ):
+        histogram = estimation.register_histograms(self.registers, 64)
+        return float(estimator(histogram, self.p))
@@ -0,0 +1,293 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import math
+import numpy
+import bit_packing
+import memory
+import ull
+
+# Port of c++/hyperlogloglog/HyperLogLogLog.hpp, which was derived from
+# https://github.com/mkarppa/hyperlogloglog (MIT License, Copyright (c) 2022
+# Matti Karppa).
+#
+# The registers are split into a dense part M storing m_bits-bit offsets
+# relative to the base B and a sparse part S storing the (index, value)
+# pairs of all registers outside [B, B + max_offset]. Both are bit-packed
+# into 64-bit words exactly like PackedVector and PackedMap. In contrast to
+# the C++ implementation, hashes are added in batches. The registers are
+# unpacked once per batch, updated, compressed according to the flags, and
+# packed again. Hence, rebase and compression work is done at most once per
+# batch instead of once per register update.
+
+compress_when_always = 0x1
+compress_when_append = 0x2
+compress_type_full = 0x4
+compress_type_increase = 0x8
+compress_bottom = 0x10
+compress_default = compress_when_always | compress_type_full
+
+word_bits = 64
+s_bits = 6
+
+# sizeof(HyperLogLogLog<uint64_t>) of the C++ implementation
+object_size_in_bytes = 160
+
+
+def alpha(m):
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1.0 + 1.079 / m)
+
+
+def split_hashes(hashes, log_m):
+    # j from Fibonacci hashing, r = clz + 1 of the full hash, capped to the
+    # range of a 6-bit value
+    with numpy.errstate(over="ignore"):
+        j = (hashes * numpy.uint64(0x9E3779B97F4A7C15)) >> numpy.uint64(
+            word_bits - log_m
+        )
+    if log_m == 0:
+        j = numpy.zeros(len(hashes), dtype=numpy.uint64)
+    clz = numpy.where(
+        hashes == 0, 64, 63 - ull.highest_bit_positions(hashes).astype(int)
+    )
+    r = numpy.minimum(clz + 1, (1 << s_bits) - 1)
+    return j.astype(numpy.intp), r.astype(numpy.uint8)
+
+
+def minimum_bits(registers, m_bits, s_bits):
+    registers = numpy.asarray(registers)
+    m = len(registers)
+    max_offset = (1 << m_bits) - 1
+    best_ns = m
+    for base in numpy.unique(registers):
+        ns = numpy.count_nonzero((registers < base) | (registers > base + max_offset))
+        best_ns = min(best_ns, ns)
+    return best_ns * (m.bit_length() - 1 + s_bits) + m * m_bits
+
+
+class HyperLogLogLog:
+
+    def __init__(self, m, m_bits=3, flags=compress_default):
+        log_m = m.bit_length() - 1
+        if m != 1 << log_m:
+            raise ValueError("m must be a power of two")
+        if flags in (compress_type_full, compress_type_increase):
+            flags |= compress_when_always
+        if flags in (compress_when_always, compress_when_append):
+            flags |= compress_type_full
+        if flags & compress_bottom and flags != compress_bottom:
+            raise ValueError("invalid flags")
+        if flags != compress_bottom and (
+            not flags & (compress_type_full | compress_type_increase)
+            or not flags & (compress_when_always | compress_when_append)
+        ):
+            raise ValueError("invalid flags")
+        self.m = m
+        self.log_m = log_m
+        self.m_bits = m_bits
+        self.flags = flags
+        self.max_offset = (1 << m_bits) - 1
+        self.m_words = numpy.zeros(-(-m * m_bits // word_bits), dtype=numpy.uint64)
+        self.s_words = numpy.zeros(0, dtype=numpy.uint64)
+        self.s_size = 0
+        self.lower_bound = 0
+        self.min_value_count = m
+        self.base = 0
+        self.compress_count = 0
+        self.rebase_count = 0
+
+    def s_element_size(self):
+        return self.log_m + s_bits
+
+    def get_s(self):
+        elements = bit_packing.unpack_bits(
+            self.s_words, self.s_element_size(), self.s_size
+        )
+        return (
+            (elements >> numpy.uint64(s_bits)).astype(numpy.intp),
+            (elements & numpy.uint64((1 << s_bits) - 1)).astype(numpy.uint8),
+        )
+
+    def export_registers(self):
+        registers = (
+            bit_packing.unpack_bits(self.m_words, self.m_bits, self.m).astype(
+                numpy.uint8
+            )
+            + self.base
+        )
+        keys, values = self.get_s()
+        registers[keys] = values
+        return registers
+
+    def store_registers(self, registers):
+        # splits the registers into M and S relative to the current base
+        outside = (registers < self.base) | (registers > self.base + self.max_offset)
+        offsets = numpy.where(outside, 0, registers - self.base)
+        self.m_words = bit_packing.pack_bits(offsets, self.m_bits)
+        keys = numpy.flatnonzero(outside)
+        elements = (keys.astype(numpy.uint64) << numpy.uint64(s_bits)) | registers[
+            keys
+        ].astype(numpy.uint64)
+        s_words = bit_packing.pack_bits(elements, self.s_element_size())
+        # like PackedVector, the allocated array never shrinks
+        if len(s_words) < len(self.s_words):
+            s_words = numpy.concatenate(
+                (s_words, numpy.zeros(len(self.s_words) - len(s_words), numpy.uint64))
+            )
+        self.s_words = s_words
+        self.s_size = len(keys)
+
+    def add(self, hash_value):
+        hash_value = int(hash_value) & 0xFFFFFFFFFFFFFFFF
+        return self.add_many(numpy.array([hash_value], dtype=numpy.uint64))
+
+    def add_many(self, hashes):
+        j, r = split_hashes(ull.as_hashes(hashes), self.log_m)
+        self.add_jr(j, r)
+        return self
+
+    def add_jr(self, j, r):
+        relevant = r > self.lower_bound
+        j = j[relevant]
+        r = r[relevant]
+        if len(j) == 0:
+            return self
+        registers = self.export_registers()
+        old = registers.copy()
+        numpy.maximum.at(registers, j, r)
+        changed = registers != old
+        if not changed.any():
+            return self
+        self.min_value_count -= numpy.count_nonzero(changed & (old == self.lower_bound))
+        outside = (registers < self.base) | (registers > self.base + self.max_offset)
+        old_outside = (old < self.base) | (old > self.base + self.max_offset)
+        size_increased = numpy.any(changed & outside & ~old_outside)
+        if (
+            self.flags & compress_when_always
+            or (size_increased and self.flags & compress_when_append)
+            or (self.min_value_count == 0 and self.flags == compress_bottom)
+        ):
+            self.compress(registers)
+        self.store_registers(registers)
+        return self
+
+    def compress(self, registers):
+        histogram = numpy.bincount(registers, minlength=1 << s_bits)
+        if self.flags & compress_type_full:
+            self.compress_full(histogram)
+        elif self.flags & compress_type_increase:
+            self.compress_increase(histogram)
+        else:
+            self.compress_bottom(histogram)
+        self.compress_count += 1
+
+    def num_outside(self, histogram, base):
+        return int(
+            numpy.sum(histogram[:base])
+            + numpy.sum(histogram[base + self.max_offset + 1 :])
+        )
+
+    def rebase(self, base):
+        # the registers are split according to the new base when stored
+        self.base = base
+        self.rebase_count += 1
+
+    def compress_full(self, histogram):
+        best_ns = self.num_outside(histogram, self.base)
+        best_base = self.base
+        values = numpy.flatnonzero(histogram)
+        self.lower_bound = int(values[0])
+        num_below = 0
+        for base in values:
+            if num_below >= best_ns:
+                break
+            ns = self.num_outside(histogram, base)
+            num_below += int(histogram[base])
+            if ns < best_ns:
+                best_ns = ns
+                best_base = int(base)
+        if best_base != self.base:
+            self.rebase(best_base)
+
+    def compress_increase(self, histogram):
+        values = numpy.flatnonzero(histogram)
+        self.lower_bound = int(values[0])
+        larger = values[values > self.base]
+        base = int(larger[0]) if len(larger) > 0 else 1 << s_bits
+        if self.num_outside(histogram, base) < self.num_outside(histogram, self.base):
+            self.rebase(base)
+
+    def compress_bottom(self, histogram):
+        values = numpy.flatnonzero(histogram)
+        self.lower_bound = int(values[0])
+        self.min_value_count = int(histogram[self.lower_bound])
+        if self.lower_bound > self.base:
+            self.rebase(self.lower_bound)
+
+    def merge(self, other):
+        if self.m != other.m:
+            raise ValueError("Mismatch in the number of registers")
+        if self.m_bits != other.m_bits:
+            raise ValueError("Mismatch in the number of M bits")
+        if self.flags != other.flags:
+            raise ValueError("Mismatch in the flags")
+        result = HyperLogLogLog(self.m, self.m_bits, self.flags)
+        result.base = max(self.base, other.base)
+        registers = numpy.maximum(self.export_registers(), other.export_registers())
+        result.compress(registers)
+        result.store_registers(registers)
+        return result
+
+    def get_distinct_count_estimate(self):
+        registers = self.export_registers()
+        m = self.m
+        e = alpha(m) * m * m / numpy.sum(numpy.ldexp(1.0, -registers.astype(int)))
+        v = numpy.count_nonzero(registers == 0)
+        if e <= 5.0 / 2.0 * m and v != 0:
+            return m * math.log(m / v)
+        if e <= (1 << 32) / 30:
+            return float(e)
+        with numpy.errstate(invalid="ignore"):
+            return float(-(1 << 32) * numpy.log(1 - e / (1 << 32)))
+
+    def bit_size(self):
+        return self.m * self.m_bits + self.s_size * self.s_element_size()
+
+    def in_memory_size_in_bytes(self):
+        return memory.get_in_memory_size(self)
+
+    def cpp_in_memory_size_in_bytes(self):
+        # the memory size of the C++ implementation with the same state
+        return object_size_in_bytes + 8 * (len(self.m_words) + len(self.s_words))
+
+    def serialized_size_in_bytes(self):
+        return (self.bit_size() + 7) // 8
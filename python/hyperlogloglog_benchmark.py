@@ -0,0 +1,140 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import csv
+import math
+import numpy
+import time
+import hyperlogloglog
+import transition_simulation
+
+# Repeats the empirical MVP computation of c++/empiricalMvpComputation.cpp for
+# the Python port of HyperLogLogLog, adding the hashes between consecutive
+# distinct counts as one batch. Writes the results with the same schema and
+# prints them next to the C++ results together with the insertion throughput.
+
+p = 12
+num_cycles = 100
+max_distinct_count = 1000000
+relative_step = 0.05
+
+cpp_result_file = "results/comparison-empirical-mvp/HyperLogLogLog.csv"
+result_file = "results/comparison-empirical-mvp/Python HyperLogLogLog.csv"
+
+
+def read_mvp(file):
+    with open(file, "r") as f:
+        reader = csv.reader(f, skipinitialspace=True, delimiter=";")
+        next(reader)
+        header = next(reader)
+        rows = [dict(zip(header, r)) for r in reader]
+    return {int(r["true distinct count"]): r for r in rows}
+
+
+def run():
+    distinct_counts = transition_simulation.get_distinct_count_values(
+        max_distinct_count, relative_step
+    ).astype(numpy.int64)
+    k = len(distinct_counts)
+    memory_sizes = numpy.zeros((num_cycles, k))
+    serialization_sizes = numpy.zeros((num_cycles, k))
+    estimates = numpy.zeros((num_cycles, k))
+
+    rng = numpy.random.default_rng(0)
+    add_time = 0.0
+    for cycle in range(num_cycles):
+        hashes = rng.integers(
+            0, 1 << 64, max_distinct_count, dtype=numpy.uint64, endpoint=False
+        )
+        sketch = hyperlogloglog.HyperLogLogLog(1 << p)
+        start = 0
+        for i, distinct_count in enumerate(distinct_counts):
+            t = time.perf_counter()
+            sketch.add_many(hashes[start:distinct_count])
+            add_time += time.perf_counter() - t
+            start = distinct_count
+            memory_sizes[cycle, i] = sketch.cpp_in_memory_size_in_bytes()
+            serialization_sizes[cycle, i] = sketch.serialized_size_in_bytes()
+            estimates[cycle, i] = sketch.get_distinct_count_estimate()
+
+    errors = estimates - distinct_counts
+    mse = numpy.mean(numpy.square(errors), axis=0)
+    relative_mse = mse / numpy.square(distinct_counts)
+    with open(result_file, "w") as f:
+        f.write(
+            "p = "
+            + str(p)
+            + "; number of cycles = "
+            + str(num_cycles)
+            + "; data structure = Python HyperLogLogLog\n"
+        )
+        f.write(
+            "true distinct count; minimum memory size; average memory size; "
+            "maximum memory size; minimum serialization size; "
+            "average serialization size; maximum serialization size; "
+            "relative distinct count estimation bias; "
+            "relative distinct count estimation rmse; estimated memory MVP; "
+            "estimated serialization MVP\n"
+        )
+        for i, n in enumerate(distinct_counts):
+            row = [
+                int(n),
+                int(numpy.min(memory_sizes[:, i])),
+                numpy.mean(memory_sizes[:, i]),
+                int(numpy.max(memory_sizes[:, i])),
+                int(numpy.min(serialization_sizes[:, i])),
+                numpy.mean(serialization_sizes[:, i]),
+                int(numpy.max(serialization_sizes[:, i])),
+                numpy.mean(errors[:, i]) / n,
+                math.sqrt(mse[i]) / n,
+                numpy.mean(memory_sizes[:, i]) * 8 * relative_mse[i],
+                numpy.mean(serialization_sizes[:, i]) * 8 * relative_mse[i],
+            ]
+            f.write(
+                "; ".join(str(v) if isinstance(v, int) else "%.6g" % v for v in row)
+                + "\n"
+            )
+
+    cpp = read_mvp(cpp_result_file)
+    print(
+        "insertion throughput: %.3g hashes/s"
+        % (num_cycles * max_distinct_count / add_time)
+    )
+    print(
+        "distinct count; average memory size (C++, Python); "
+        "memory MVP (C++, Python); serialization MVP (C++, Python)"
+    )
+    python = read_mvp(result_file)
+    columns = [
+        "average memory size",
+        "estimated memory MVP",
+        "estimated serialization MVP",
+    ]
+    for n in distinct_counts[:: max(1, k // 20)]:
+        print(n, *[x for c in columns for x in (cpp[n][c], python[n][c])], sep="; ")
+
+
+run()
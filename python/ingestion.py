@@ -0,0 +1,158 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import itertools
+import multiprocessing
+import numpy
+import os
+from multiprocessing import shared_memory
+import sketch_matrix
+import ull
+
+# Ingestion of large hash streams using a process pool. Every worker process
+# owns one row of a register matrix in shared memory and adds all hashes of
+# its tasks to that row. Finally, the main process merges all rows. Hashes
+# from files are read by the workers themselves, and NumPy arrays are copied
+# once into shared memory. Only chunks from iterables are pickled.
+
+default_chunk_size = 1 << 20
+
+worker_state = {}
+
+
+def init_worker(registers_name, num_rows, p, row_counter):
+    registers_memory = shared_memory.SharedMemory(name=registers_name)
+    with row_counter.get_lock():
+        row = row_counter.value
+        row_counter.value += 1
+    registers = numpy.ndarray(
+        (num_rows, 1 << p), dtype=numpy.uint8, buffer=registers_memory.buf
+    )
+    worker_state["registers_memory"] = registers_memory
+    worker_state["sketch"] = ull.UltraLogLog.wrap(registers[row])
+    worker_state["data_memory"] = {}
+
+
+def add_file_range(task):
+    path, start, stop = task
+    hashes = numpy.fromfile(path, dtype="<u8", count=stop - start, offset=8 * start)
+    worker_state["sketch"].add_many(hashes)
+
+
+def add_shared_range(task):
+    name, start, stop = task
+    data_memory = worker_state["data_memory"]
+    if name not in data_memory:
+        data_memory[name] = shared_memory.SharedMemory(name=name)
+    hashes = numpy.ndarray(
+        (stop - start,),
+        dtype="<u8",
+        buffer=data_memory[name].buf,
+        offset=8 * start,
+    )
+    worker_state["sketch"].add_many(hashes)
+
+
+def add_chunk(hashes):
+    worker_state["sketch"].add_many(hashes)
+
+
+def ranges(num_hashes, chunk_size):
+    return [
+        (start, min(start + chunk_size, num_hashes))
+        for start in range(0, num_hashes, chunk_size)
+    ]
+
+
+def chunks(iterable, chunk_size):
+    # yields NumPy arrays from an iterable of hashes or of arrays of hashes
+    iterator = iter(iterable)
+    for item in iterator:
+        if isinstance(item, numpy.ndarray):
+            yield ull.as_hashes(item)
+            for item in iterator:
+                yield ull.as_hashes(item)
+            return
+        chunk = list(itertools.islice(iterator, chunk_size - 1))
+        yield ull.as_hashes(numpy.array([item] + chunk, dtype=numpy.uint64))
+        while chunk:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if chunk:
+                yield ull.as_hashes(numpy.array(chunk, dtype=numpy.uint64))
+
+
+def ingest(source, p, num_workers=None, chunk_size=default_chunk_size):
+    # source may be the path of a file of little-endian 64-bit hashes, a NumPy
+    # array of hashes, or an iterable of hashes or of arrays of hashes
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    m = 1 << p
+    registers_memory = shared_memory.SharedMemory(create=True, size=num_workers * m)
+    data_memory = None
+    try:
+        registers = numpy.ndarray(
+            (num_workers, m), dtype=numpy.uint8, buffer=registers_memory.buf
+        )
+        registers[:] = 0
+        row_counter = multiprocessing.Value("i", 0)
+        with multiprocessing.Pool(
+            num_workers,
+            initializer=init_worker,
+            initargs=(registers_memory.name, num_workers, p, row_counter),
+        ) as pool:
+            if isinstance(source, (str, os.PathLike)):
+                num_hashes = os.path.getsize(source) // 8
+                tasks = [(source, a, b) for a, b in ranges(num_hashes, chunk_size)]
+                results = pool.imap_unordered(add_file_range, tasks)
+            elif isinstance(source, numpy.ndarray):
+                hashes = ull.as_hashes(source).reshape(-1)
+                data_memory = shared_memory.SharedMemory(
+                    create=True, size=max(1, hashes.nbytes)
+                )
+                numpy.ndarray(hashes.shape, dtype="<u8", buffer=data_memory.buf)[:] = (
+                    hashes
+                )
+                tasks = [
+                    (data_memory.name, a, b) for a, b in ranges(len(hashes), chunk_size)
+                ]
+                results = pool.imap_unordered(add_shared_range, tasks)
+            else:
+                results = pool.imap_unordered(add_chunk, chunks(source, chunk_size))
+            for _ in results:
+                pass
+            pool.close()
+            pool.join()
+        result = sketch_matrix.SketchMatrix.wrap(registers).unions(
+            [numpy.arange(num_workers)]
+        )[0]
+        del registers
+        return ull.UltraLogLog.wrap(result)
+    finally:
+        registers_memory.close()
+        registers_memory.unlink()
+        if data_memory is not None:
+            data_memory.close()
+            data_memory.unlink()
@@ -0,0 +1,333 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import contextlib
+import functools
+import numpy
+import time
+import estimation
+import generalized_ull
+import hashing
+import hll
+import performance_benchmark
+import ull
+
+# Opt-in instrumentation of the sketch operations. When enabled, the
+# functions and methods listed below are replaced by wrappers that count
+# calls and elements, accumulate the elapsed nanoseconds, and, for register
+# updates, count the changed registers. Disabling restores the original
+# functions, so there is no cost at all on the batched paths when disabled.
+# Like every monkey patching, it only affects calls through the module or
+# class attributes, not references taken before enabling. Timers include
+# nested instrumented calls, e.g. the estimation time includes the time of
+# computing the register histogram. Only the hashing functions record just
+# the outermost call, as hash_strings calls hash_byte_strings, which calls
+# hash_bytes, and the hashed elements would be counted several times
+# otherwise. The counters are not thread-safe.
+
+# category -> (owner, attribute name, number of elements given the arguments
+# and the result)
+operations = {
+    "hashing": [
+        (hashing, "hash_longs", lambda args, result: len(result)),
+        (hashing, "hash_ints", lambda args, result: len(result)),
+        (hashing, "hash_bytes", lambda args, result: len(args[1]) - 1),
+        (hashing, "hash_byte_strings", lambda args, result: len(result)),
+        (hashing, "hash_strings", lambda args, result: len(result)),
+    ],
+    "add": [
+        (ull.UltraLogLog, "add", lambda args, result: 1),
+        (ull.UltraLogLog, "add_hash_array", lambda args, result: len(args[1])),
+        (hll.HyperLogLog, "add", lambda args, result: 1),
+        (hll.HyperLogLog, "add_hash_array", lambda args, result: len(args[1])),
+        (
+            generalized_ull.GeneralizedUltraLogLog,
+            "add_hash_array",
+            lambda args, result: len(args[1]),
+        ),
+    ],
+    "register update": [
+        (ull, "update_registers", lambda args, result: len(args[1])),
+        (ull, "sparse_update", lambda args, result: len(args[1])),
+        (hll, "update_registers", lambda args, result: len(args[1])),
+        (generalized_ull, "update_registers", lambda args, result: len(args[1])),
+        (ull, "update_martingale_estimator", lambda args, result: len(args[3])),
+        (hll, "update_martingale_estimator", lambda args, result: len(args[3])),
+    ],
+    "merge": [
+        (ull.UltraLogLog, "merge", lambda args, result: 1),
+        (hll.HyperLogLog, "merge", lambda args, result: 1),
+        (generalized_ull.GeneralizedUltraLogLog, "merge", lambda args, result: 1),
+    ],
+    "histogram": [
+        (estimation, "register_histograms", lambda args, result: numpy.size(args[0])),
+        (ull, "update_histogram", lambda args, result: len(args[1])),
+        (ull, "sparse_histogram", lambda args, result: len(args[0])),
+    ],
+    "estimation": [
+        (ull.UltraLogLog, "get_distinct_count_estimate", lambda args, result: 1),
+        (hll.HyperLogLog, "get_distinct_count_estimate", lambda args, result: 1),
+        (
+            generalized_ull.GeneralizedUltraLogLog,
+            "get_distinct_count_estimate",
+            lambda args, result: 1,
+        ),
+    ],
+    "serialization": [
+        (ull.UltraLogLog, "get_state", lambda args, result: 1),
+        (ull.UltraLogLog, "wrap", lambda args, result: 1),
+        (hll.HyperLogLog, "get_state", lambda args, result: 1),
+        (hll.HyperLogLog, "wrap", lambda args, result: 1),
+    ],
+}
+
+# the functions (registers, idx, ...) updating the given registers in place,
+# the functions among them returning the indices of the possibly changed
+# registers and their old values, and the function (entries, idx, ...)
+# returning the updated sparse entries
+in_place_register_updates = {
+    (ull, "update_registers"),
+    (hll, "update_registers"),
+    (generalized_ull, "update_registers"),
+}
+touched_register_updates = {(ull, "update_registers")}
+sparse_register_updates = {(ull, "sparse_update")}
+
+# categories whose calls within a call of the same category are not recorded
+outermost_categories = {"hashing"}
+
+# the sketch names of the JMH records of module-level functions
+sketch_names = {
+    estimation: "Estimation",
+    generalized_ull: "GeneralizedUltraLogLog",
+    hashing: "Hashing",
+    hll: "HyperLogLog",
+    ull: "UltraLogLog",
+}
+
+statistics = {}
+originals = {}
+active_categories = set()
+
+
+def get_name(owner, attribute):
+    if isinstance(owner, type):
+        return owner.__module__ + "." + owner.__name__ + "." + attribute
+    return owner.__name__ + "." + attribute
+
+
+def get_benchmark_name(owner, attribute):
+    # <sketch>PerformanceTest.<operation> like the benchmark names matched by
+    # benchmark.py
+    sketch = owner.__name__ if isinstance(owner, type) else sketch_names[owner]
+    return sketch + "PerformanceTest." + attribute
+
+
+def record(name, elements, nanoseconds, changes=None):
+    s = statistics.get(name)
+    if s is None:
+        s = statistics[name] = {"calls": 0, "elements": 0, "nanoseconds": 0}
+    s["calls"] += 1
+    s["elements"] += elements
+    s["nanoseconds"] += nanoseconds
+    if changes is not None:
+        s["register changes"] = s.get("register changes", 0) + changes
+
+
+def count_in_place_changes(function, args, kwargs):
+    # compares only the hit registers if they are few
+    registers, idx = args[0], args[1]
+    if 16 * len(idx) < len(registers):
+        idx = numpy.unique(idx)
+        old = registers[idx]
+        result = function(*args, **kwargs)
+        return result, int(numpy.count_nonzero(registers[idx] != old))
+    old = registers.copy()
+    result = function(*args, **kwargs)
+    return result, int(numpy.count_nonzero(registers != old))
+
+
+def count_touched_changes(function, args, kwargs):
+    touched, old = result = function(*args, **kwargs)
+    return result, int(numpy.count_nonzero(args[0][touched] != old))
+
+
+def count_sparse_changes(function, args, kwargs):
+    entries = function(*args, **kwargs)
+    return entries, len(numpy.setdiff1d(entries, args[0], assume_unique=True))
+
+
+def instrument(function, name, count, changes, outermost_category):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if outermost_category in active_categories:
+            return function(*args, **kwargs)
+        if outermost_category is not None:
+            active_categories.add(outermost_category)
+        try:
+            start = time.perf_counter_ns()
+            if changes is None:
+                result = function(*args, **kwargs)
+                num_changes = None
+            else:
+                result, num_changes = changes(function, args, kwargs)
+            elapsed = time.perf_counter_ns() - start
+        finally:
+            active_categories.discard(outermost_category)
+        record(name, count(args, result), elapsed, num_changes)
+        return result
+
+    return wrapper
+
+
+def is_enabled():
+    return len(originals) > 0
+
+
+def enable():
+    if is_enabled():
+        return
+    for category, targets in operations.items():
+        outermost_category = category if category in outermost_categories else None
+        for owner, attribute, count in targets:
+            original = owner.__dict__[attribute]
+            originals[(owner, attribute)] = original
+            changes = None
+            if (owner, attribute) in touched_register_updates:
+                changes = count_touched_changes
+            elif (owner, attribute) in in_place_register_updates:
+                changes = count_in_place_changes
+            elif (owner, attribute) in sparse_register_updates:
+                changes = count_sparse_changes
+            name = get_name(owner, attribute)
+            if isinstance(original, classmethod):
+                # the class is passed as first argument like self
+                wrapper = classmethod(
+                    instrument(
+                        original.__func__, name, count, changes, outermost_category
+                    )
+                )
+            else:
+                wrapper = instrument(original, name, count, changes, outermost_category)
+            setattr(owner, attribute, wrapper)
+
+
+def disable():
+    for (owner, attribute), original in originals.items():
+        setattr(owner, attribute, original)
+    originals.clear()
+
+
+def reset():
+    statistics.clear()
+
+
+def snapshot():
+    # operation name -> category, calls, elements, nanoseconds, and, for
+    # register updates, the number of changed registers, together with the
+    # derived nanoseconds per element and register change rate
+    result = {}
+    for category, targets in operations.items():
+        for owner, attribute, _ in targets:
+            name = get_name(owner, attribute)
+            if name not in statistics:
+                continue
+            s = dict(category=category, **statistics[name])
+            if s["elements"] > 0:
+                s["nanoseconds per element"] = s["nanoseconds"] / s["elements"]
+                if "register changes" in s:
+                    s["register change rate"] = s["register changes"] / s["elements"]
+            result[name] = s
+    return result
+
+
+def difference(after, before):
+    result = {}
+    for name, s in after.items():
+        s = dict(s)
+        for key in ("calls", "elements", "nanoseconds", "register changes"):
+            if key in s and name in before:
+                s[key] -= before[name][key]
+        if s["calls"] == 0:
+            continue
+        if s["elements"] > 0:
+            s["nanoseconds per element"] = s["nanoseconds"] / s["elements"]
+            if "register changes" in s:
+                s["register change rate"] = s["register changes"] / s["elements"]
+        else:
+            s.pop("nanoseconds per element", None)
+            s.pop("register change rate", None)
+        result[name] = s
+    return result
+
+
+@contextlib.contextmanager
+def profile():
+    # enables the instrumentation within the scope and fills the yielded dict
+    # with the snapshot of the operations performed within the scope
+    was_enabled = is_enabled()
+    before = snapshot()
+    enable()
+    result = {}
+    try:
+        yield result
+    finally:
+        after = snapshot()
+        if not was_enabled:
+            disable()
+        result.update(difference(after, before))
+
+
+def get_jmh_records(
+    profile_snapshot,
+    prefix=performance_benchmark.benchmark_prefix + "instrumentation.",
+    params=None,
+):
+    # JMH records with the average time per call, which can be processed
+    # like those of performance_benchmark.py
+    benchmark_names = {
+        get_name(owner, attribute): get_benchmark_name(owner, attribute)
+        for targets in operations.values()
+        for owner, attribute, _ in targets
+    }
+    records = []
+    for name, s in profile_snapshot.items():
+        score = s["nanoseconds"] / s["calls"] / 1000.0
+        record = performance_benchmark.make_record(
+            prefix + benchmark_names[name],
+            dict(params or {}),
+            [score],
+            0,
+            1,
+            s["nanoseconds"] / 1e9,
+        )
+        record["secondaryMetrics"] = {
+            key: s[key]
+            for key in ("calls", "elements", "register changes", "register change rate")
+            if key in s
+        }
+        records.append(record)
+    return records
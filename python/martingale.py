@@ -0,0 +1,95 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+
+
+def sequential_states(idx, values, ufunc):
+    # Combines the values of all elements with the same index in the given
+    # order using the (associative and commutative) ufunc with identity 0.
+    # Returns for each element the combination of all preceding values
+    # (exclusive) and of all values up to and including itself (inclusive).
+    if len(idx) > 0 and numpy.max(idx) <= 0xFFFF:
+        # stable sorting uses radix sort for 16-bit integers
+        order = numpy.argsort(idx.astype(numpy.uint16), kind="stable")
+    else:
+        order = numpy.argsort(idx, kind="stable")
+    segments = idx[order]
+    inclusive = values[order]
+    shift = 1
+    while shift < len(inclusive):
+        same = segments[shift:] == segments[:-shift]
+        if not same.any():
+            break
+        inclusive[shift:] = numpy.where(
+            same, ufunc(inclusive[shift:], inclusive[:-shift]), inclusive[shift:]
+        )
+        shift *= 2
+    exclusive = numpy.zeros_like(inclusive)
+    exclusive[1:] = numpy.where(
+        segments[1:] == segments[:-1], inclusive[:-1], exclusive[1:]
+    )
+    result_exclusive = numpy.empty_like(exclusive)
+    result_exclusive[order] = exclusive
+    result_inclusive = numpy.empty_like(inclusive)
+    result_inclusive[order] = inclusive
+    return result_exclusive, result_inclusive
+
+
+class MartingaleEstimator:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.estimate = 0.0
+        self.state_change_probability = 1.0
+        return self
+
+    def get_distinct_count_estimate(self):
+        return self.estimate
+
+    def get_state_change_probability(self):
+        return self.state_change_probability
+
+    def state_changed(self, decrement):
+        self.estimate += 1.0 / self.state_change_probability
+        self.state_change_probability -= decrement
+
+    def state_changed_many(self, decrements):
+        # equivalent to calling state_changed for all decrements in the given
+        # order, including the rounding of intermediate results
+        if len(decrements) == 0:
+            return
+        probabilities = numpy.subtract.accumulate(
+            numpy.concatenate(([self.state_change_probability], decrements))
+        )
+        self.estimate = float(
+            numpy.add.accumulate(
+                numpy.concatenate(([self.estimate], 1.0 / probabilities[:-1]))
+            )[-1]
+        )
+        self.state_change_probability = float(probabilities[-1])
@@ -0,0 +1,81 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import mmap
+import numpy
+import sys
+import types
+
+# In-memory size of Python objects as used for the sketches. Everything
+# reachable from the object through attributes and containers is counted
+# once, including the object headers, the instance attribute dictionary, and
+# the container overhead. NumPy views count the bytes they refer to, but not
+# the rest of their base, so a sketch wrapping a row of a SketchMatrix does
+# not report the whole matrix. Objects shared by the whole process, like
+# None, booleans, small integers, types, modules, and functions are not
+# counted. The attribute dictionary of an instance is
+# counted with the size of an equivalent dictionary of its own, because the
+# size of the key-sharing dictionaries of CPython depends on the history of
+# all instances of the class. Pages of memory-mapped files are not counted.
+
+
+def is_shared(obj):
+    if obj is None or isinstance(obj, (bool, type, types.ModuleType)):
+        return True
+    if isinstance(obj, (types.FunctionType, types.BuiltinFunctionType)):
+        return True
+    return type(obj) is int and -5 <= obj <= 256
+
+
+def is_mapped(array):
+    base = array.base
+    while isinstance(base, numpy.ndarray):
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def get_size(obj, seen):
+    if id(obj) in seen or is_shared(obj):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, numpy.ndarray):
+        # includes the data buffer if owned by the array
+        if obj.base is not None and not is_mapped(obj):
+            size += obj.nbytes
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_size(v, seen) for v in obj)
+    elif isinstance(obj, dict):
+        size += sum(get_size(k, seen) + get_size(v, seen) for k, v in obj.items())
+    elif hasattr(obj, "__dict__"):
+        attributes = vars(obj)
+        size += sys.getsizeof(dict(attributes))
+        size += sum(get_size(v, seen) for v in attributes.values())
+    return size
+
+
+def get_in_memory_size(obj):
+    return get_size(obj, set())
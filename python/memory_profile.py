@@ -0,0 +1,140 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import argparse
+import numpy
+import os
+import time
+import accumulators
+import empirical_mvp
+import estimation
+import generalized_ull
+import hll
+import hyperlogloglog
+import ull
+
+# Profiles the memory footprint of the Python sketches over the same distinct
+# counts as the empirical MVP computation. The in-memory size is the exact
+# footprint of the Python object graph as reported by memory.py, including
+# object headers and container overhead, and the serialization size is that
+# of the serialized state, both reported by the uniform methods
+# in_memory_size_in_bytes and serialized_size_in_bytes of the sketches. The
+# CSV files have the same schema as those of EmpiricalMVPComputation.java, so
+# the memory MVP can be compared with that of Zetasketch, DataSketches, and
+# HyperLogLogLog.
+
+p = 12
+num_cycles = 100
+seed = 0
+
+result_dir = "results/memory/"
+
+
+class Config:
+
+    def __init__(self, label, create, estimate):
+        self.label = label
+        self.create = create
+        self.estimate = estimate
+
+
+configs = [
+    Config(
+        "Python UltraLogLog ML sparse",
+        lambda p: ull.UltraLogLog(p),
+        lambda s: s.get_distinct_count_estimate(estimation.ml_estimate_from_histograms),
+    ),
+    Config(
+        "Python UltraLogLog ML dense",
+        lambda p: ull.UltraLogLog(p, sparse=False),
+        lambda s: s.get_distinct_count_estimate(estimation.ml_estimate_from_histograms),
+    ),
+    Config(
+        "Python HyperLogLog ML",
+        lambda p: hll.HyperLogLog(p),
+        lambda s: s.get_distinct_count_estimate(
+            estimation.hll_ml_estimate_from_histograms
+        ),
+    ),
+    Config(
+        "Python HyperLogLogLog",
+        lambda p: hyperlogloglog.HyperLogLogLog(1 << p),
+        lambda s: s.get_distinct_count_estimate(),
+    ),
+    Config(
+        "Python GeneralizedUltraLogLog (q=8, d=20, r=4)",
+        lambda p: generalized_ull.GeneralizedUltraLogLog(p, 8, 20, 4),
+        lambda s: s.get_distinct_count_estimate(),
+    ),
+]
+
+
+def run(p, num_cycles, distinct_counts):
+    k = len(distinct_counts)
+    accumulator = accumulators.MomentAccumulator((3, len(configs), k))
+    values = numpy.zeros((3, len(configs), k))
+    for cycle in range(num_cycles):
+        rng = numpy.random.default_rng(
+            numpy.random.SeedSequence(seed, spawn_key=(cycle,))
+        )
+        hashes = rng.integers(
+            0, 1 << 64, distinct_counts[-1], dtype=numpy.uint64, endpoint=False
+        )
+        for c, config in enumerate(configs):
+            sketch = config.create(p)
+            start = 0
+            for i, distinct_count in enumerate(distinct_counts):
+                sketch.add_many(hashes[start:distinct_count])
+                start = distinct_count
+                values[0, c, i] = sketch.in_memory_size_in_bytes()
+                values[1, c, i] = sketch.serialized_size_in_bytes()
+                values[2, c, i] = config.estimate(sketch) - distinct_count
+        accumulator.add(values)
+    return accumulator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=num_cycles)
+    parser.add_argument("--p", type=int, default=p)
+    args = parser.parse_args()
+    distinct_counts = empirical_mvp.get_distinct_counts()
+    t = time.perf_counter()
+    accumulator = run(args.p, args.cycles, distinct_counts)
+    os.makedirs(result_dir, exist_ok=True)
+    for c, config in enumerate(configs):
+        rows = list(empirical_mvp.get_rows(accumulator, c, distinct_counts))
+        empirical_mvp.write_results(
+            result_dir + config.label + ".csv", args.p, args.cycles, config.label, rows
+        )
+        # memory and serialization sizes at the largest distinct count
+        print(
+            config.label + ": memory size = " + str(rows[-1][2]),
+            "serialization size = " + str(rows[-1][5]),
+            "memory MVP = " + str(rows[-1][9]),
+            sep=", ",
+        )
+    print("time = " + str(time.perf_counter() - t) + " s")
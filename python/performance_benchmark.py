@@ -0,0 +1,342 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import argparse
+import functools
+import gc
+import itertools
+import json
+import numpy
+import os
+import platform
+import re
+import sys
+import time
+import scipy.stats
+import estimation
+import hll
+import martingale
+import ull
+
+# Python counterpart of UltraLogLogPerformanceTest.java and
+# HyperLogLogPerformanceTest.java for the Python sketch implementations. The
+# benchmarks, parameters, and iteration scheme are those of the JMH
+# configuration in java/build.gradle: every iteration repeats the operation
+# until the iteration time has elapsed and yields the average time per
+# operation. The records have the JSON schema of JMH with the benchmark names
+# prefixed by benchmark_prefix instead of the Java package, such that
+# benchmark.py can plot them with --prefix. As the Python sketches are built
+# for batches, hashes are added using add_many. The estimation benchmarks use
+# 1 MB instead of 10 MB of example sketches, as the per-sketch overhead of
+# Python dominates anyway and 10 MB would take minutes per iteration for
+# small precisions.
+
+benchmark_prefix = "python."
+result_file = "results/python/benchmark-results.json"
+warmup_iterations = 5
+measurement_iterations = 20
+iteration_time = 1.0
+score_confidence = 0.999
+score_percentiles = [0.0, 50.0, 90.0, 95.0, 99.0, 99.9, 99.99, 99.999, 99.9999, 100.0]
+
+num_elements = [
+    "10000000",
+    "5000000",
+    "2000000",
+    "1000000",
+    "500000",
+    "200000",
+    "100000",
+    "50000",
+    "20000",
+    "10000",
+    "5000",
+    "2000",
+    "1000",
+    "500",
+    "200",
+    "100",
+    "50",
+    "20",
+    "10",
+    "5",
+    "2",
+    "1",
+    "0",
+]
+add_precisions = ["16", "14", "12", "10", "8"]
+memory_size_for_examples_in_bytes = ["1000000"]
+estimation_precisions = ["16", "15", "14", "13", "12", "11", "10", "9", "8"]
+
+# sketch name -> (constructor, wrap, estimators)
+sketches = {
+    "HyperLogLog": (
+        hll.HyperLogLog,
+        hll.HyperLogLog.wrap,
+        {
+            "CORRECTED_RAW_ESTIMATOR": estimation.hll_corrected_raw_estimate_from_histograms,
+            "MAXIMUM_LIKELIHOOD_ESTIMATOR": estimation.hll_ml_estimate_from_histograms,
+        },
+    ),
+    "UltraLogLog": (
+        # dense from the start like the sketches of the Java benchmarks
+        functools.partial(ull.UltraLogLog, sparse=False),
+        ull.UltraLogLog.wrap,
+        {
+            "MAXIMUM_LIKELIHOOD_ESTIMATOR": estimation.ml_estimate_from_histograms,
+            "OPTIMAL_FGRA_ESTIMATOR": estimation.fgra_estimate_from_histograms,
+        },
+    ),
+}
+
+
+def random_hashes(rng, n):
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64)
+
+
+def distinct_count_add(sketch, params):
+    create = sketches[sketch][0]
+    rng = numpy.random.default_rng()
+    n = int(params["numElements"])
+    p = int(params["precision"])
+
+    def operation():
+        create(p).add_many(random_hashes(rng, n))
+
+    return operation
+
+
+def distinct_count_add_with_martingale_estimator(sketch, params):
+    create = sketches[sketch][0]
+    rng = numpy.random.default_rng()
+    n = int(params["numElements"])
+    p = int(params["precision"])
+
+    def operation():
+        martingale_estimator = martingale.MartingaleEstimator()
+        create(p).add_many(random_hashes(rng, n), martingale_estimator)
+        martingale_estimator.get_distinct_count_estimate()
+
+    return operation
+
+
+def distinct_count_estimation(sketch, params):
+    create, wrap, estimators = sketches[sketch]
+    rng = numpy.random.default_rng()
+    n = int(params["numElements"])
+    p = int(params["precision"])
+    num_examples = int(params["memorySizeForExamplesInBytes"]) // len(
+        create(p).get_state()
+    )
+    states = [
+        create(p).add_many(random_hashes(rng, n)).get_state()
+        for _ in range(min(num_examples, int(params["numMaxDifferentExamples"])))
+    ]
+    examples = [wrap(states[i % len(states)]) for i in range(num_examples)]
+    estimator = estimators[params["estimator"]]
+
+    def operation():
+        for example in examples:
+            example.get_distinct_count_estimate(estimator)
+
+    return operation
+
+
+def register_scan(sketch, params):
+    create = sketches[sketch][0]
+    p = int(params["precision"])
+    num_examples = int(params["memorySizeForExamplesInBytes"]) // len(
+        create(p).get_state()
+    )
+    examples = [create(p) for _ in range(num_examples)]
+
+    def operation():
+        # like in Java, the state of each sketch is obtained within the operation
+        for example in examples:
+            int(numpy.frombuffer(example.get_state(), dtype=numpy.uint8).sum())
+
+    return operation
+
+
+# benchmark name -> (setup, parameters), the setup returns the operation
+benchmarks = {
+    "distinctCountAdd": (
+        distinct_count_add,
+        {"numElements": num_elements, "precision": add_precisions},
+    ),
+    "distinctCountAddWithMartingaleEstimator": (
+        distinct_count_add_with_martingale_estimator,
+        {"numElements": num_elements, "precision": add_precisions},
+    ),
+    "distinctCountEstimation": (
+        distinct_count_estimation,
+        {
+            "estimator": None,
+            "memorySizeForExamplesInBytes": memory_size_for_examples_in_bytes,
+            "numElements": num_elements,
+            "numMaxDifferentExamples": ["100"],
+            "precision": estimation_precisions,
+        },
+    ),
+    "registerScan": (
+        register_scan,
+        {
+            "estimator": None,
+            "memorySizeForExamplesInBytes": memory_size_for_examples_in_bytes,
+            "precision": estimation_precisions,
+        },
+    ),
+}
+
+
+def run_iteration(operation, duration):
+    gc.collect()
+    count = 0
+    start = time.perf_counter()
+    while True:
+        operation()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            return elapsed / count * 1e6
+
+
+def get_primary_metric(scores):
+    # the statistics JMH reports for a single fork
+    n = len(scores)
+    score = float(numpy.mean(scores))
+    if n > 1:
+        error = float(
+            scipy.stats.t.ppf(0.5 + 0.5 * score_confidence, n - 1)
+            * numpy.std(scores, ddof=1)
+            / numpy.sqrt(n)
+        )
+        confidence = [score - error, score + error]
+    else:
+        error = "NaN"
+        confidence = ["NaN", "NaN"]
+    percentiles = numpy.percentile(scores, score_percentiles, method="weibull")
+    return {
+        "score": score,
+        "scoreError": error,
+        "scoreConfidence": confidence,
+        "scorePercentiles": {
+            str(p): float(v) for p, v in zip(score_percentiles, percentiles)
+        },
+        "scoreUnit": "us/op",
+        "rawData": [[float(s) for s in scores]],
+    }
+
+
+def make_record(name, params, scores, warmup, iterations, duration):
+    return {
+        "jmhVersion": None,
+        "benchmark": name,
+        "mode": "avgt",
+        "threads": 1,
+        "forks": 1,
+        "jvm": sys.executable,
+        "jvmArgs": sys.argv[1:],
+        "jdkVersion": platform.python_version(),
+        "vmName": platform.python_implementation(),
+        "vmVersion": sys.version,
+        "warmupIterations": warmup,
+        "warmupTime": "%g s" % duration,
+        "warmupBatchSize": 1,
+        "measurementIterations": iterations,
+        "measurementTime": "%g s" % duration,
+        "measurementBatchSize": 1,
+        "params": params,
+        "primaryMetric": get_primary_metric(scores),
+        "secondaryMetrics": {},
+    }
+
+
+def get_parameter_grid(sketch, parameters, overrides):
+    parameters = dict(parameters)
+    if "estimator" in parameters:
+        parameters["estimator"] = list(sketches[sketch][2])
+    for key, values in overrides.items():
+        if key in parameters:
+            parameters[key] = values
+    keys = sorted(parameters)
+    for values in itertools.product(*(parameters[key] for key in keys)):
+        yield dict(zip(keys, values))
+
+
+def run(include, overrides, warmup, iterations, duration):
+    records = []
+    for sketch in sorted(sketches):
+        for benchmark in sorted(benchmarks):
+            name = benchmark_prefix + sketch + "PerformanceTest." + benchmark
+            if not re.search(include, name):
+                continue
+            setup, parameters = benchmarks[benchmark]
+            for params in get_parameter_grid(sketch, parameters, overrides):
+                operation = setup(sketch, params)
+                for _ in range(warmup):
+                    run_iteration(operation, duration)
+                scores = [run_iteration(operation, duration) for _ in range(iterations)]
+                records.append(
+                    make_record(name, params, scores, warmup, iterations, duration)
+                )
+                print(
+                    "%s %s: %.3f us/op"
+                    % (name, params, records[-1]["primaryMetric"]["score"]),
+                    flush=True,
+                )
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "include", nargs="?", default="", help="regular expression of benchmarks"
+    )
+    parser.add_argument("--output", default=result_file)
+    parser.add_argument("--warmup-iterations", type=int, default=warmup_iterations)
+    parser.add_argument("--iterations", type=int, default=measurement_iterations)
+    parser.add_argument(
+        "--time", type=float, default=iteration_time, help="seconds per iteration"
+    )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2",
+        help="override the values of a parameter",
+    )
+    args = parser.parse_args()
+    overrides = {}
+    for param in args.param:
+        key, _, values = param.partition("=")
+        overrides[key] = values.split(",")
+    records = run(
+        args.include, overrides, args.warmup_iterations, args.iterations, args.time
+    )
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(records, f, indent=4)
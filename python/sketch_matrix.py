@@ -0,0 +1,128 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import estimation
+import memory
+import ull
+
+# maximum number of unpacked 64-bit hash prefixes held in memory at once
+block_size = 1 << 23
+
+
+def as_rows(rows, num_rows):
+    rows = numpy.asarray(rows)
+    if rows.dtype == bool:
+        if rows.shape != (num_rows,):
+            raise IndexError("row mask of shape " + str(rows.shape))
+        return numpy.flatnonzero(rows)
+    rows = rows.astype(numpy.intp, copy=False).reshape(-1)
+    illegal = (rows < -num_rows) | (rows >= num_rows)
+    if numpy.any(illegal):
+        raise IndexError("row index " + str(rows[illegal][0]) + " out of range")
+    return numpy.where(rows < 0, rows + num_rows, rows)
+
+
+class SketchMatrix:
+
+    def __init__(self, p, num_sketches):
+        if not ull.min_p <= p <= ull.max_p:
+            raise ValueError("illegal precision parameter " + str(p))
+        self.p = p
+        self.registers = numpy.zeros((num_sketches, 1 << p), dtype=numpy.uint8)
+
+    @classmethod
+    def wrap(cls, registers):
+        registers = numpy.asarray(registers)
+        if registers.ndim != 2 or registers.dtype != numpy.uint8:
+            raise ValueError("registers must be a 2-dimensional uint8 array")
+        p = registers.shape[1].bit_length() - 1
+        if registers.shape[1] != 1 << p or not ull.min_p <= p <= ull.max_p:
+            raise ValueError("illegal number of registers " + str(registers.shape[1]))
+        matrix = cls.__new__(cls)
+        matrix.p = p
+        matrix.registers = registers
+        return matrix
+
+    def __len__(self):
+        return len(self.registers)
+
+    def in_memory_size_in_bytes(self):
+        return memory.get_in_memory_size(self)
+
+    def get_sketch(self, row):
+        # the returned sketch shares its registers with this matrix
+        return ull.UltraLogLog.wrap(self.registers[row])
+
+    def add_many(self, rows, hashes):
+        # rows are checked first, as an index outside the matrix would update
+        # the registers of another sketch
+        rows = as_rows(rows, len(self))
+        idx, k = ull.split_hashes(ull.as_hashes(hashes), self.p)
+        idx += rows << self.p
+        ull.update_registers(self.registers.reshape(-1), idx, k)
+        return self
+
+    def unions(self, groups):
+        # returns the registers of the union of each group of rows
+        groups = [as_rows(g, len(self)) for g in groups]
+        lengths = numpy.array([len(g) for g in groups], dtype=numpy.intp)
+        result = numpy.zeros((len(groups), 1 << self.p), dtype=numpy.uint8)
+        nonempty = numpy.flatnonzero(lengths)
+        if len(nonempty) == 0:
+            return result
+        rows = numpy.concatenate(groups)
+        offsets = (numpy.cumsum(lengths) - lengths)[nonempty]
+        num_columns = max(1, block_size // len(rows))
+        for start in range(0, 1 << self.p, num_columns):
+            columns = slice(start, start + num_columns)
+            prefixes = ull.unpack_table[self.registers[rows, columns]]
+            result[nonempty, columns] = ull.pack_prefixes(
+                numpy.bitwise_or.reduceat(prefixes, offsets, axis=0)
+            )
+        return result
+
+    def union(self, rows):
+        return ull.UltraLogLog.wrap(self.unions([rows])[0])
+
+    def downsize(self, p):
+        result = SketchMatrix(p, len(self))
+        num_rows = max(1, block_size >> self.p)
+        for start in range(0, len(self), num_rows):
+            rows = slice(start, start + num_rows)
+            result.registers[rows] = ull.reduce_precision(self.registers[rows], p)
+        return result
+
+    def get_distinct_count_estimates(
+        self, rows=None, estimator=estimation.fgra_estimate_from_histograms
+    ):
+        registers = self.registers if rows is None else self.registers[rows]
+        return estimator(estimation.register_histograms(registers), self.p)
+
+    def get_union_distinct_count_estimates(
+        self, groups, estimator=estimation.fgra_estimate_from_histograms
+    ):
+        return estimator(estimation.register_histograms(self.unions(groups)), self.p)
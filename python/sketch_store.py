@@ -0,0 +1,263 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import fcntl
+import hashlib
+import numpy
+import estimation
+import sketch_matrix
+import ull
+
+# File layout, all regions starting at page boundaries:
+#   header: magic, version, precision, capacity, index size, number of slots
+#   index: open addressing hash table mapping 128-bit key digests to slots
+#   registers: capacity x 2^p uint8 registers, one row per slot
+#
+# There may be a single writer and any number of concurrent readers. The
+# writer publishes a new key by first writing its digest, then the slot of
+# the index entry, and finally incrementing the number of slots. Readers
+# treat index entries with negative slot as empty. Registers are updated in
+# place. As registers never decrease, a reader always sees a valid sketch
+# that contains at least all elements added before the last completed write.
+magic = b"ULLSTORE"
+version = 1
+page_size = 4096
+
+header_dtype = numpy.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("p", "<u4"),
+        ("capacity", "<u8"),
+        ("index_size", "<u8"),
+        ("num_slots", "<u8"),
+    ]
+)
+
+index_dtype = numpy.dtype([("digest", "<u8", (2,)), ("slot", "<i8")])
+
+
+def align(offset):
+    return -(-offset // page_size) * page_size
+
+
+def lock(f):
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise ValueError("sketch store is already opened by a writer")
+    return f
+
+
+def unlock(f):
+    fcntl.flock(f, fcntl.LOCK_UN)
+    f.close()
+
+
+def key_digest(key):
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    return numpy.frombuffer(digest, dtype="<u8")
+
+
+class SketchStore:
+
+    def __init__(self, path, writable, lock_file=None):
+        # a writer may pass the file it already holds the writer lock on
+        self.path = path
+        self.writable = writable
+        self.lock_file = lock_file
+        if writable and lock_file is None:
+            self.lock_file = lock(open(path, "rb"))
+        try:
+            self.map(path, "r+" if writable else "r")
+        except Exception:
+            # the writer lock must not outlive a store that failed to open
+            if self.lock_file is not None:
+                unlock(self.lock_file)
+                self.lock_file = None
+            raise
+
+    def map(self, path, mode):
+        self.header = numpy.memmap(path, dtype=header_dtype, mode=mode, shape=(1,))
+        if self.header["magic"][0] != magic or self.header["version"][0] != version:
+            raise ValueError("not a sketch store: " + str(path))
+        self.p = int(self.header["p"][0])
+        self.capacity = int(self.header["capacity"][0])
+        index_size = int(self.header["index_size"][0])
+        index_offset = page_size
+        registers_offset = align(index_offset + index_size * index_dtype.itemsize)
+        self.index = numpy.memmap(
+            path, dtype=index_dtype, mode=mode, offset=index_offset, shape=(index_size,)
+        )
+        self.registers = numpy.memmap(
+            path,
+            dtype=numpy.uint8,
+            mode=mode,
+            offset=registers_offset,
+            shape=(self.capacity, 1 << self.p),
+        )
+
+    @classmethod
+    def create(cls, path, p, capacity):
+        if not ull.min_p <= p <= ull.max_p:
+            raise ValueError("illegal precision parameter " + str(p))
+        index_size = 1 << (2 * capacity - 1).bit_length()
+        registers_offset = align(page_size + index_size * index_dtype.itemsize)
+        # never overwrites an existing store, and the writer lock is held
+        # from creation on, so no other writer can open the store before its
+        # header and index are initialized
+        lock_file = lock(open(path, "xb"))
+        # the file is sparse, pages are only allocated when written
+        lock_file.truncate(registers_offset + capacity * (1 << p))
+        lock_file.flush()
+        header = numpy.memmap(path, dtype=header_dtype, mode="r+", shape=(1,))
+        header[0] = (magic, version, p, capacity, index_size, 0)
+        index = numpy.memmap(
+            path,
+            dtype=index_dtype,
+            mode="r+",
+            offset=page_size,
+            shape=(index_size,),
+        )
+        index["slot"] = -1
+        index.flush()
+        header.flush()
+        del index, header
+        return cls(path, writable=True, lock_file=lock_file)
+
+    @classmethod
+    def open(cls, path, writable=False):
+        return cls(path, writable)
+
+    def close(self):
+        if self.writable:
+            self.flush()
+        self.header = self.index = self.registers = None
+        if self.lock_file is not None:
+            unlock(self.lock_file)
+            self.lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def flush(self):
+        self.registers.flush()
+        self.index.flush()
+        self.header.flush()
+
+    def __len__(self):
+        return int(self.header["num_slots"][0])
+
+    def find_slot(self, digest, create=False):
+        mask = len(self.index) - 1
+        position = int(digest[0]) & mask
+        while True:
+            entry = self.index[position]
+            slot = int(entry["slot"])
+            if slot < 0:
+                break
+            if entry["digest"][0] == digest[0] and entry["digest"][1] == digest[1]:
+                return slot
+            position = (position + 1) & mask
+        if not create:
+            return -1
+        if not self.writable:
+            raise ValueError("sketch store is read-only")
+        slot = len(self)
+        if slot >= self.capacity:
+            raise ValueError("sketch store is full")
+        self.index["digest"][position] = digest
+        self.index["slot"][position] = slot
+        self.header["num_slots"] = slot + 1
+        return slot
+
+    def slot(self, key):
+        return self.find_slot(key_digest(key))
+
+    def slots(self, keys, create=False):
+        return numpy.array(
+            [self.find_slot(key_digest(key), create) for key in keys],
+            dtype=numpy.intp,
+        )
+
+    def existing_slots(self, keys):
+        keys = list(keys)
+        slots = self.slots(keys)
+        if numpy.any(slots < 0):
+            raise KeyError(keys[int(numpy.argmax(slots < 0))])
+        return slots
+
+    def __contains__(self, key):
+        return self.slot(key) >= 0
+
+    def get_sketch(self, key):
+        # the returned sketch shares its registers with the mapped file
+        slot = self.slot(key)
+        if slot < 0:
+            raise KeyError(key)
+        return ull.UltraLogLog.wrap(self.registers[slot])
+
+    def get_matrix(self):
+        # all sketches in slot order, sharing registers with the mapped file
+        return sketch_matrix.SketchMatrix.wrap(self.registers[: len(self)])
+
+    def add_many(self, key, hashes):
+        slot = self.find_slot(key_digest(key), create=True)
+        ull.UltraLogLog.wrap(self.registers[slot]).add_many(hashes)
+        return self
+
+    def add_many_keyed(self, keys, hashes):
+        # adds hashes[i] to the sketch of keys[i]
+        unique_keys, inverse = numpy.unique(numpy.asarray(keys), return_inverse=True)
+        slots = self.slots(unique_keys.tolist(), create=True)
+        self.get_matrix().add_many(slots[inverse], hashes)
+        return self
+
+    def merge(self, key, sketch):
+        if sketch.p != self.p:
+            raise ValueError("precision parameters do not match")
+        slot = self.find_slot(key_digest(key), create=True)
+        ull.merge_registers(
+            self.registers[slot],
+            sketch.get_state_registers(),
+            out=self.registers[slot],
+        )
+        return self
+
+    def get_distinct_count_estimates(
+        self, keys, estimator=estimation.fgra_estimate_from_histograms
+    ):
+        slots = self.existing_slots(keys)
+        return self.get_matrix().get_distinct_count_estimates(slots, estimator)
+
+    def union(self, keys):
+        return self.get_matrix().union(self.existing_slots(keys))
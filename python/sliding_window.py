@@ -0,0 +1,131 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import estimation
+import memory
+import ull
+
+# A sliding window over the last window_size time buckets, for example the
+# last 300 seconds at a resolution of one second. Time is given as integer
+# bucket index, like int(timestamp // resolution).
+#
+# The registers of each bucket are kept in a ring. The window is split at a
+# boundary into an older front and a newer back part. For every bucket of the
+# front, the union of all front buckets from there up to the boundary is
+# kept, the suffix aggregate. For the back part, only the union of all its
+# buckets is maintained. A query therefore merges just two register arrays.
+# When the oldest bucket of the window passes the boundary, the boundary is
+# moved to the newest bucket and the suffix aggregates are recomputed, which
+# takes window_size merges every window_size buckets and hence an amortized
+# constant number of merges per bucket. Expired buckets are reset in place.
+
+
+class SlidingWindow:
+
+    def __init__(self, p, window_size, time=0):
+        if not ull.min_p <= p <= ull.max_p:
+            raise ValueError("illegal precision parameter " + str(p))
+        if window_size < 1:
+            raise ValueError("illegal window size " + str(window_size))
+        self.p = p
+        self.window_size = window_size
+        self.buckets = numpy.zeros((window_size, 1 << p), dtype=numpy.uint8)
+        self.suffixes = numpy.zeros((window_size, 1 << p), dtype=numpy.uint8)
+        self.back = numpy.zeros(1 << p, dtype=numpy.uint8)
+        # newest bucket and first bucket of the back part
+        self.time = time
+        self.boundary = time
+
+    def in_memory_size_in_bytes(self):
+        return memory.get_in_memory_size(self)
+
+    def get_oldest_time(self):
+        return self.time - self.window_size + 1
+
+    def slot(self, time):
+        return time % self.window_size
+
+    def advance(self, time):
+        if time <= self.time:
+            return self
+        if time - self.time >= self.window_size:
+            self.buckets.fill(0)
+            self.suffixes.fill(0)
+            self.back.fill(0)
+            self.time = time
+            self.boundary = time
+            return self
+        for t in range(self.time + 1, time + 1):
+            self.buckets[self.slot(t)] = 0
+        self.time = time
+        if self.get_oldest_time() > self.boundary:
+            self.flip()
+        return self
+
+    def flip(self):
+        # makes all buckets except the newest one part of the front
+        self.back[:] = self.buckets[self.slot(self.time)]
+        suffix = numpy.zeros(1 << self.p, dtype=numpy.uint8)
+        for t in range(self.time - 1, self.get_oldest_time() - 1, -1):
+            s = self.slot(t)
+            suffix = ull.merge_registers(suffix, self.buckets[s], out=self.suffixes[s])
+        self.boundary = self.time
+
+    def add_many(self, hashes, time=None):
+        if time is None:
+            time = self.time
+        self.advance(time)
+        if time < self.get_oldest_time():
+            # late data of an expired bucket
+            return self
+        idx, k = ull.split_hashes(ull.as_hashes(hashes), self.p)
+        ull.update_registers(self.buckets[self.slot(time)], idx, k)
+        if time >= self.boundary:
+            ull.update_registers(self.back, idx, k)
+        else:
+            # late data of a front bucket is part of the suffix aggregates of
+            # all older buckets
+            for t in range(self.get_oldest_time(), time + 1):
+                ull.update_registers(self.suffixes[self.slot(t)], idx, k)
+        return self
+
+    def add(self, hash_value, time=None):
+        return self.add_many([hash_value], time)
+
+    def get_registers(self):
+        oldest = self.get_oldest_time()
+        if oldest < self.boundary:
+            return ull.merge_registers(self.suffixes[self.slot(oldest)], self.back)
+        return self.back.copy()
+
+    def get_sketch(self):
+        return ull.UltraLogLog.wrap(self.get_registers())
+
+    def get_distinct_count_estimate(
+        self, estimator=estimation.fgra_estimate_from_histograms
+    ):
+        return self.get_sketch().get_distinct_count_estimate(estimator)
@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import accumulators
+
+
+def random_values(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.normal(1e6, 10.0, (n, 2, 3))
+
+
+def assert_matches(accumulator, values):
+    assert accumulator.count == len(values)
+    numpy.testing.assert_allclose(accumulator.mean, values.mean(axis=0), rtol=1e-12)
+    numpy.testing.assert_allclose(
+        accumulator.get_variance(), values.var(axis=0), rtol=1e-9
+    )
+    numpy.testing.assert_allclose(
+        accumulator.get_variance(ddof=1), values.var(axis=0, ddof=1), rtol=1e-9
+    )
+    numpy.testing.assert_allclose(
+        accumulator.get_mean_square(), numpy.mean(values**2, axis=0), rtol=1e-12
+    )
+    numpy.testing.assert_array_equal(accumulator.min, values.min(axis=0))
+    numpy.testing.assert_array_equal(accumulator.max, values.max(axis=0))
+
+
+def test_add_and_add_many_match_numpy():
+    # values with a large mean relative to their spread, for which the naive
+    # sum of squares would lose all precision
+    values = random_values(1000)
+    single = accumulators.MomentAccumulator((2, 3))
+    for v in values:
+        single.add(v)
+    assert_matches(single, values)
+    assert_matches(accumulators.MomentAccumulator((2, 3)).add_many(values), values)
+
+
+def test_merge_matches_numpy():
+    values = random_values(1000)
+    parts = numpy.split(values, [0, 1, 300, 301, 1000])
+    result = accumulators.MomentAccumulator((2, 3))
+    for part in parts:
+        result.merge(accumulators.MomentAccumulator((2, 3)).add_many(part))
+    assert_matches(result, values)
+    with pytest.raises(ValueError):
+        result.merge(accumulators.MomentAccumulator((3, 2)))
+
+
+def test_copy_is_independent():
+    values = random_values(10)
+    accumulator = accumulators.MomentAccumulator((2, 3)).add_many(values)
+    copy = accumulator.copy()
+    copy.add(values[0])
+    assert_matches(accumulator, values)
+
+
+@pytest.mark.parametrize("shape", [(), (5,), (2, 3)])
+def test_state_round_trip(shape):
+    rng = numpy.random.default_rng(0)
+    accumulator = accumulators.MomentAccumulator(shape)
+    accumulator.add_many(rng.random((20,) + shape))
+    wrapped = accumulators.MomentAccumulator.wrap(accumulator.get_state())
+    assert wrapped.shape == shape
+    assert wrapped.count == accumulator.count
+    for name in ["mean", "m2", "min", "max"]:
+        numpy.testing.assert_array_equal(
+            getattr(wrapped, name), getattr(accumulator, name)
+        )
+    assert wrapped.get_state() == accumulator.get_state()
+
+
+def test_wrap_rejects_illegal_states():
+    state = accumulators.MomentAccumulator((2, 3)).add(numpy.ones((2, 3))).get_state()
+    with pytest.raises(ValueError):
+        accumulators.MomentAccumulator.wrap(b"XXXX" + state[4:])
+    with pytest.raises(ValueError):
+        accumulators.MomentAccumulator.wrap(state[:-8])
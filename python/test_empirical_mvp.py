@@ -0,0 +1,95 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import empirical_mvp
+
+p = 6
+num_cycles = 2 * empirical_mvp.cycles_per_task
+distinct_counts = [1, 10, 100]
+
+
+def compute(**kwargs):
+    return empirical_mvp.compute(
+        p, num_cycles, distinct_counts, num_workers=1, **kwargs
+    )
+
+
+def assert_equal(accumulator1, accumulator2):
+    assert accumulator1.get_state() == accumulator2.get_state()
+
+
+def test_resume_gives_identical_results(tmp_path):
+    # a checkpoint written after the first task, as if the run had been
+    # interrupted there
+    file = str(tmp_path / "checkpoint")
+    first = empirical_mvp.cycles_per_task
+    partial = compute(last_cycle=first)
+    metadata = empirical_mvp.get_metadata(
+        p, num_cycles, distinct_counts, empirical_mvp.seed, 0, num_cycles
+    )
+    empirical_mvp.write_checkpoint(file, metadata, first, partial)
+    resumed = compute(checkpoint_file=file)
+    full = compute()
+    assert_equal(resumed, full)
+    read_metadata, next_cycle, saved = empirical_mvp.read_checkpoint(file)
+    assert read_metadata == metadata
+    assert next_cycle == num_cycles
+    assert_equal(saved, full)
+    # a completed checkpoint is returned without computing anything
+    assert_equal(compute(checkpoint_file=file), full)
+
+
+def test_checkpoint_of_another_configuration_is_rejected(tmp_path):
+    file = str(tmp_path / "checkpoint")
+    compute(last_cycle=empirical_mvp.cycles_per_task, checkpoint_file=file)
+    with pytest.raises(ValueError):
+        compute(checkpoint_file=file)
+
+
+def test_illegal_cycle_ranges_are_rejected():
+    with pytest.raises(ValueError):
+        compute(first_cycle=1)
+    with pytest.raises(ValueError):
+        compute(last_cycle=num_cycles + 1)
+
+
+def test_merged_chunks_equal_a_single_run(tmp_path):
+    files = [str(tmp_path / "chunk0"), str(tmp_path / "chunk1")]
+    middle = empirical_mvp.cycles_per_task
+    compute(last_cycle=middle, checkpoint_file=files[0])
+    compute(first_cycle=middle, checkpoint_file=files[1])
+    metadata, merged = empirical_mvp.merge_checkpoints(files[::-1])
+    full = compute()
+    assert metadata["number of cycles"] == num_cycles
+    assert merged.count == full.count
+    for name in ["mean", "m2", "min", "max"]:
+        numpy.testing.assert_allclose(
+            getattr(merged, name), getattr(full, name), rtol=1e-12, atol=1e-9
+        )
+    with pytest.raises(ValueError):
+        empirical_mvp.merge_checkpoints(files[1:])
@@ -0,0 +1,112 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import entropy_coding
+import hll
+import ull
+
+distinct_counts = [0, 1, 10, 1000, 100000]
+
+
+def random_hashes(n, seed):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def ull_registers(p, n, seed=0):
+    return ull.UltraLogLog(p, sparse=False).add_many(random_hashes(n, seed)).registers
+
+
+def hll_registers(p, n, seed=0):
+    return hll.HyperLogLog(p).add_many(random_hashes(n, seed)).registers
+
+
+@pytest.mark.parametrize("p", [3, 4, 8, 11, 12, 14])
+@pytest.mark.parametrize("n", distinct_counts)
+def test_ull_round_trip(p, n):
+    registers = ull_registers(p, n)
+    data = entropy_coding.encode_ull(registers)
+    assert data[1] >> 3 == p
+    numpy.testing.assert_array_equal(entropy_coding.decode_ull(data), registers)
+
+
+@pytest.mark.parametrize("p", [4, 8, 12, 14])
+@pytest.mark.parametrize("n", distinct_counts)
+def test_hll_round_trip(p, n):
+    registers = hll_registers(p, n)
+    data = entropy_coding.encode_hll(registers)
+    numpy.testing.assert_array_equal(entropy_coding.decode_hll(data), registers)
+
+
+@pytest.mark.parametrize("p", [4, 12])
+def test_batch_round_trip(p):
+    # sketches of different distinct counts, including empty ones, are coded
+    # at once and each equals the individually coded sketch
+    registers = numpy.array(
+        [ull_registers(p, n, seed) for seed, n in enumerate(distinct_counts * 2)]
+    )
+    data = entropy_coding.encode_ull(registers)
+    assert data == [entropy_coding.encode_ull(r) for r in registers]
+    numpy.testing.assert_array_equal(entropy_coding.decode_ull(data), registers)
+
+
+@pytest.mark.parametrize("p", [4, 12])
+def test_short_and_long_first_states(p):
+    # the first lane state takes 3 or 4 bytes, which is told apart by the
+    # parity of the length
+    registers = numpy.array([ull_registers(p, 1000, seed) for seed in range(20)])
+    data = entropy_coding.encode_ull(registers)
+    assert {len(d) % 2 for d in data} == {0, 1}
+    numpy.testing.assert_array_equal(entropy_coding.decode_ull(data), registers)
+
+
+def test_extreme_register_values():
+    # the largest valid register values, which have tiny model probabilities
+    p = 8
+    registers = ull_registers(p, 1000)
+    registers[:4] = [(63 << 2) | e for e in range(4)]
+    registers[4] = 0
+    numpy.testing.assert_array_equal(
+        entropy_coding.decode_ull(entropy_coding.encode_ull(registers)), registers
+    )
+
+
+def test_invalid_registers_are_rejected():
+    registers = numpy.zeros(1 << 8, dtype=numpy.uint8)
+    registers[0] = 1
+    with pytest.raises(ValueError):
+        entropy_coding.encode_ull(registers)
+
+
+def test_mixed_precisions_are_rejected():
+    data = [
+        entropy_coding.encode_ull(ull_registers(4, 10)),
+        entropy_coding.encode_ull(ull_registers(5, 10)),
+    ]
+    with pytest.raises(ValueError):
+        entropy_coding.decode_ull(data)
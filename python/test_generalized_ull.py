@@ -0,0 +1,164 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import bit_packing
+import generalized_ull
+import ull
+
+# Reference registers computed hash by hash with exact integer arithmetic:
+# the update value of a hash is the smallest k with b^(-k) <= y = x / 2^64,
+# where x are the hash bits after the index with a sentinel bit at position
+# p - 1.
+
+mask64 = 0xFFFFFFFFFFFFFFFF
+
+# (p, q, d, r)
+configs = [(4, 6, 2, 1), (10, 6, 0, 1), (4, 7, 8, 2), (10, 8, 20, 4), (6, 6, 3, 3)]
+
+
+def reference_update_value(hash_value, p, q, r):
+    x = ((hash_value << p) & mask64) | (1 << (p - 1))
+    e = x.bit_length() - 1
+    # 1 + f = x / 2^e and the update value decreases by one for every
+    # j < r with (1 + f)^r >= 2^j
+    j = sum(1 for i in range(1, r) if x ** r >= 1 << (i + e * r))
+    return min(r * (64 - e) - j, generalized_ull.max_update_value(p, q, r))
+
+
+def reference_registers(hashes, p, q, d, r):
+    registers = [0] * (1 << p)
+    for hash_value in hashes:
+        hash_value = int(hash_value)
+        idx = hash_value >> (64 - p)
+        k = reference_update_value(hash_value, p, q, r)
+        u, bits = registers[idx] >> d, registers[idx] & ((1 << d) - 1)
+        if k > u:
+            bits = ((bits | (1 << d)) if u > 0 else bits) >> min(k - u, 63)
+            u = k
+        elif 1 <= u - k <= d:
+            bits |= 1 << (d - (u - k))
+        registers[idx] = (u << d) | (bits & ((1 << d) - 1))
+    return registers
+
+
+def random_hashes(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def low_entropy_hashes(n, p, seed=0):
+    # hashes with many leading zeros after the index bits reach the largest
+    # update values
+    rng = numpy.random.default_rng(seed)
+    index_bits = random_hashes(n, seed) & numpy.uint64((mask64 << (64 - p)) & mask64)
+    shifts = rng.integers(0, 64 - p, n, dtype=numpy.uint64)
+    return index_bits | (random_hashes(n, seed + 1) >> numpy.uint64(p) >> shifts)
+
+
+@pytest.mark.parametrize("p, q, d, r", configs)
+def test_batch_and_single_add_match_reference(p, q, d, r):
+    values = numpy.concatenate([random_hashes(2000), low_entropy_hashes(500, p)])
+    expected = reference_registers(values, p, q, d, r)
+    batch = generalized_ull.GeneralizedUltraLogLog(p, q, d, r)
+    for chunk in numpy.array_split(values, [5, 50, 1000]):
+        batch.add_many(chunk)
+    single = generalized_ull.GeneralizedUltraLogLog(p, q, d, r)
+    for hash_value in values[:200]:
+        single.add(hash_value)
+    single.add_many(values[200:])
+    numpy.testing.assert_array_equal(batch.registers, expected)
+    numpy.testing.assert_array_equal(single.registers, expected)
+
+
+@pytest.mark.parametrize("p", [4, 12])
+def test_q6_d2_b2_equals_ultraloglog(p):
+    # ULL registers store u + p - 2 instead of u
+    values = numpy.concatenate([random_hashes(5000), low_entropy_hashes(1000, p)])
+    registers = generalized_ull.GeneralizedUltraLogLog(p, 6, 2, 1).add_many(values)
+    expected = ull.UltraLogLog(p, sparse=False).add_many(values)
+    offset = numpy.where(registers.registers > 0, (p - 2) << 2, 0)
+    numpy.testing.assert_array_equal(
+        registers.registers + offset, expected.get_state_registers()
+    )
+
+
+@pytest.mark.parametrize("element_size", [1, 3, 8, 13, 28, 63, 64])
+def test_bit_packing_round_trip(element_size):
+    rng = numpy.random.default_rng(element_size)
+    values = rng.integers(0, 1 << element_size, 101, dtype=numpy.uint64)
+    words = bit_packing.pack_bits(values, element_size)
+    assert len(words) == -(-101 * element_size // 64)
+    expected = sum(int(v) << (element_size * i) for i, v in enumerate(values))
+    assert int.from_bytes(words.tobytes(), "little") == expected
+    numpy.testing.assert_array_equal(
+        bit_packing.unpack_bits(words, element_size, 101), values
+    )
+
+
+@pytest.mark.parametrize("p, q, d, r", configs)
+def test_state_round_trip(p, q, d, r):
+    sketch = generalized_ull.GeneralizedUltraLogLog(p, q, d, r)
+    sketch.add_many(random_hashes(3000))
+    state = sketch.get_state()
+    assert len(state) == sketch.serialized_size_in_bytes()
+    wrapped = generalized_ull.GeneralizedUltraLogLog.wrap(state, p, q, d, r)
+    numpy.testing.assert_array_equal(wrapped.registers, sketch.registers)
+    with pytest.raises(ValueError):
+        generalized_ull.GeneralizedUltraLogLog.wrap(state + bytes(8), p, q, d, r)
+
+
+def test_merge_equals_union():
+    p, q, d, r = 8, 8, 20, 4
+    values = random_hashes(20000)
+    sketch1 = generalized_ull.GeneralizedUltraLogLog(p, q, d, r)
+    sketch2 = sketch1.copy()
+    sketch1.add_many(values[:12000])
+    sketch2.add_many(values[8000:])
+    sketch1.merge(sketch2)
+    numpy.testing.assert_array_equal(
+        sketch1.registers, reference_registers(values, p, q, d, r)
+    )
+    with pytest.raises(ValueError):
+        sketch1.merge(generalized_ull.GeneralizedUltraLogLog(p, q, d + 1, r))
+
+
+def test_invalid_parameters_are_rejected():
+    for args in [(2,), (8, 0), (8, 8, -1), (8, 40, 30), (8, 8, 20, 0)]:
+        with pytest.raises(ValueError):
+            generalized_ull.GeneralizedUltraLogLog(*args)
+
+
+@pytest.mark.parametrize("p, q, d, r", configs)
+def test_estimate(p, q, d, r):
+    sketch = generalized_ull.GeneralizedUltraLogLog(p, q, d, r)
+    assert sketch.get_distinct_count_estimate() == 0.0
+    sketch.add_many(random_hashes(100000))
+    relative_error = 4.0 / numpy.sqrt(1 << p)
+    assert sketch.get_distinct_count_estimate() == pytest.approx(
+        100000, rel=relative_error
+    )
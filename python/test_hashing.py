@@ -0,0 +1,128 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import hashing
+
+# Reference values of XXH3-64 with seed 0 computed by the reference C
+# implementation (through the xxhash package) for prefixes of the bytes
+# 0, 1, ..., 255, 0, 1, ..., covering all length classes of XXH3.
+
+pattern = bytes(range(256)) * 10
+
+prefix_hashes = {
+    0: 0x2D06800538D394C2,
+    1: 0xC44BDFF4074EECDB,
+    3: 0x5F4299FC161C9CBB,
+    4: 0x60DAB036A58211F2,
+    8: 0x3A1C2D7C85AF88F8,
+    9: 0xE9612598145BB9DC,
+    16: 0x8355E3A6F61770DB,
+    17: 0x9EF341A99DE37328,
+    128: 0x85C6174C7FF4C46B,
+    129: 0xEC7642B431BA3E5A,
+    240: 0x375A384D957FE865,
+    241: 0x02E8CD95421C6D02,
+    1024: 0xA870F92984398D22,
+    2049: 0x62DFF343E7DBAC9B,
+}
+
+long_hashes = {
+    0: 0xC77B3ABB6F87ACD9,
+    1: 0x2FBC593564DB792E,
+    -1: 0x5111C7E47D784413,
+    0x123456789ABCDEF0: 0x2151AE84F6DED376,
+}
+
+
+def test_byte_strings_match_reference():
+    lengths = list(prefix_hashes)
+    result = hashing.hash_byte_strings(pattern[:n] for n in lengths)
+    assert result.dtype == numpy.uint64
+    assert result.tolist() == [prefix_hashes[n] for n in lengths]
+
+
+def test_longs_match_reference():
+    values = list(long_hashes)
+    expected = [long_hashes[v] for v in values]
+    assert hashing.hash_longs(numpy.array(values, dtype=numpy.int64)).tolist() == (
+        expected
+    )
+    unsigned = numpy.array(values, dtype=numpy.int64).view(numpy.uint64)
+    assert hashing.hash_longs(unsigned).tolist() == expected
+
+
+def test_integers_hash_like_their_little_endian_bytes():
+    rng = numpy.random.default_rng(0)
+    longs = rng.integers(-(1 << 63), 1 << 63, 1000, dtype=numpy.int64)
+    ints = rng.integers(-(1 << 31), 1 << 31, 1000, dtype=numpy.int32)
+    numpy.testing.assert_array_equal(
+        hashing.hash_longs(longs),
+        hashing.hash_byte_strings(v.astype("<i8").tobytes() for v in longs),
+    )
+    numpy.testing.assert_array_equal(
+        hashing.hash_ints(ints),
+        hashing.hash_byte_strings(v.astype("<i4").tobytes() for v in ints),
+    )
+    numpy.testing.assert_array_equal(
+        hashing.hash_longs(longs.reshape(10, 100)).reshape(-1),
+        hashing.hash_longs(longs),
+    )
+
+
+def test_strings_hash_like_their_utf16_code_units():
+    values = ["", "abc", "ä€", "\U0001f600", "x" * 300]
+    numpy.testing.assert_array_equal(
+        hashing.hash_strings(values),
+        hashing.hash_byte_strings(v.encode("utf-16-le") for v in values),
+    )
+
+
+def test_packed_byte_strings():
+    # strings of different length classes mixed within one chunk and
+    # spanning several chunks
+    rng = numpy.random.default_rng(0)
+    lengths = rng.choice([0, 5, 12, 100, 200, 1000, 3000], 3 * hashing.bytes_chunk_size)
+    offsets = numpy.zeros(len(lengths) + 1, dtype=numpy.int64)
+    numpy.cumsum(lengths, out=offsets[1:])
+    data = rng.integers(0, 256, offsets[-1], dtype=numpy.uint8).tobytes()
+    result = hashing.hash_bytes(data, offsets)
+    for i in rng.choice(len(lengths), 200, replace=False):
+        expected = hashing.hash_byte_strings([data[offsets[i] : offsets[i + 1]]])
+        assert result[i] == expected[0]
+
+
+def test_random_byte_strings_match_xxhash():
+    xxhash = pytest.importorskip("xxhash")
+    rng = numpy.random.default_rng(0)
+    values = [
+        rng.integers(0, 256, n, dtype=numpy.uint8).tobytes()
+        for n in rng.integers(0, 2500, 2000)
+    ]
+    assert hashing.hash_byte_strings(values).tolist() == [
+        xxhash.xxh3_64_intdigest(v) for v in values
+    ]
@@ -0,0 +1,125 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import hll
+
+# Reference registers and states computed as the HyperLogLog implementation
+# of hash4j does, hash by hash and bit by bit.
+
+mask64 = 0xFFFFFFFFFFFFFFFF
+
+
+def reference_registers(hashes, p):
+    q = 64 - p
+    registers = [0] * (1 << p)
+    for hash_value in hashes:
+        hash_value = int(hash_value)
+        rest = (hash_value << p) & mask64
+        value = min(64 - rest.bit_length(), q) + 1
+        idx = hash_value >> q
+        registers[idx] = max(registers[idx], value)
+    return registers
+
+
+def reference_state(registers):
+    # 6-bit registers packed in little-endian order
+    packed = sum(r << (6 * i) for i, r in enumerate(registers))
+    return packed.to_bytes(6 * len(registers) // 8, "little")
+
+
+def random_hashes(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def low_entropy_hashes(n, p, seed=0):
+    # hashes with many trailing zeros after the index bits
+    rng = numpy.random.default_rng(seed)
+    idx = rng.integers(0, 1 << p, n, dtype=numpy.uint64)
+    shifts = rng.integers(0, 65 - p, n, dtype=numpy.uint64)
+    lower = numpy.uint64(mask64 >> p) >> shifts
+    return (idx << numpy.uint64(64 - p)) | lower
+
+
+@pytest.mark.parametrize("p", [3, 4, 8, 12])
+@pytest.mark.parametrize("low_entropy", [False, True])
+def test_batch_and_sequential_add_match_reference(p, low_entropy):
+    values = low_entropy_hashes(5000, p) if low_entropy else random_hashes(5000)
+    expected = reference_registers(values, p)
+    batch = hll.HyperLogLog(p).add_many(values)
+    sequential = hll.HyperLogLog(p)
+    for hash_value in values:
+        sequential.add(hash_value)
+    numpy.testing.assert_array_equal(batch.registers, expected)
+    numpy.testing.assert_array_equal(sequential.registers, expected)
+
+
+def test_extreme_hash_values():
+    p = 8
+    sketch = hll.HyperLogLog(p).add(mask64).add(0)
+    assert sketch.registers[-1] == 1
+    assert sketch.registers[0] == 65 - p
+
+
+@pytest.mark.parametrize("p", [4, 11])
+def test_state_round_trip(p):
+    sketch = hll.HyperLogLog(p).add_many(low_entropy_hashes(1000, p))
+    state = sketch.get_state()
+    assert state == reference_state(sketch.registers.tolist())
+    assert len(state) == sketch.serialized_size_in_bytes()
+    wrapped = hll.HyperLogLog.wrap(state)
+    assert wrapped.p == p
+    numpy.testing.assert_array_equal(wrapped.registers, sketch.registers)
+
+
+@pytest.mark.parametrize("length", [0, 3, 5, 9])
+def test_wrap_rejects_illegal_state_lengths(length):
+    with pytest.raises(ValueError):
+        hll.HyperLogLog.wrap(bytes(length))
+
+
+def test_merge_equals_union():
+    p = 10
+    values = random_hashes(20000)
+    sketch1 = hll.HyperLogLog(p).add_many(values[:12000])
+    sketch2 = hll.HyperLogLog(p).add_many(values[8000:])
+    copy = sketch1.copy()
+    sketch1.merge(sketch2)
+    numpy.testing.assert_array_equal(
+        sketch1.registers, hll.HyperLogLog(p).add_many(values).registers
+    )
+    assert not numpy.array_equal(copy.registers, sketch1.registers)
+    with pytest.raises(ValueError):
+        sketch1.merge(hll.HyperLogLog(p + 1))
+
+
+def test_estimate():
+    p = 12
+    assert hll.HyperLogLog(p).get_distinct_count_estimate() == 0.0
+    sketch = hll.HyperLogLog(p).add_many(random_hashes(100000))
+    assert sketch.get_distinct_count_estimate() == pytest.approx(100000, rel=0.05)
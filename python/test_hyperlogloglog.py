@@ -0,0 +1,130 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import hyperlogloglog
+
+# Reference registers computed hash by hash as in
+# c++/hyperlogloglog/HyperLogLogLog.hpp, with the register index from
+# Fibonacci hashing and the number of leading zeros plus one of the hash
+# capped to 63.
+
+mask64 = 0xFFFFFFFFFFFFFFFF
+
+flags = [
+    hyperlogloglog.compress_default,
+    hyperlogloglog.compress_when_append | hyperlogloglog.compress_type_full,
+    hyperlogloglog.compress_when_always | hyperlogloglog.compress_type_increase,
+    hyperlogloglog.compress_bottom,
+]
+
+
+def reference_registers(hashes, m):
+    log_m = m.bit_length() - 1
+    registers = [0] * m
+    for hash_value in hashes:
+        hash_value = int(hash_value)
+        j = ((hash_value * 0x9E3779B97F4A7C15) & mask64) >> (64 - log_m) if m > 1 else 0
+        r = min(64 - hash_value.bit_length() + 1, 63)
+        registers[j] = max(registers[j], r)
+    return registers
+
+
+def random_hashes(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+@pytest.mark.parametrize("m", [1, 16, 1024])
+@pytest.mark.parametrize("flag", flags)
+def test_batch_and_sequential_add_match_reference(m, flag):
+    extreme = numpy.array([0, mask64, 1], dtype=numpy.uint64)
+    values = numpy.concatenate([random_hashes(3000), extreme])
+    expected = reference_registers(values, m)
+    batch = hyperlogloglog.HyperLogLogLog(m, flags=flag)
+    for chunk in numpy.array_split(values, [10, 100, 1000]):
+        batch.add_many(chunk)
+    sequential = hyperlogloglog.HyperLogLogLog(m, flags=flag)
+    for hash_value in values[-300:]:
+        sequential.add(hash_value)
+    sequential.add_many(values[:-300])
+    numpy.testing.assert_array_equal(batch.export_registers(), expected)
+    numpy.testing.assert_array_equal(sequential.export_registers(), expected)
+    assert batch.bit_size() >= hyperlogloglog.minimum_bits(
+        expected, batch.m_bits, hyperlogloglog.s_bits
+    )
+
+
+@pytest.mark.parametrize("m_bits", [2, 3, 4])
+def test_full_compression_minimizes_the_size(m_bits):
+    m = 256
+    sketch = hyperlogloglog.HyperLogLogLog(m, m_bits)
+    for chunk in numpy.array_split(random_hashes(20000), 20):
+        sketch.add_many(chunk)
+        assert sketch.bit_size() == hyperlogloglog.minimum_bits(
+            sketch.export_registers(), m_bits, hyperlogloglog.s_bits
+        )
+    assert sketch.serialized_size_in_bytes() == (sketch.bit_size() + 7) // 8
+
+
+@pytest.mark.parametrize("flag", flags)
+def test_merge_equals_union(flag):
+    m = 512
+    values = random_hashes(30000)
+    sketch1 = hyperlogloglog.HyperLogLogLog(m, flags=flag).add_many(values[:20000])
+    sketch2 = hyperlogloglog.HyperLogLogLog(m, flags=flag).add_many(values[10000:])
+    merged = sketch1.merge(sketch2)
+    numpy.testing.assert_array_equal(
+        merged.export_registers(), reference_registers(values, m)
+    )
+
+
+def test_merge_rejects_different_parameters():
+    sketch = hyperlogloglog.HyperLogLogLog(64)
+    for other in [
+        hyperlogloglog.HyperLogLogLog(128),
+        hyperlogloglog.HyperLogLogLog(64, 4),
+        hyperlogloglog.HyperLogLogLog(64, flags=hyperlogloglog.compress_bottom),
+    ]:
+        with pytest.raises(ValueError):
+            sketch.merge(other)
+
+
+def test_invalid_parameters_are_rejected():
+    with pytest.raises(ValueError):
+        hyperlogloglog.HyperLogLogLog(100)
+    with pytest.raises(ValueError):
+        hyperlogloglog.HyperLogLogLog(
+            64, flags=hyperlogloglog.compress_bottom | hyperlogloglog.compress_type_full
+        )
+
+
+def test_estimate():
+    m = 4096
+    assert hyperlogloglog.HyperLogLogLog(m).get_distinct_count_estimate() == 0.0
+    sketch = hyperlogloglog.HyperLogLogLog(m).add_many(random_hashes(100000))
+    assert sketch.get_distinct_count_estimate() == pytest.approx(100000, rel=0.05)
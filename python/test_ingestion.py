@@ -0,0 +1,76 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import ingestion
+import ull
+
+p = 8
+
+
+def random_hashes(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def expected_registers(hashes):
+    return ull.UltraLogLog(p, sparse=False).add_many(hashes).get_state_registers()
+
+
+def test_chunks():
+    hashes = random_hashes(10)
+    chunks = list(ingestion.chunks(iter(hashes.tolist()), 4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    numpy.testing.assert_array_equal(numpy.concatenate(chunks), hashes)
+    arrays = [hashes[:3], hashes[3:]]
+    chunks = list(ingestion.chunks(arrays, 4))
+    assert [len(c) for c in chunks] == [3, 7]
+    assert list(ingestion.chunks([], 4)) == []
+
+
+@pytest.mark.parametrize("source", ["file", "array", "iterable", "arrays"])
+def test_ingest_equals_add_many(source, tmp_path):
+    hashes = random_hashes(10000)
+    if source == "file":
+        path = tmp_path / "hashes.bin"
+        hashes.astype("<u8").tofile(path)
+        data = str(path)
+    elif source == "array":
+        data = hashes
+    elif source == "iterable":
+        data = iter(hashes.tolist())
+    else:
+        data = numpy.array_split(hashes, 7)
+    sketch = ingestion.ingest(data, p, num_workers=2, chunk_size=1000)
+    numpy.testing.assert_array_equal(
+        sketch.get_state_registers(), expected_registers(hashes)
+    )
+
+
+def test_ingest_empty_array():
+    sketch = ingestion.ingest(numpy.zeros(0, dtype=numpy.uint64), p, num_workers=2)
+    assert sketch.get_distinct_count_estimate() == 0.0
@@ -0,0 +1,91 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import hll
+import martingale
+import ull
+
+
+def random_hashes(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def test_sequential_states():
+    rng = numpy.random.default_rng(0)
+    idx = rng.integers(0, 7, 1000)
+    values = rng.integers(0, 1 << 20, 1000)
+    exclusive, inclusive = martingale.sequential_states(idx, values, numpy.maximum)
+    state = {}
+    for i, (j, v) in enumerate(zip(idx, values)):
+        assert exclusive[i] == state.get(j, 0)
+        state[j] = max(state.get(j, 0), v)
+        assert inclusive[i] == state[j]
+
+
+def test_state_changed_many_equals_state_changed():
+    decrements = numpy.random.default_rng(0).random(1000) / 2000
+    sequential = martingale.MartingaleEstimator()
+    for decrement in decrements:
+        sequential.state_changed(decrement)
+    batch = martingale.MartingaleEstimator()
+    batch.state_changed_many(decrements[:300])
+    batch.state_changed_many(decrements[300:])
+    assert batch.get_distinct_count_estimate() == pytest.approx(
+        sequential.get_distinct_count_estimate(), rel=1e-12
+    )
+    assert batch.get_state_change_probability() == pytest.approx(
+        sequential.get_state_change_probability(), rel=1e-12
+    )
+
+
+@pytest.mark.parametrize(
+    "create",
+    [
+        lambda p: ull.UltraLogLog(p),
+        lambda p: ull.UltraLogLog(p, sparse=False),
+        hll.HyperLogLog,
+    ],
+)
+def test_batch_and_sequential_add_give_the_same_estimate(create):
+    # batches of different sizes with many repeated hashes and registers
+    p = 6
+    values = random_hashes(3000)
+    values = numpy.concatenate([values, values[::7]])
+    sequential = martingale.MartingaleEstimator()
+    sequential_sketch = create(p)
+    for hash_value in values:
+        sequential_sketch.add(hash_value, sequential)
+    batch = martingale.MartingaleEstimator()
+    batch_sketch = create(p)
+    for chunk in numpy.array_split(values, [10, 100, 1000]):
+        batch_sketch.add_many(chunk, batch)
+    assert batch.get_distinct_count_estimate() == pytest.approx(
+        sequential.get_distinct_count_estimate(), rel=1e-12
+    )
+    assert batch.get_distinct_count_estimate() == pytest.approx(3000, rel=0.2)
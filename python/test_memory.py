@@ -0,0 +1,58 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import memory
+import sketch_matrix
+import ull
+
+
+def test_owned_arrays_include_their_buffer():
+    array = numpy.zeros(1000, dtype=numpy.uint8)
+    assert memory.get_in_memory_size(array) >= 1000
+
+
+def test_shared_objects_are_counted_once():
+    array = numpy.zeros(1000, dtype=numpy.uint8)
+    size = memory.get_in_memory_size([array, array])
+    assert size < memory.get_in_memory_size([array, array.copy()])
+
+
+def test_views_count_only_their_own_bytes():
+    matrix = sketch_matrix.SketchMatrix(12, 100)
+    dense = ull.UltraLogLog(12, sparse=False)
+    assert matrix.get_sketch(3).in_memory_size_in_bytes() == (
+        dense.in_memory_size_in_bytes()
+    )
+    view = ull.UltraLogLog.wrap(matrix.registers[3])
+    assert view.in_memory_size_in_bytes() == dense.in_memory_size_in_bytes()
+
+
+def test_memory_mapped_pages_are_not_counted(tmp_path):
+    registers = numpy.memmap(
+        tmp_path / "registers", dtype=numpy.uint8, mode="w+", shape=(16, 4096)
+    )
+    assert ull.UltraLogLog.wrap(registers[3]).in_memory_size_in_bytes() < 4096
@@ -0,0 +1,126 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import sketch_matrix
+import ull
+
+p = 8
+num_sketches = 50
+
+
+@pytest.fixture
+def hashes():
+    rng = numpy.random.default_rng(0)
+    sizes = rng.integers(0, 2000, num_sketches)
+    return [
+        rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False) for n in sizes
+    ]
+
+
+@pytest.fixture
+def matrix(hashes):
+    rows = numpy.repeat(numpy.arange(num_sketches), [len(h) for h in hashes])
+    return sketch_matrix.SketchMatrix(p, num_sketches).add_many(
+        rows, numpy.concatenate(hashes)
+    )
+
+
+def merged(hashes, rows):
+    sketch = ull.UltraLogLog(p, sparse=False)
+    for row in rows:
+        sketch.merge(ull.UltraLogLog(p).add_many(hashes[row]))
+    return sketch.get_state_registers()
+
+
+def test_rows_match_single_sketches(matrix, hashes):
+    for row in range(num_sketches):
+        expected = ull.UltraLogLog(p).add_many(hashes[row]).get_state_registers()
+        numpy.testing.assert_array_equal(matrix.registers[row], expected)
+
+
+def test_unions_match_merges(matrix, hashes):
+    rng = numpy.random.default_rng(1)
+    groups = [rng.choice(num_sketches, k, replace=False) for k in (1, 2, 7, 50)]
+    groups += [[], [3, 3, 3], [-1, 0], numpy.arange(num_sketches) % 3 == 0]
+    unions = matrix.unions(groups)
+    for group, union in zip(groups, unions):
+        rows = sketch_matrix.as_rows(group, num_sketches)
+        numpy.testing.assert_array_equal(union, merged(hashes, rows))
+    numpy.testing.assert_array_equal(
+        matrix.union([4, 9]).get_state_registers(), merged(hashes, [4, 9])
+    )
+
+
+@pytest.mark.parametrize(
+    "rows",
+    [
+        [num_sketches],
+        [num_sketches, num_sketches + 1],
+        [-num_sketches - 1],
+        # shifted by p, this row would wrap around to row 0
+        [1 << (64 - p)],
+    ],
+)
+def test_out_of_range_rows_are_rejected(matrix, rows):
+    with pytest.raises(IndexError):
+        matrix.unions([[0], rows])
+    with pytest.raises(IndexError):
+        matrix.union(rows)
+    registers = matrix.registers.copy()
+    with pytest.raises(IndexError):
+        matrix.add_many([0] * (len(rows) - 1) + [rows[-1]], numpy.arange(len(rows)))
+    numpy.testing.assert_array_equal(matrix.registers, registers)
+
+
+def test_negative_rows_count_from_the_end(hashes):
+    h = hashes[0]
+    matrix = sketch_matrix.SketchMatrix(p, num_sketches).add_many(-1, h)
+    expected = ull.UltraLogLog(p).add_many(h).get_state_registers()
+    numpy.testing.assert_array_equal(matrix.registers[num_sketches - 1], expected)
+    assert not matrix.registers[:-1].any()
+
+
+def test_row_mask_of_wrong_length_is_rejected(matrix):
+    with pytest.raises(IndexError):
+        matrix.unions([numpy.ones(num_sketches + 1, dtype=bool)])
+
+
+@pytest.mark.parametrize("new_p", [3, 6, 8])
+def test_downsize_matches_single_sketches(matrix, hashes, new_p):
+    downsized = matrix.downsize(new_p)
+    assert downsized.p == new_p
+    for row in range(num_sketches):
+        sketch = ull.UltraLogLog(p).add_many(hashes[row])
+        numpy.testing.assert_array_equal(
+            downsized.registers[row], sketch.downsize(new_p).get_state_registers()
+        )
+        # equivalent to adding the hashes to a sketch of lower precision
+        numpy.testing.assert_array_equal(
+            downsized.registers[row],
+            ull.UltraLogLog(new_p).add_many(hashes[row]).get_state_registers(),
+        )
@@ -0,0 +1,118 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import sketch_store
+import ull
+
+p = 8
+capacity = 10
+
+
+@pytest.fixture
+def hashes():
+    rng = numpy.random.default_rng(0)
+    return {
+        key: rng.integers(0, 1 << 64, 1000, dtype=numpy.uint64, endpoint=False)
+        for key in ["a", "b", "c"]
+    }
+
+
+@pytest.fixture
+def path(tmp_path, hashes):
+    path = tmp_path / "store"
+    with sketch_store.SketchStore.create(path, p, capacity) as store:
+        for key, h in hashes.items():
+            store.add_many(key, h)
+    return path
+
+
+def test_sketches_survive_reopening(path, hashes):
+    with sketch_store.SketchStore.open(path) as store:
+        assert len(store) == len(hashes)
+        for key, h in hashes.items():
+            expected = ull.UltraLogLog(p).add_many(h).get_state()
+            assert store.get_sketch(key).get_state() == expected
+
+
+def test_keyed_adds_match_single_adds(tmp_path, hashes):
+    keys = numpy.repeat(list(hashes), [len(h) for h in hashes.values()])
+    with sketch_store.SketchStore.create(tmp_path / "store", p, capacity) as store:
+        store.add_many_keyed(keys, numpy.concatenate(list(hashes.values())))
+        for key, h in hashes.items():
+            expected = ull.UltraLogLog(p).add_many(h).get_state()
+            assert store.get_sketch(key).get_state() == expected
+
+
+def test_union_and_estimates(path, hashes):
+    expected = ull.UltraLogLog(p).add_many(hashes["a"]).add_many(hashes["c"])
+    with sketch_store.SketchStore.open(path) as store:
+        assert store.union(["a", "c"]).get_state() == expected.get_state()
+        estimates = store.get_distinct_count_estimates(["a", "b"])
+        assert estimates[0] == store.get_sketch("a").get_distinct_count_estimate()
+
+
+def test_missing_keys_raise_key_error(path):
+    with sketch_store.SketchStore.open(path) as store:
+        with pytest.raises(KeyError):
+            store.union(["a", "missing"])
+        with pytest.raises(KeyError):
+            store.get_distinct_count_estimates(["missing"])
+        with pytest.raises(KeyError):
+            store.get_sketch("missing")
+
+
+def test_merge_keeps_the_merged_sketch_sparse(path, hashes):
+    sketch = ull.UltraLogLog(p).add_many(hashes["a"][:10])
+    with sketch_store.SketchStore.open(path, writable=True) as store:
+        store.merge("d", sketch)
+        assert store.get_sketch("d").get_state() == sketch.get_state()
+    assert sketch.is_sparse()
+
+
+def test_create_never_overwrites(path):
+    with pytest.raises(FileExistsError):
+        sketch_store.SketchStore.create(path, p, capacity)
+
+
+def test_single_writer(path):
+    with sketch_store.SketchStore.open(path, writable=True):
+        with pytest.raises(ValueError):
+            sketch_store.SketchStore.open(path, writable=True)
+        with sketch_store.SketchStore.open(path) as reader:
+            assert len(reader) == 3
+
+
+def test_failed_open_releases_the_writer_lock(tmp_path):
+    path = tmp_path / "not-a-store"
+    path.write_bytes(bytes(2 * sketch_store.page_size))
+    with pytest.raises(ValueError, match="not a sketch store") as first:
+        sketch_store.SketchStore.open(path, writable=True)
+    # the traceback of the first attempt still references the failed store
+    with pytest.raises(ValueError, match="not a sketch store"):
+        sketch_store.SketchStore.open(path, writable=True)
+    assert first.traceback
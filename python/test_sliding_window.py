@@ -0,0 +1,98 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import sliding_window
+import ull
+
+
+def random_hashes(rng, n):
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def window_registers(batches, p, oldest, newest):
+    sketch = ull.UltraLogLog(p, sparse=False)
+    for time, hashes in batches:
+        if oldest <= time <= newest:
+            sketch.add_many(hashes)
+    return sketch.get_state_registers()
+
+
+@pytest.mark.parametrize("window_size", [1, 2, 5, 16])
+def test_window_equals_sketch_of_its_buckets(window_size):
+    # random time steps including gaps longer than the window and late data
+    # for buckets in the front, the back and outside the window
+    p = 6
+    rng = numpy.random.default_rng(window_size)
+    window = sliding_window.SlidingWindow(p, window_size, time=3)
+    batches = []
+    time = 3
+    for _ in range(300):
+        step = rng.choice([0, 1, 1, 1, 2, window_size + 1])
+        time += int(step)
+        window.advance(time)
+        if rng.random() < 0.3:
+            late = time - int(rng.integers(0, window_size + 2))
+            t = max(late, 0)
+        else:
+            t = time
+        hashes = random_hashes(rng, int(rng.integers(0, 40)))
+        window.add_many(hashes, t)
+        batches.append((t, hashes))
+        assert window.time == time
+        expected = window_registers(batches, p, window.get_oldest_time(), time)
+        numpy.testing.assert_array_equal(window.get_registers(), expected)
+
+
+def test_add_without_time_uses_the_newest_bucket():
+    p = 8
+    rng = numpy.random.default_rng(0)
+    hashes = random_hashes(rng, 100)
+    window = sliding_window.SlidingWindow(p, 10, time=5)
+    for hash_value in hashes[:50]:
+        window.add(hash_value)
+    window.add_many(hashes[50:])
+    numpy.testing.assert_array_equal(
+        window.get_registers(),
+        ull.UltraLogLog(p, sparse=False).add_many(hashes).get_state_registers(),
+    )
+    window.advance(14)
+    assert window.get_distinct_count_estimate() == pytest.approx(100, rel=0.1)
+    window.advance(15)
+    assert window.get_distinct_count_estimate() == 0.0
+
+
+def test_invalid_parameters_are_rejected():
+    with pytest.raises(ValueError):
+        sliding_window.SlidingWindow(ull.min_p - 1, 10)
+    with pytest.raises(ValueError):
+        sliding_window.SlidingWindow(8, 0)
+
+
+def test_in_memory_size():
+    window = sliding_window.SlidingWindow(8, 10)
+    assert window.in_memory_size_in_bytes() > (2 * 10 + 1) << 8
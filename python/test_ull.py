@@ -0,0 +1,132 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import pytest
+import ull
+
+# Reference registers computed as the add method of UltraLogLog in hash4j
+# does, bit by bit with the 64-bit wraparound and shift semantics of Java,
+# independent of the lookup tables and the vectorized updates of ull.py.
+
+mask64 = 0xFFFFFFFFFFFFFFFF
+
+
+def java_shift_left(x, s):
+    return (x << (s & 63)) & mask64
+
+
+def java_number_of_leading_zeros(x):
+    return 64 - x.bit_length()
+
+
+def hash4j_unpack(register):
+    # the shift by a negative amount for register 0 shifts out all bits
+    return java_shift_left(4 | (register & 3), (register >> 2) - 2)
+
+
+def hash4j_pack(hash_prefix):
+    nlz = java_number_of_leading_zeros(hash_prefix) + 1
+    return ((-nlz << 2) | (java_shift_left(hash_prefix, nlz) >> 62)) & 0xFF
+
+
+def hash4j_registers(hashes, p):
+    registers = [0] * (1 << p)
+    q = java_number_of_leading_zeros((1 << p) - 1)
+    for hash_value in hashes:
+        hash_value = int(hash_value)
+        idx = hash_value >> q
+        nlz = java_number_of_leading_zeros(
+            ~java_shift_left(~hash_value & mask64, -q) & mask64
+        )
+        hash_prefix = hash4j_unpack(registers[idx])
+        hash_prefix |= java_shift_left(1, nlz + ~q)
+        registers[idx] = hash4j_pack(hash_prefix)
+    return numpy.array(registers, dtype=numpy.uint8)
+
+
+def random_hashes(n, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+
+
+def low_entropy_hashes(n, p, seed=0):
+    # hashes with many trailing zeros after the index bits reach the largest
+    # register values, which random hashes practically never do
+    rng = numpy.random.default_rng(seed)
+    idx = rng.integers(0, 1 << p, n, dtype=numpy.uint64)
+    shifts = rng.integers(0, 65 - p, n, dtype=numpy.uint64)
+    lower = numpy.uint64(0xFFFFFFFFFFFFFFFF >> p) >> shifts
+    return (idx << numpy.uint64(64 - p)) | lower
+
+
+@pytest.mark.parametrize("p", [3, 4, 8, 12])
+@pytest.mark.parametrize("sparse", [True, False])
+@pytest.mark.parametrize("hashes", [random_hashes, low_entropy_hashes])
+def test_batch_and_sequential_add_match_hash4j(p, sparse, hashes):
+    values = (
+        random_hashes(5000) if hashes is random_hashes else low_entropy_hashes(5000, p)
+    )
+    expected = hash4j_registers(values, p)
+    batch = ull.UltraLogLog(p, sparse=sparse).add_many(values)
+    sequential = ull.UltraLogLog(p, sparse=sparse)
+    for hash_value in values:
+        sequential.add(hash_value)
+    numpy.testing.assert_array_equal(batch.get_state_registers(), expected)
+    numpy.testing.assert_array_equal(sequential.get_state_registers(), expected)
+
+
+def test_batches_with_repeated_indices_match_hash4j():
+    # large batches with many hashes per register take the dense update path
+    p = 4
+    values = numpy.concatenate([random_hashes(100000), low_entropy_hashes(1000, p)])
+    sketch = ull.UltraLogLog(p, sparse=False)
+    for batch in numpy.array_split(values, 7):
+        sketch.add_many(batch)
+    numpy.testing.assert_array_equal(
+        sketch.get_state_registers(), hash4j_registers(values, p)
+    )
+
+
+@pytest.mark.parametrize("p", [4, 10])
+def test_add_accepts_python_and_numpy_integers(p):
+    values = random_hashes(100)
+    expected = hash4j_registers(values, p)
+    for convert in (int, numpy.uint64, lambda v: numpy.uint64(v).view(numpy.int64)):
+        sketch = ull.UltraLogLog(p)
+        for hash_value in values:
+            sketch.add(convert(hash_value))
+        numpy.testing.assert_array_equal(sketch.get_state_registers(), expected)
+
+
+def test_extreme_hash_values():
+    p = 8
+    # no leading zeros after the index sets bit p - 1, all zeros bit 63
+    assert hash4j_registers([mask64], p)[-1] == (p - 1) << 2
+    assert hash4j_registers([0], p)[0] == 63 << 2
+    sketch = ull.UltraLogLog(p).add(mask64).add(0)
+    assert sketch.get_state_registers()[-1] == (p - 1) << 2
+    assert sketch.get_state_registers()[0] == 63 << 2
@@ -0,0 +1,108 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import numpy
+import hll
+import ull
+
+# Vectorized port of CompressionSimulation.Work of the Java code. Instead of
+# hashing every single element, the distinct count at which a register sees
+# a hash with a given number of leading zeros for the first time is sampled
+# from a geometric distribution, approximated by a scaled exponential one.
+# Replaying these (2^p)(65-p) transitions in the order of their distinct
+# counts yields register states for arbitrary large distinct counts like
+# 10^21. Up to distinct_count_offset, sketches are filled with random hashes
+# as done by the Java simulation, as the transitions are only approximately
+# independent for small distinct counts.
+#
+# Distinct counts are represented as float64 instead of big integers. Only
+# their order matters, and rounding is negligible compared to the sampled
+# values. The random numbers are drawn from a NumPy generator, so the
+# results are statistically but not numerically identical to the Java ones.
+
+default_distinct_count_offset = 1000000
+
+# maximum number of random hashes generated at once
+chunk_size = 1 << 20
+
+
+def transitions(p, rng, distinct_count_offset=default_distinct_count_offset):
+    # returns the distinct counts of all transitions in ascending order and
+    # the corresponding hash values
+    nlz = numpy.arange(65 - p, dtype=numpy.uint64)
+    idx = numpy.arange(1 << p, dtype=numpy.uint64)
+    factor = numpy.exp2(numpy.minimum(64, 1 + p + nlz.astype(numpy.float64)))
+    distinct_counts = numpy.floor(
+        rng.standard_exponential((65 - p, 1 << p)) * factor[:, None]
+    )
+    distinct_counts += 1 + distinct_count_offset
+    hashes = (idx << numpy.uint64(64 - p))[None, :] | (
+        (numpy.uint64(1 << 63) >> numpy.uint64(p)) >> nlz
+    )[:, None]
+    order = numpy.argsort(distinct_counts, axis=None, kind="stable")
+    return distinct_counts.reshape(-1)[order], hashes.reshape(-1)[order]
+
+
+def get_distinct_count_values(max_value, relative_increment):
+    # same sequence as TestUtils.getDistinctCountValues
+    values = []
+    c = numpy.ceil(max_value)
+    factor = 1.0 / (1.0 + relative_increment)
+    while c > 0:
+        values.append(c)
+        c = min(c - 1, numpy.ceil(c * factor))
+    return numpy.array(values[::-1])
+
+
+def simulate(
+    p, distinct_counts, seed, distinct_count_offset=default_distinct_count_offset
+):
+    # yields the true distinct count, the UltraLogLog and the HyperLogLog
+    # registers for each of the given ascending distinct counts, the register
+    # arrays are reused and must be copied if kept
+    rng = numpy.random.default_rng(seed)
+    ull_sketch = ull.UltraLogLog(p, sparse=False)
+    hll_sketch = hll.HyperLogLog(p)
+    transition_distinct_counts, transition_hashes = transitions(
+        p, rng, distinct_count_offset
+    )
+    ends = numpy.searchsorted(transition_distinct_counts, distinct_counts, "right")
+    true_distinct_count = 0
+    begin = 0
+    for distinct_count, end in zip(distinct_counts, ends):
+        limit = min(distinct_count, distinct_count_offset)
+        while true_distinct_count < limit:
+            n = int(min(limit - true_distinct_count, chunk_size))
+            hashes = rng.integers(0, 1 << 64, n, dtype=numpy.uint64, endpoint=False)
+            ull_sketch.add_many(hashes)
+            hll_sketch.add_many(hashes)
+            true_distinct_count += n
+        if true_distinct_count < distinct_count:
+            ull_sketch.add_many(transition_hashes[begin:end])
+            hll_sketch.add_many(transition_hashes[begin:end])
+            begin = max(begin, end)
+            true_distinct_count = distinct_count
+        yield distinct_count, ull_sketch.registers, hll_sketch.registers
@@ -0,0 +1,543 @@
+#
+# Copyright (c) 2024 Dynatrace LLC. All rights reserved.
+#
+# This software and associated documentation files (the "Software")
+# are being made available by Dynatrace LLC for the sole purpose of
+# illustrating the implementation of certain algorithms which have
+# been published by Dynatrace LLC. Permission is hereby granted,
+# free of charge, to any person obtaining a copy of the Software,
+# to view and use the Software for internal, non-production,
+# non-commercial purposes only – the Software may not be used to
+# process live data or distributed, sublicensed, modified and/or
+# sold either alone or as part of or in combination with any other
+# software.
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+#
+import functools
+import numpy
+import os
+import estimation
+import martingale
+import memory
+
+min_p = 3
+max_p = 26
+
+# A register stores the position u of the most significant bit of the hash
+# prefix in its upper 6 bits and the two next lower bits in its lower 2 bits,
+# exactly as the UltraLogLog implementation of hash4j does. The hash prefix is
+# given by the bits that have been set by all hashes seen so far, where a hash
+# with nlz leading zeros (after the p index bits) sets bit nlz + p - 1.
+
+
+def unpack(register):
+    if register < 8:
+        return 0
+    return (4 | (register & 3)) << ((register >> 2) - 2)
+
+
+def pack(hash_prefix):
+    if hash_prefix == 0:
+        return 0
+    u = hash_prefix.bit_length() - 1
+    return (u << 2) | (((hash_prefix << 2) >> u) & 3)
+
+
+def pack_registers(hash_prefixes, u):
+    extra_bits = (hash_prefixes >> (u.astype(numpy.uint64) - numpy.uint64(2))) & 3
+    return numpy.where(hash_prefixes == 0, 0, (u << 2) | extra_bits).astype(numpy.uint8)
+
+
+unpack_table = numpy.array([unpack(r) for r in range(256)], dtype=numpy.uint64)
+
+update_table = numpy.array(
+    [[pack(unpack(r) | (1 << k)) for k in range(64)] for r in range(256)],
+    dtype=numpy.uint8,
+)
+
+merge_table = pack_registers(
+    unpack_table[:, None] | unpack_table[None, :],
+    numpy.maximum(
+        numpy.arange(256, dtype=numpy.uint8)[:, None] >> 2,
+        numpy.arange(256, dtype=numpy.uint8)[None, :] >> 2,
+    ),
+)
+
+
+file_chunk_size = 1 << 20
+
+
+def as_hashes(hashes):
+    # objects supporting the buffer protocol other than NumPy arrays, like
+    # bytes, memoryview, mmap or Arrow buffers, are interpreted as
+    # little-endian 64-bit hashes without copying
+    if not isinstance(hashes, numpy.ndarray):
+        try:
+            buffer = memoryview(hashes)
+        except TypeError:
+            buffer = None
+        if buffer is not None:
+            return numpy.frombuffer(buffer, dtype="<u8")
+    hashes = numpy.asarray(hashes)
+    if hashes.dtype == numpy.int64:
+        return hashes.view(numpy.uint64)
+    return hashes.astype(numpy.uint64, copy=False)
+
+
+def hash_chunks(hashes):
+    # a path is read as file of little-endian 64-bit hashes in chunks through
+    # a memory map, anything else is passed to as_hashes
+    if isinstance(hashes, (str, os.PathLike)):
+        if os.path.getsize(hashes) < 8:
+            return
+        hashes = numpy.memmap(hashes, dtype="<u8", mode="r")
+        for start in range(0, len(hashes), file_chunk_size):
+            yield hashes[start : start + file_chunk_size]
+    else:
+        yield as_hashes(hashes)
+
+
+def split_hashes(hashes, p):
+    idx = (hashes >> numpy.uint64(64 - p)).astype(numpy.intp)
+    # t >> 11 has at most 53 significant bits, hence its conversion to double is
+    # exact and the biased exponent reveals the position of the leading one
+    t = hashes & numpy.uint64(0xFFFFFFFFFFFFFFFF >> p)
+    exponent = (t >> numpy.uint64(11)).astype(numpy.float64).view(
+        numpy.uint64
+    ) >> numpy.uint64(52)
+    k = numpy.subtract(50, exponent.astype(numpy.uint8), dtype=numpy.uint8)
+    if not exponent.all():
+        small = numpy.flatnonzero(exponent == 0)
+        small_exponent = t[small].astype(numpy.float64).view(
+            numpy.uint64
+        ) >> numpy.uint64(52)
+        k[small] = numpy.minimum(1085 - small_exponent.astype(numpy.int64), 63)
+    return idx, k
+
+
+def update_registers(registers, idx, k):
+    # returns the indices of possibly changed registers and their old values
+    if len(idx) == 0:
+        return idx, registers[idx]
+    if 16 * len(idx) < len(registers):
+        old = registers[idx]
+        changed = update_table[old, k] != old
+        idx = idx[changed]
+        k = k[changed]
+        if len(idx) == 0:
+            return idx, registers[idx]
+        order = numpy.argsort(idx)
+        idx = idx[order]
+        k = k[order]
+        starts = numpy.flatnonzero(numpy.diff(idx, prepend=-1))
+        touched = idx[starts]
+        bits = numpy.bitwise_or.reduceat(
+            numpy.left_shift(numpy.uint64(1), k.astype(numpy.uint64)), starts
+        )
+        max_k = numpy.maximum.reduceat(k, starts)
+    else:
+        # k >= p - 1 >= 2, hence registers that were not hit keep max_k == 0
+        max_k = numpy.zeros(len(registers), dtype=numpy.uint8)
+        numpy.maximum.at(max_k, idx, k)
+        # bits more than 2 positions below the maximum do not affect the register
+        relevant = k + numpy.uint8(2) >= max_k[idx]
+        idx = idx[relevant]
+        k = k[relevant]
+        bits = numpy.zeros(len(registers), dtype=numpy.uint64)
+        numpy.bitwise_or.at(
+            bits, idx, numpy.left_shift(numpy.uint64(1), k.astype(numpy.uint64))
+        )
+        touched = numpy.flatnonzero(max_k)
+        bits = bits[touched]
+        max_k = max_k[touched]
+    old = registers[touched]
+    registers[touched] = pack_registers(
+        unpack_table[old] | bits, numpy.maximum(old >> 2, max_k)
+    )
+    return touched, old
+
+
+def update_histogram(histogram, old, new):
+    histogram -= numpy.bincount(old, minlength=256)
+    histogram += numpy.bincount(new, minlength=256)
+
+
+def highest_bit_positions(x):
+    # the conversion to double may round up to the next power of two
+    e = numpy.clip(
+        (x.astype(numpy.float64).view(numpy.uint64) >> numpy.uint64(52)).astype(
+            numpy.int64
+        )
+        - 1023,
+        0,
+        63,
+    )
+    e -= x < numpy.left_shift(numpy.uint64(1), e.astype(numpy.uint64))
+    return e.astype(numpy.uint8)
+
+
+def pack_prefixes(hash_prefixes):
+    return pack_registers(hash_prefixes, highest_bit_positions(hash_prefixes))
+
+
+def update_martingale_estimator(martingale_estimator, p, old, idx, k):
+    # must be called with the register values old = registers[idx] before the
+    # registers are updated
+    candidates = numpy.flatnonzero(update_table[old, k] != old)
+    if len(candidates) == 0:
+        return
+    idx = idx[candidates]
+    k = k[candidates]
+    old = old[candidates]
+    exclusive_bits, inclusive_bits = martingale.sequential_states(
+        idx, numpy.left_shift(numpy.uint64(1), k.astype(numpy.uint64)), numpy.bitwise_or
+    )
+    before = unpack_table[old] | exclusive_bits
+    before = pack_prefixes(before)
+    after = unpack_table[old] | inclusive_bits
+    after = pack_prefixes(after)
+    changed = before != after
+    probabilities = change_probability_table(p)
+    martingale_estimator.state_changed_many(
+        probabilities[before[changed]] - probabilities[after[changed]]
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def change_probability_table(p):
+    # probability that the next distinct element changes a register with the
+    # given value
+    absent, _ = estimation.ml_tables(p)
+    return absent / (1 << p)
+
+
+def merge_registers(registers1, registers2, out=None):
+    if out is None:
+        return merge_table[registers1, registers2]
+    out[:] = merge_table[registers1, registers2]
+    return out
+
+
+def reduce_precision(registers, p):
+    # A register with index i of precision p becomes part of register
+    # i >> (p_old - p) of precision p. If the dropped index bits j are all
+    # zero, they count as leading zeros and the hash prefix is kept as is.
+    # Otherwise, all hashes of the register set the same single bit given by
+    # the number of leading zeros of j.
+    registers = numpy.asarray(registers)
+    p_old = estimation.precision_from_registers(registers)
+    if p > p_old:
+        raise ValueError("precision must not be increased")
+    d = p_old - p
+    prefixes = unpack_table[registers].reshape(registers.shape[:-1] + (1 << p, 1 << d))
+    j = numpy.arange(1, 1 << d)
+    bits = numpy.left_shift(
+        numpy.uint64(1), (d - numpy.floor(numpy.log2(j)).astype(numpy.int64) + p - 2)
+    ).astype(numpy.uint64)
+    prefixes[..., 1:] = numpy.where(prefixes[..., 1:] != 0, bits, numpy.uint64(0))
+    return pack_prefixes(numpy.bitwise_or.reduce(prefixes, axis=-1))
+
+
+# In sparse mode, the nonzero registers are stored as sorted entries
+# (register index << 8) | register value. Sketches switch to dense registers
+# as soon as the entries would take at least as much memory.
+def sparse_dtype(p):
+    return numpy.uint32 if p <= 24 else numpy.uint64
+
+
+def make_entries(idx, registers, p):
+    dtype = sparse_dtype(p)
+    return (idx.astype(dtype) << dtype(8)) | registers.astype(dtype)
+
+
+def sparse_indices(entries):
+    return (entries >> entries.dtype.type(8)).astype(numpy.intp)
+
+
+def sparse_registers(entries):
+    return (entries & entries.dtype.type(0xFF)).astype(numpy.uint8)
+
+
+def sparse_lookup(entries, idx):
+    indices = sparse_indices(entries)
+    positions = numpy.minimum(numpy.searchsorted(indices, idx), len(entries) - 1)
+    if len(entries) == 0:
+        return numpy.zeros(numpy.shape(idx), dtype=numpy.uint8)
+    return numpy.where(
+        indices[positions] == idx, sparse_registers(entries[positions]), 0
+    ).astype(numpy.uint8)
+
+
+def sparse_merge(entries1, entries2):
+    # both arrays contain every register index at most once
+    entries = numpy.sort(numpy.concatenate((entries1, entries2)))
+    indices = sparse_indices(entries)
+    duplicate = numpy.flatnonzero(indices[1:] == indices[:-1])
+    if len(duplicate) == 0:
+        return entries
+    registers = sparse_registers(entries)
+    merged = merge_table[registers[duplicate], registers[duplicate + 1]]
+    dtype = entries.dtype.type
+    entries[duplicate + 1] = (entries[duplicate + 1] & ~dtype(0xFF)) | merged.astype(
+        dtype
+    )
+    return numpy.delete(entries, duplicate)
+
+
+def sparse_find(entries, idx):
+    # returns the position of the entry of the given register index, or the
+    # position where it would be inserted, and the register value
+    position = int(entries.searchsorted(entries.dtype.type(idx << 8)))
+    if position < len(entries) and int(entries[position]) >> 8 == idx:
+        return position, int(entries[position]) & 0xFF
+    return position, 0
+
+
+def sparse_set(entries, position, idx, register):
+    # replaces the entry at the position found by sparse_find in place, or
+    # inserts a new one if the register is not stored yet
+    entry = (idx << 8) | int(register)
+    if position < len(entries) and int(entries[position]) >> 8 == idx:
+        entries[position] = entry
+        return entries
+    result = numpy.empty(len(entries) + 1, dtype=entries.dtype)
+    result[:position] = entries[:position]
+    result[position] = entry
+    result[position + 1 :] = entries[position:]
+    return result
+
+
+def sparse_update(entries, idx, k, p):
+    if len(idx) == 0:
+        return entries
+    order = numpy.argsort(idx)
+    idx = idx[order]
+    starts = numpy.flatnonzero(numpy.diff(idx, prepend=-1))
+    bits = numpy.bitwise_or.reduceat(
+        numpy.left_shift(numpy.uint64(1), k[order].astype(numpy.uint64)), starts
+    )
+    return sparse_merge(entries, make_entries(idx[starts], pack_prefixes(bits), p))
+
+
+def sparse_to_dense(entries, p):
+    registers = numpy.zeros(1 << p, dtype=numpy.uint8)
+    registers[sparse_indices(entries)] = sparse_registers(entries)
+    return registers
+
+
+def sparse_histogram(entries, p):
+    histogram = numpy.bincount(sparse_registers(entries), minlength=256)
+    histogram[0] += (1 << p) - len(entries)
+    return histogram
+
+
+class UltraLogLog:
+
+    def __init__(self, p, track_histogram=False, sparse=True):
+        if not min_p <= p <= max_p:
+            raise ValueError("illegal precision parameter " + str(p))
+        self.p = p
+        self.dense_registers = None
+        self.sparse_entries = None
+        if sparse:
+            self.sparse_entries = numpy.zeros(0, dtype=sparse_dtype(p))
+        else:
+            self.dense_registers = numpy.zeros(1 << p, dtype=numpy.uint8)
+        self.histogram = None
+        if track_histogram:
+            self.track_histogram()
+
+    @classmethod
+    def wrap(cls, state, track_histogram=False):
+        if isinstance(state, numpy.ndarray):
+            registers = state.view(numpy.uint8)
+        else:
+            registers = numpy.frombuffer(state, dtype=numpy.uint8).copy()
+        p = len(registers).bit_length() - 1
+        if len(registers) != 1 << p or not min_p <= p <= max_p:
+            raise ValueError("illegal state length " + str(len(registers)))
+        sketch = cls.__new__(cls)
+        sketch.p = p
+        sketch.dense_registers = registers
+        sketch.sparse_entries = None
+        sketch.histogram = None
+        if track_histogram:
+            sketch.track_histogram()
+        return sketch
+
+    @property
+    def registers(self):
+        # accessing the registers switches to dense mode
+        self.densify()
+        return self.dense_registers
+
+    def is_sparse(self):
+        return self.sparse_entries is not None
+
+    def densify(self):
+        if self.sparse_entries is not None:
+            self.dense_registers = sparse_to_dense(self.sparse_entries, self.p)
+            self.sparse_entries = None
+        return self
+
+    def densify_if_cheaper(self):
+        if self.sparse_entries.nbytes >= 1 << self.p:
+            self.densify()
+
+    def get_histogram(self):
+        if self.histogram is not None:
+            return self.histogram
+        if self.sparse_entries is not None:
+            return sparse_histogram(self.sparse_entries, self.p)
+        return estimation.register_histograms(self.dense_registers)
+
+    def track_histogram(self):
+        # the histogram of register values is kept up to date by all
+        # operations of this class, but not if the registers are modified
+        # directly
+        self.histogram = None
+        self.histogram = self.get_histogram()
+        return self
+
+    def get_state_registers(self):
+        # dense registers without switching to dense mode
+        if self.sparse_entries is not None:
+            return sparse_to_dense(self.sparse_entries, self.p)
+        return self.dense_registers
+
+    def get_state(self):
+        return self.get_state_registers().tobytes()
+
+    def serialized_size_in_bytes(self):
+        return 1 << self.p
+
+    def in_memory_size_in_bytes(self):
+        return memory.get_in_memory_size(self)
+
+    def copy(self):
+        sketch = UltraLogLog.__new__(UltraLogLog)
+        sketch.p = self.p
+        sketch.dense_registers = None
+        sketch.sparse_entries = None
+        if self.sparse_entries is not None:
+            sketch.sparse_entries = self.sparse_entries.copy()
+        else:
+            sketch.dense_registers = self.dense_registers.copy()
+        sketch.histogram = None
+        if self.histogram is not None:
+            sketch.histogram = self.histogram.copy()
+        return sketch
+
+    def reset(self):
+        if self.sparse_entries is not None:
+            self.sparse_entries = self.sparse_entries[:0]
+        else:
+            self.dense_registers[:] = 0
+        if self.histogram is not None:
+            self.histogram[:] = 0
+            self.histogram[0] = 1 << self.p
+        return self
+
+    def add(self, hash_value, martingale_estimator=None):
+        hash_value = int(hash_value) & 0xFFFFFFFFFFFFFFFF
+        q = 64 - self.p
+        idx = hash_value >> q
+        k = 63 - (hash_value & ((1 << q) - 1)).bit_length()
+        if self.sparse_entries is not None:
+            position, old = sparse_find(self.sparse_entries, idx)
+        else:
+            old = self.dense_registers[idx]
+        new = update_table[old, k]
+        if new != old:
+            if self.sparse_entries is not None:
+                self.sparse_entries = sparse_set(
+                    self.sparse_entries, position, idx, new
+                )
+                self.densify_if_cheaper()
+            else:
+                self.dense_registers[idx] = new
+            if martingale_estimator is not None:
+                probabilities = change_probability_table(self.p)
+                martingale_estimator.state_changed(
+                    probabilities[old] - probabilities[new]
+                )
+            if self.histogram is not None:
+                self.histogram[old] -= 1
+                self.histogram[new] += 1
+        return self
+
+    def add_many(self, hashes, martingale_estimator=None):
+        for chunk in hash_chunks(hashes):
+            self.add_hash_array(chunk, martingale_estimator)
+        return self
+
+    def add_hash_array(self, hashes, martingale_estimator=None):
+        idx, k = split_hashes(hashes, self.p)
+        if self.sparse_entries is not None:
+            if martingale_estimator is not None:
+                update_martingale_estimator(
+                    martingale_estimator,
+                    self.p,
+                    sparse_lookup(self.sparse_entries, idx),
+                    idx,
+                    k,
+                )
+            if len(idx) >= 1 << self.p:
+                # the dense update is cheaper for large batches
+                self.densify()
+            else:
+                self.sparse_entries = sparse_update(self.sparse_entries, idx, k, self.p)
+                if self.histogram is not None:
+                    self.histogram = sparse_histogram(self.sparse_entries, self.p)
+                self.densify_if_cheaper()
+                return self
+        elif martingale_estimator is not None:
+            update_martingale_estimator(
+                martingale_estimator, self.p, self.dense_registers[idx], idx, k
+            )
+        touched, old = update_registers(self.dense_registers, idx, k)
+        if self.histogram is not None and len(touched) > 0:
+            update_histogram(self.histogram, old, self.dense_registers[touched])
+        return self
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("precision parameters do not match")
+        if other.sparse_entries is not None:
+            if self.sparse_entries is not None:
+                self.sparse_entries = sparse_merge(
+                    self.sparse_entries, other.sparse_entries
+                )
+                self.densify_if_cheaper()
+            else:
+                idx = sparse_indices(other.sparse_entries)
+                self.dense_registers[idx] = merge_table[
+                    self.dense_registers[idx], sparse_registers(other.sparse_entries)
+                ]
+        else:
+            merge_registers(self.registers, other.registers, out=self.registers)
+        if self.histogram is not None:
+            self.track_histogram()
+        return self
+
+    def downsize(self, p):
+        return UltraLogLog.wrap(
+            reduce_precision(self.get_state_registers(), p),
+            track_histogram=self.histogram is not None,
+        )
+
+    def get_distinct_count_estimate(
+        self, estimator=estimation.fgra_estimate_from_histograms
+    ):
+        return float(estimator(self.get_histogram(), self.p))